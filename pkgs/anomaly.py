@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+@File    : anomaly.py
+@Time    : 2024/10/08 09:30:00
+@Author  : WHY
+@Version : 1.0
+@Desc    : 故障频次异常评分，按风机×故障代码建立滚动基线并标记离群天
+"""
+
+from __future__ import annotations
+
+from typing import Literal
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from . import bucket
+
+# 异常结果包含信息list
+anomaly_info = [
+    'day',
+    'wt_id',
+    'code',
+    'fault_en',
+    'fault_cn',
+    'value',
+    'baseline',
+    'score',
+]
+
+
+def daily_rollup(
+    fault_df: pd.DataFrame,
+    dt_list: pd.DatetimeIndex = None,
+    value: Literal['count', 'hours'] = 'count',
+) -> pd.DataFrame:
+    '''
+    ~将故障明细汇总为按天的宽表，行为日期，列为(风机编号, 故障代码)
+
+    Parameters
+    ----------
+    - fault_df: FaultStatistics.get_fault得到的故障明细
+    - dt_list: 日期序列，缺少的日期补0，为None时使用明细中的日期范围
+    - value: 统计故障次数(count)或故障时长小时数(hours)
+    '''
+    df = fault_df.dropna(subset=['code', 'stop_time'])
+    start = bucket.floor(df['stop_time'], '1D')
+    if value == 'count':
+        s = df.groupby([pd.Index(start, name='day'), df['wt_id'], df['code']]).size()
+    else:
+        # 跨越零点的故障时长分摊到各天
+        stop = pd.to_datetime(df['stop_time']).to_numpy('datetime64[ns]')
+        end = stop + pd.to_timedelta(df['timedelta']).to_numpy('timedelta64[ns]')
+        if dt_list is not None:
+            lo, hi = dt_list[0], dt_list[-1] + pd.Timedelta('1d')
+        elif df.shape[0] > 0:
+            lo = start.min()
+            hi = bucket.floor(end.max(), '1D')[0] + np.timedelta64(1, 'D')
+        else:
+            lo = hi = pd.Timestamp(0)
+        days = bucket.edges(lo, hi, '1D')
+        rep, period, duration = bucket.split(stop, end, days)
+        s = (
+            pd.DataFrame(
+                {
+                    'day': days[period],
+                    'wt_id': df['wt_id'].to_numpy()[rep],
+                    'code': df['code'].to_numpy()[rep],
+                    'hours': duration / 3.6e12,
+                }
+            )
+            .groupby(['day', 'wt_id', 'code'])['hours']
+            .sum()
+        )
+    wide = s.unstack(['wt_id', 'code'], fill_value=0).astype(float)
+    if dt_list is None and wide.shape[0] > 0:
+        dt_list = pd.date_range(wide.index.min(), wide.index.max())
+    if dt_list is not None:
+        wide = wide.reindex(dt_list, fill_value=0.0)
+    wide.index.name = 'day'
+    return wide
+
+
+def _robust_baseline(
+    values: np.ndarray,
+    window: int,
+    block: int = 4096,
+) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    ~滚动中位数与MAD，对所有序列批量计算，前window天为nan
+
+    Parameters
+    ----------
+    - values: 二维数组，行为日期，列为序列
+    - window: 窗口天数
+    - block: 每批计算的序列数，限制中位数计算时的临时内存
+    '''
+    baseline = np.full(values.shape, np.nan)
+    scale = np.full(values.shape, np.nan)
+    if values.shape[0] <= window:
+        return baseline, scale
+    for i in range(0, values.shape[1], block):
+        # 形状为(天数-window, 序列数, window)的只读视图，不复制数据
+        windows = sliding_window_view(values[:, i : i + block], window, axis=0)[:-1]
+        median = np.median(windows, axis=-1)
+        # 1.4826使MAD在正态分布下与标准差一致
+        mad = 1.4826 * np.median(np.abs(windows - median[..., None]), axis=-1)
+        # 第t天的基线只使用t之前的window天
+        baseline[window:, i : i + block] = median
+        scale[window:, i : i + block] = mad
+    return baseline, scale
+
+
+def score(
+    wide: pd.DataFrame,
+    method: Literal['ewma', 'robust'] = 'robust',
+    window: int = 14,
+    min_scale: float = 1.0,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    '''
+    ~计算每个序列每天相对历史基线的z分数
+
+    Parameters
+    ----------
+    - wide: daily_rollup得到的宽表
+    - method: ewma为指数加权均值/标准差，robust为滚动中位数/MAD
+    - window: robust的窗口天数，ewma的span
+    - min_scale: 离散度下限，避免历史几乎为0的序列一出现故障就得到极大分数
+
+    Returns
+    -------
+    (z分数宽表, 基线宽表)
+    '''
+    values = wide.to_numpy(dtype=float)
+    if method == 'ewma':
+        ewm = wide.ewm(span=window, min_periods=window)
+        # 第t天的基线只使用t之前的数据
+        baseline = ewm.mean().shift(1).to_numpy()
+        scale = ewm.std().shift(1).to_numpy()
+    else:
+        baseline, scale = _robust_baseline(values, window)
+    z = (values - baseline) / np.maximum(scale, min_scale)
+    return (
+        pd.DataFrame(z, index=wide.index, columns=wide.columns),
+        pd.DataFrame(baseline, index=wide.index, columns=wide.columns),
+    )
+
+
+def detect(
+    fault_df: pd.DataFrame,
+    dt_list: pd.DatetimeIndex = None,
+    value: Literal['count', 'hours'] = 'count',
+    method: Literal['ewma', 'robust'] = 'robust',
+    window: int = 14,
+    threshold: float = 3.0,
+    min_scale: float = 1.0,
+) -> pd.DataFrame:
+    '''
+    ~标记故障频次异常升高的(日期, 风机, 故障代码)
+
+    Parameters
+    ----------
+    - fault_df: FaultStatistics.get_fault得到的故障明细，应包含window天以上的历史
+    - dt_list: 日期序列，为None时使用明细中的日期范围
+    - value: 统计故障次数(count)或故障时长小时数(hours)
+    - method: 基线算法，见score
+    - window: 基线窗口天数
+    - threshold: z分数阈值，超过该值视为异常
+    - min_scale: 离散度下限，见score
+
+    Returns
+    -------
+    DataFrame ~ 列为anomaly_info，按分数降序
+    '''
+    wide = daily_rollup(fault_df, dt_list=dt_list, value=value)
+    if wide.shape[1] == 0:
+        # 无故障时也保持day为时间类型，调用方可照常按时间筛选和格式化
+        return pd.DataFrame(columns=anomaly_info).astype({'day': 'datetime64[ns]'})
+    z, baseline = score(wide, method=method, window=window, min_scale=min_scale)
+    values = wide.to_numpy()
+    # 只关注升高的异常
+    day_idx, col_idx = np.nonzero((z.to_numpy() > threshold) & (values > 0))
+    cols = wide.columns[col_idx]
+    result = pd.DataFrame(
+        {
+            'day': wide.index[day_idx],
+            'wt_id': cols.get_level_values('wt_id'),
+            'code': cols.get_level_values('code'),
+            'value': values[day_idx, col_idx],
+            'baseline': baseline.to_numpy()[day_idx, col_idx],
+            'score': z.to_numpy()[day_idx, col_idx],
+        }
+    )
+    # 补充故障描述
+    names = fault_df.dropna(subset=['code']).drop_duplicates('code').set_index('code')
+    result['fault_en'] = names['fault_en'].reindex(result['code']).to_numpy()
+    result['fault_cn'] = names['fault_cn'].reindex(result['code']).to_numpy()
+    return result[anomaly_info].sort_values('score', ascending=False, ignore_index=True)
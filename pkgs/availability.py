@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+@File    : availability.py
+@Time    : 2024/10/10 14:20:00
+@Author  : WHY
+@Version : 1.0
+@Desc    : 停机区间合并与可利用率统计
+"""
+
+from __future__ import annotations
+
+from typing import Literal
+
+import numpy as np
+import pandas as pd
+
+from . import bucket
+
+# 区间表包含信息list，start、end为datetime64[ns]，区间为左闭右开
+interval_info = ['wt_id', 'start', 'end']
+
+# 统计周期对应的分桶步长，周从星期一开始
+freq_map = {'D': '1D', 'W': 'W', 'M': 'M'}
+
+
+def fault_intervals(fault_df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    ~由故障明细得到停机区间：停机时刻至启机时刻
+
+    Parameters
+    ----------
+    - fault_df: FaultStatistics.get_fault得到的故障明细
+    '''
+    df = fault_df.dropna(subset=['stop_time', 'timedelta'])
+    start = pd.to_datetime(df['stop_time'])
+    return pd.DataFrame(
+        {
+            'wt_id': df['wt_id'].to_numpy(),
+            'start': start.to_numpy(),
+            'end': (start + pd.to_timedelta(df['timedelta'])).to_numpy(),
+        }
+    )
+
+
+def _sweep(df: pd.DataFrame, min_count: int) -> pd.DataFrame:
+    '''
+    ~扫描线算法：找出每台风机被至少min_count个区间同时覆盖的时段，排序为O(n log n)
+
+    Parameters
+    ----------
+    - df: 区间表
+    - min_count: 覆盖次数下限，1为并集
+    '''
+    if df.shape[0] == 0:
+        return pd.DataFrame(columns=interval_info)
+    wt_codes, wt_uniques = pd.factorize(df['wt_id'])
+    n = df.shape[0]
+    # 每个区间拆为开始(+1)和结束(-1)两个事件
+    wt = np.concatenate([wt_codes, wt_codes])
+    t = np.concatenate([df['start'].to_numpy('datetime64[ns]'), df['end'].to_numpy('datetime64[ns]')])
+    delta = np.concatenate([np.ones(n, dtype=np.int64), -np.ones(n, dtype=np.int64)])
+    # 按风机、时间排序，同一时刻开始事件在前，首尾相接的区间会被合并
+    order = np.lexsort((-delta, t, wt))
+    wt, t, delta = wt[order], t[order], delta[order]
+    # 每台风机的事件和为0，全局累加即为各风机各时刻的覆盖次数
+    covered = np.cumsum(delta) >= min_count
+    prev = np.concatenate([[False], covered[:-1]])
+    start_idx = np.flatnonzero(covered & ~prev)
+    end_idx = np.flatnonzero(~covered & prev)
+    result = pd.DataFrame(
+        {
+            'wt_id': wt_uniques[wt[start_idx]],
+            'start': t[start_idx],
+            'end': t[end_idx],
+        }
+    )
+    # 去除首尾相接产生的零长度区间
+    return result[result['end'] > result['start']].reset_index(drop=True)
+
+
+def merge_intervals(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    ~合并每台风机的重叠区间（并集）
+
+    Parameters
+    ----------
+    - df: 区间表
+    '''
+    return _sweep(df, 1)
+
+
+def intersect_intervals(*dfs: pd.DataFrame) -> pd.DataFrame:
+    '''
+    ~求多个区间表中每台风机的公共时段（交集）
+
+    Parameters
+    ----------
+    - dfs: 区间表
+    '''
+    # 各表先各自合并，保证同一表内的区间不会重复计数
+    merged = [merge_intervals(df) for df in dfs]
+    return _sweep(pd.concat(merged, ignore_index=True), len(dfs))
+
+
+def clip_intervals(
+    df: pd.DataFrame,
+    start: pd.Timestamp | str,
+    end: pd.Timestamp | str,
+) -> pd.DataFrame:
+    '''
+    ~将区间截取到[start, end)范围内
+
+    Parameters
+    ----------
+    - df: 区间表
+    - start: 开始时刻
+    - end: 结束时刻
+    '''
+    df = df.copy()
+    df['start'] = df['start'].clip(lower=pd.Timestamp(start))
+    df['end'] = df['end'].clip(upper=pd.Timestamp(end))
+    return df[df['end'] > df['start']].reset_index(drop=True)
+
+
+def downtime(
+    df: pd.DataFrame,
+    start: pd.Timestamp | str,
+    end: pd.Timestamp | str,
+    freq: Literal['D', 'W', 'M'] = 'D',
+    wt_list: list = None,
+) -> tuple[pd.DataFrame, pd.Series]:
+    '''
+    ~统计每台风机每个周期的停机小时数，跨周期的区间按各周期内的时长分摊
+
+    Parameters
+    ----------
+    - df: 区间表
+    - start: 开始时刻
+    - end: 结束时刻（不包含）
+    - freq: 统计周期，D日、W周（周一开始）、M月
+    - wt_list: 风机列表，没有停机的风机也会出现在结果中
+
+    Returns
+    -------
+    (停机小时宽表，行为周期开始时刻，列为风机编号, 各周期在[start, end)内的小时数)
+    '''
+    start = pd.Timestamp(start)
+    end = pd.Timestamp(end)
+    df = merge_intervals(df)
+    edges = bucket.edges(start, end, freq_map[freq])
+    period_hours = pd.Series(
+        np.diff(edges.to_numpy('datetime64[ns]').astype(np.int64)) / 3.6e12,
+        index=edges[:-1],
+    )
+
+    if wt_list is None:
+        wt_list = sorted(df['wt_id'].unique())
+    wt_index = pd.Index(wt_list)
+    # 跨周期的区间拆分到各周期，超出[start, end)的部分被截去
+    rep, period, duration = bucket.split(df['start'], df['end'], edges)
+    hours = duration / 3.6e12
+    col = wt_index.get_indexer(df['wt_id'].to_numpy()[rep])
+    keep = col >= 0
+    matrix = np.zeros((len(edges) - 1, len(wt_index)))
+    np.add.at(matrix, (period[keep], col[keep]), hours[keep])
+    return pd.DataFrame(matrix, index=edges[:-1], columns=wt_index), period_hours
+
+
+def fault_matrix(
+    df: pd.DataFrame,
+    start: pd.Timestamp | str,
+    end: pd.Timestamp | str,
+    value: Literal['hours', 'count'] = 'hours',
+    freq: Literal['D', 'W', 'M'] = 'D',
+    wt_list: list = None,
+) -> pd.DataFrame:
+    '''
+    ~每台风机每个周期的故障小时数或故障次数宽表
+
+    Parameters
+    ----------
+    - df: 区间表
+    - start: 开始时刻
+    - end: 结束时刻（不包含）
+    - value: hours为停机小时数（重叠区间合并、跨周期分摊），count为开始于该周期的故障次数
+    - freq: 统计周期，D日、W周（周一开始）、M月
+    - wt_list: 风机列表，没有故障的风机也会出现在结果中
+
+    Returns
+    -------
+    DataFrame ~ 行为周期开始时刻，列为风机编号
+    '''
+    if value == 'hours':
+        return downtime(df, start, end, freq=freq, wt_list=wt_list)[0]
+    start = pd.Timestamp(start)
+    end = pd.Timestamp(end)
+    edges = bucket.edges(start, end, freq_map[freq])
+    if wt_list is None:
+        wt_list = sorted(df['wt_id'].unique())
+    wt_index = pd.Index(wt_list)
+    s = df['start'].to_numpy('datetime64[ns]')
+    period = np.searchsorted(edges.to_numpy('datetime64[ns]'), s, side='right') - 1
+    col = wt_index.get_indexer(df['wt_id'].to_numpy())
+    keep = (s >= start.to_datetime64()) & (s < end.to_datetime64()) & (col >= 0)
+    matrix = np.zeros((len(edges) - 1, len(wt_index)))
+    np.add.at(matrix, (period[keep], col[keep]), 1)
+    return pd.DataFrame(matrix, index=edges[:-1], columns=wt_index)
+
+
+def availability(
+    fault_df: pd.DataFrame,
+    start: pd.Timestamp | str,
+    end: pd.Timestamp | str,
+    freq: Literal['D', 'W', 'M'] = 'D',
+    wt_list: list = None,
+) -> pd.DataFrame:
+    '''
+    ~每台风机每个周期的时间可利用率(%)
+
+    Parameters
+    ----------
+    - fault_df: FaultStatistics.get_fault得到的故障明细
+    - start: 开始时刻
+    - end: 结束时刻（不包含）
+    - freq: 统计周期，D日、W周（周一开始）、M月
+    - wt_list: 风机列表
+    '''
+    hours, period_hours = downtime(
+        fault_intervals(fault_df), start, end, freq=freq, wt_list=wt_list
+    )
+    return 100 * (1 - hours.div(period_hours, axis=0))
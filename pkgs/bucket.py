@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+@File    : bucket.py
+@Time    : 2024/10/22 10:15:00
+@Author  : WHY
+@Version : 1.0
+@Desc    : 时间分桶，对整个datetime64数组向下取整，支持固定步长、周、月，并按桶边界拆分区间
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+# 按日历计算的步长：W周、M月，其余步长按pd.Timedelta解析
+calendar_steps = ('W', 'M')
+
+_DAY_NS = 86400 * 10**9
+# 1970-01-01为星期四
+_EPOCH_WEEKDAY = 3
+
+
+def _to_ns(values) -> np.ndarray:
+    '''
+    ~转为datetime64[ns]数组
+    '''
+    if not pd.api.types.is_list_like(values):
+        values = [values]
+    return pd.DatetimeIndex(pd.to_datetime(values)).to_numpy('datetime64[ns]')
+
+
+def floor(
+    values,
+    step: pd.Timedelta | str,
+    week_start: int = 0,
+) -> np.ndarray:
+    '''
+    ~将时间数组向下取整到所在桶的开始时刻，NaT保持不变
+
+    Parameters
+    ----------
+    - values: 时间数组或单个时间
+    - step: 步长，W为周，M为月，其余例如`10min`、`1h`、`1d`为固定步长（从1970-01-01起算）
+    - week_start: 每周开始的星期，0为星期一，6为星期日
+
+    Returns
+    -------
+    datetime64[ns]数组
+    '''
+    t = _to_ns(values)
+    nat = np.isnat(t)
+    ns = t.astype(np.int64)
+    if step == 'M':
+        result = t.astype('datetime64[M]').astype('datetime64[ns]')
+    elif step == 'W':
+        day = ns // _DAY_NS
+        day -= (day + _EPOCH_WEEKDAY - week_start) % 7
+        result = (day * _DAY_NS).astype('datetime64[ns]')
+    else:
+        step_ns = pd.Timedelta(step).value
+        result = (ns // step_ns * step_ns).astype('datetime64[ns]')
+    result[nat] = np.datetime64('NaT')
+    return result
+
+
+def edges(
+    start: pd.Timestamp | str,
+    end: pd.Timestamp | str,
+    step: pd.Timedelta | str,
+    week_start: int = 0,
+) -> pd.DatetimeIndex:
+    '''
+    ~[start, end)范围内的桶边界，首尾为start、end，首尾两个桶可能不完整
+
+    Parameters
+    ----------
+    - start: 开始时刻
+    - end: 结束时刻（不包含）
+    - step: 步长，同floor
+    - week_start: 每周开始的星期，同floor
+    '''
+    start = pd.Timestamp(start)
+    end = pd.Timestamp(end)
+    first = floor(start, step, week_start)[0]
+    if step == 'M':
+        bounds = np.arange(
+            first.astype('datetime64[M]'),
+            end.to_datetime64().astype('datetime64[M]') + 1,
+        ).astype('datetime64[ns]')
+    else:
+        step_ns = 7 * _DAY_NS if step == 'W' else pd.Timedelta(step).value
+        bounds = np.arange(
+            first.astype(np.int64), end.value + step_ns, step_ns
+        ).astype('datetime64[ns]')
+    bounds = pd.DatetimeIndex(bounds)
+    inner = bounds[(bounds > start) & (bounds < end)]
+    return inner.union(pd.DatetimeIndex([start, end]))
+
+
+def split(
+    start,
+    end,
+    bounds: pd.DatetimeIndex,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    ~按桶边界拆分区间[start, end)，跨越多个桶的区间在每个桶中各占一段
+
+    Parameters
+    ----------
+    - start: 区间开始时刻数组
+    - end: 区间结束时刻数组
+    - bounds: 桶边界，由edges得到，范围外的部分被截去
+
+    Returns
+    -------
+    (每段所属区间序号, 每段所属桶序号, 每段时长(纳秒))
+    '''
+    b = bounds.to_numpy('datetime64[ns]').astype(np.int64)
+    s = np.maximum(_to_ns(start).astype(np.int64), b[0])
+    e = np.minimum(_to_ns(end).astype(np.int64), b[-1])
+    valid = np.flatnonzero(e > s)
+    s, e = s[valid], e[valid]
+    # 每个区间覆盖的第一个和最后一个桶
+    first = np.searchsorted(b, s, side='right') - 1
+    last = np.searchsorted(b, e, side='left') - 1
+    count = last - first + 1
+    # 将区间按覆盖的桶展开
+    rep = np.repeat(np.arange(s.size), count)
+    offset = np.arange(rep.size) - np.repeat(np.cumsum(count) - count, count)
+    bucket = first[rep] + offset
+    duration = np.minimum(e[rep], b[bucket + 1]) - np.maximum(s[rep], b[bucket])
+    return valid[rep], bucket, duration
@@ -4,16 +4,13 @@ import numpy as np
 import pandas as pd
 from pandas import DataFrame
 from pyecharts import options as opts
-from pyecharts.charts import Bar
 from pyecharts.charts.basic_charts.bar import Bar
-from pyecharts.charts.basic_charts.gauge import Gauge
 from pyecharts.charts.basic_charts.heatmap import HeatMap
 from pyecharts.charts.basic_charts.line import Line
-from pyecharts.charts.basic_charts.polar import Polar
 from pyecharts.charts.basic_charts.scatter import Scatter
 from pyecharts.charts.composite_charts.grid import Grid
-from pyecharts.commons.utils import JsCode
-from pyecharts.globals import ThemeType
+
+from . import profiling
 
 mycolors = (
     "#2A579A",
@@ -27,90 +24,166 @@ mycolors = (
 )
 
 
-def scatter_json(data: pd.DataFrame, title: str = "", f_size: int = 15):
+def _bounds(values: np.ndarray):
+    """
+    由数据范围计算坐标轴上下限，对齐到跨度数量级的1/10
+
+    Parameters
+    ----------
+    values : ndarray ~ 数值数组，不含nan
+
+    Returns
+    -------
+    (float, float) ~ 下限、上限
+    """
+    if values.size == 0:
+        return 0.0, 1.0
+    lo, hi = float(values.min()), float(values.max())
+    span = hi - lo or abs(lo) or 1.0
+    unit = 10 ** math.floor(math.log10(span)) / 10
+    lo, hi = math.floor(lo / unit) * unit, math.ceil(hi / unit) * unit
+    if hi <= lo:
+        hi = lo + unit
+    return round(lo, 10), round(hi, 10)
+
+
+@profiling.staged('chart')
+def scatter_json(
+    data: pd.DataFrame,
+    title: str = "",
+    f_size: int = 15,
+    max_points: int = 5000,
+    bins: int = 100,
+    min_count: int = 3,
+    outliers: int = 500,
+):
     """
     【散点图】自动生成前端echarts控件需要的图像选项
 
+    点数超过max_points时在服务端按bins×bins网格聚合为密度图，点数不少于min_count的格子按颜色表示点数，
+    其余稀疏格子中的点视为离群点，最多随机抽取outliers个逐点绘制，json大小与原始点数无关
+
     Parameters
     ----------
-    data : DataFrame ~ 需要绘制的数据
+    data : DataFrame ~ 需要绘制的数据，第一列为x，第二列为y，含nan的行忽略
     title : str, optional ~ 图表标题，会显示在左上角, by default ''
     f_size : int, optional ~ 图表字体大小, by default 15
+    max_points : int, optional ~ 逐点绘制的点数上限, by default 5000
+    bins : int, optional ~ 密度图每个方向的格子数, by default 100
+    min_count : int, optional ~ 密度图中按格子绘制的最少点数, by default 3
+    outliers : int, optional ~ 密度图中离群点的抽样数, by default 500
 
     Returns
     -------
     str ~ 已被打包好的json文本字符串，前端只要使用JSON.parse即可使用
     """
     # 处理数据获取x,y
-    x_data = data[data.columns[0]].astype(float).to_numpy().round(4)
-    y_data = data[data.columns[1]].astype(float).to_numpy().round(4)
-    x_bound = math.ceil(max(abs(x_data.max()), abs(x_data.min()))) + 1
+    xy = data[data.columns[:2]].astype(float).to_numpy()
+    xy = xy[~np.isnan(xy).any(axis=1)]
+    # 坐标轴范围由数据决定
+    x_min, x_max = _bounds(xy[:, 0])
+    y_min, y_max = _bounds(xy[:, 1])
     # 创建绘画区
-    chart_scatter = (
-        Scatter(
-            init_opts=opts.InitOpts(
-                # 关闭动画效果
-                animation_opts=opts.AnimationOpts(animation=False),
-            )
+    chart_scatter = Scatter(
+        init_opts=opts.InitOpts(
+            # 关闭动画效果
+            animation_opts=opts.AnimationOpts(animation=False),
         )
-        .add_xaxis(xaxis_data=x_data)  # 添加x轴数据
-        .add_yaxis(  # 添加y轴数据
-            # 数据系列名称
-            series_name="",
-            # 具体数据
-            y_axis=y_data,
-            # 颜色
-            color="firebrick",
-            # 标记大小
-            symbol_size=math.floor(f_size * 0.6),
-            # 设置不显示点数值
+    ).add_xaxis([])
+    visualmap_opts = None
+    if xy.shape[0] <= max_points:
+        points = xy.round(4).tolist()
+    else:
+        count, x_edges, y_edges = np.histogram2d(
+            xy[:, 0], xy[:, 1], bins=bins, range=[[x_min, x_max], [y_min, y_max]]
+        )
+        dense = count >= min_count
+        # 每个点所在格子，与histogram2d一致，最后一个格子包含上限
+        ix = np.clip(np.searchsorted(x_edges, xy[:, 0], side="right") - 1, 0, bins - 1)
+        iy = np.clip(np.searchsorted(y_edges, xy[:, 1], side="right") - 1, 0, bins - 1)
+        sparse = xy[~dense[ix, iy]]
+        if sparse.shape[0] > outliers:
+            # 固定随机种子，相同数据每次抽样结果一致
+            rng = np.random.default_rng(0)
+            sparse = sparse[np.sort(rng.choice(sparse.shape[0], outliers, replace=False))]
+        points = sparse.round(4).tolist()
+        # 密度格子按[格子中心x, 格子中心y, 点数]排列
+        cx, cy = np.nonzero(dense)
+        x_center = ((x_edges[:-1] + x_edges[1:]) / 2)[cx]
+        y_center = ((y_edges[:-1] + y_edges[1:]) / 2)[cy]
+        cells = np.column_stack([x_center, y_center, count[cx, cy]]).round(4).tolist()
+        chart_scatter.add_yaxis(
+            series_name="密度",
+            y_axis=cells,
+            # 方块铺满格子，按绘图区约500像素估计大小
+            symbol="rect",
+            symbol_size=max(2, math.ceil(500 / bins)),
             label_opts=opts.LabelOpts(is_show=False),
         )
-        .set_global_opts(  # 全局配置项
-            # 设置标题
-            title_opts=opts.TitleOpts(
-                title=title,
-                title_textstyle_opts=opts.TextStyleOpts(
-                    font_size=math.ceil(f_size * 1.2),
-                ),
-                pos_left="50%",
-                pos_top="1.5%",
-                text_align="center",
-                text_vertical_align="center",
-            ),
-            # 设置不显示图例
-            legend_opts=opts.LegendOpts(is_show=False),
-            # x轴上下限设置
-            xaxis_opts=opts.AxisOpts(
-                name=str(data.columns[0]),
-                name_location="center",
-                name_gap=math.ceil(f_size * 2),
-                # min_=-x_bound,
-                # max_=x_bound,
-                min_=0,
-                max_=10,
-            ),
-            # y轴上下限设置
-            yaxis_opts=opts.AxisOpts(
-                name=str(data.columns[1]),
-                name_location="center",
-                name_gap=math.ceil(f_size * 3),
-                # min_=math.floor(y_data.min() * 0.9),
-                # max_=math.ceil(y_data.max() * 1.1),
-                min_=0,
-                max_=10,
-            ),
-            # 设置鼠标移动到点上时不显示数值
-            tooltip_opts=opts.TooltipOpts(
-                is_show=False,
-            ),
+        visualmap_opts = opts.VisualMapOpts(
+            min_=min_count,
+            max_=float(count.max()),
+            dimension=2,
+            series_index=0,
+            orient="horizontal",
+            pos_left="center",
+            pos_bottom="0%",
         )
+    chart_scatter = chart_scatter.add_yaxis(  # 添加数据
+        # 数据系列名称
+        series_name="",
+        # 具体数据，[x, y]
+        y_axis=points,
+        # 颜色
+        color="firebrick",
+        # 标记大小
+        symbol_size=math.floor(f_size * 0.6),
+        # 设置不显示点数值
+        label_opts=opts.LabelOpts(is_show=False),
+    ).set_global_opts(  # 全局配置项
+        # 设置标题
+        title_opts=opts.TitleOpts(
+            title=title,
+            title_textstyle_opts=opts.TextStyleOpts(
+                font_size=math.ceil(f_size * 1.2),
+            ),
+            pos_left="50%",
+            pos_top="1.5%",
+            text_align="center",
+            text_vertical_align="center",
+        ),
+        # 设置不显示图例
+        legend_opts=opts.LegendOpts(is_show=False),
+        visualmap_opts=visualmap_opts,
+        # x轴上下限设置
+        xaxis_opts=opts.AxisOpts(
+            type_="value",
+            name=str(data.columns[0]),
+            name_location="center",
+            name_gap=math.ceil(f_size * 2),
+            min_=x_min,
+            max_=x_max,
+        ),
+        # y轴上下限设置
+        yaxis_opts=opts.AxisOpts(
+            type_="value",
+            name=str(data.columns[1]),
+            name_location="center",
+            name_gap=math.ceil(f_size * 3),
+            min_=y_min,
+            max_=y_max,
+        ),
+        # 设置鼠标移动到点上时不显示数值
+        tooltip_opts=opts.TooltipOpts(
+            is_show=False,
+        ),
     )
     # 测试使用，会渲染成html文件查看效果
     # chart_scatter.render('scatter.html')
     return chart_scatter.dump_options_with_quotes()
 
 
+@profiling.staged('chart')
 def bar_json(
     data: pd.DataFrame,
     title: str = "",
@@ -207,6 +280,7 @@ def bar_json(
     return chart_grid.dump_options_with_quotes()
 
 
+@profiling.staged('chart')
 def line_json(
     data: DataFrame,
     xdata: list,
@@ -344,6 +418,104 @@ def line_json(
         return chart_grid.dump_options_with_quotes()
 
 
+@profiling.staged('chart')
+def heatmap_json(
+    data: DataFrame,
+    title: str = "",
+    f_size: int = 15,
+    pieces: list = None,
+    skip_zero: bool = False,
+):
+    """
+    【热力图】自动生成前端echarts控件需要的图像选项
+
+    Parameters
+    ----------
+    data : DataFrame ~ 行为y轴类别，列为x轴类别，值为颜色对应的数值，nan不绘制
+    title : str, optional ~ 图表标题，会显示在左上角, by default ''
+    f_size : int, optional ~ 图表字体大小, by default 15
+    pieces : list, optional ~ 分段颜色，例如`[{"value": 0, "label": "缺失", "color": "#D62728"}]`，
+        为None时按数值范围连续着色, by default None
+    skip_zero : bool, optional ~ 不输出值为0的格子，稀疏数据可大幅减小体积, by default False
+
+    Returns
+    -------
+    str ~ 已被打包好的json文本字符串，前端只要使用JSON.parse即可使用
+    """
+    values = data.to_numpy(dtype=float)
+    # 数据按[x序号, y序号, 数值]排列
+    mask = ~np.isnan(values)
+    if skip_zero:
+        mask &= values != 0
+    y_idx, x_idx = np.nonzero(mask)
+    value = [
+        [x, y, v]
+        for x, y, v in zip(
+            x_idx.tolist(), y_idx.tolist(), values[y_idx, x_idx].round(4).tolist()
+        )
+    ]
+    if pieces is None:
+        visualmap_opts = opts.VisualMapOpts(
+            min_=0 if skip_zero or not value else float(np.nanmin(values)),
+            max_=float(np.nanmax(values)) if value else 1,
+            orient="horizontal",
+            pos_left="center",
+            pos_bottom="0%",
+        )
+    else:
+        visualmap_opts = opts.VisualMapOpts(
+            is_piecewise=True,
+            pieces=pieces,
+            orient="horizontal",
+            pos_left="center",
+            pos_bottom="0%",
+        )
+    chart_heatmap = (
+        HeatMap(
+            init_opts=opts.InitOpts(
+                # 关闭动画效果
+                animation_opts=opts.AnimationOpts(animation=False),
+            )
+        )
+        .add_xaxis([str(x) for x in data.columns])
+        .add_yaxis(
+            series_name="",
+            yaxis_data=[str(y) for y in data.index],
+            value=value,
+            # 设置不显示格子数值
+            label_opts=opts.LabelOpts(is_show=False),
+        )
+        .set_global_opts(
+            # 设置标题
+            title_opts=opts.TitleOpts(
+                title=title,
+                title_textstyle_opts=opts.TextStyleOpts(
+                    font_size=math.ceil(f_size * 1.2),
+                ),
+                pos_left="50%",
+                pos_top="1.5%",
+                text_align="center",
+                text_vertical_align="center",
+            ),
+            legend_opts=opts.LegendOpts(is_show=False),
+            visualmap_opts=visualmap_opts,
+            xaxis_opts=opts.AxisOpts(
+                type_="category",
+                splitarea_opts=opts.SplitAreaOpts(is_show=True),
+            ),
+            yaxis_opts=opts.AxisOpts(
+                type_="category",
+                splitarea_opts=opts.SplitAreaOpts(is_show=True),
+            ),
+            # 横轴类别较多时可缩放
+            datazoom_opts=[opts.DataZoomOpts(type_="inside")],
+        )
+    )
+    # 测试使用，会渲染成html文件查看效果
+    # chart_heatmap.render('heatmap.html')
+    return chart_heatmap.dump_options_with_quotes()
+
+
 if __name__ == "__main__":
     data = pd.DataFrame({"x": [1, 2, 3, 4, 5], "y": [2, 4, 6, 8, 10]})
     j = scatter_json(data)
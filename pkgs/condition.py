@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+@File    : condition.py
+@Time    : 2024/10/23 14:10:00
+@Author  : WHY
+@Version : 1.0
+@Desc    : 故障触发时刻运行工况统计，按风速×功率分箱，全部故障代码一次完成计数
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+# ErrorList中记录的触发时刻运行工况列
+snapshot_info = ['风速', '转速', '发电机转速', '发电机功率', '俯仰角', '功率设定值']
+
+# 分箱结果包含信息list，wind、power为分箱下限
+bin_info = ['code', 'wind', 'power', 'count', 'hours']
+
+# 工况画像包含信息list
+profile_info = [
+    'code',
+    'fault_en',
+    'fault_cn',
+    'count',
+    'hours',
+    'wind_mean',
+    'wind_p90',
+    'power_mean',
+    'power_p90',
+    'high_load_pct',
+]
+
+
+def band_edges(values: np.ndarray, step: float) -> np.ndarray:
+    '''
+    ~按数据范围生成等宽分箱边界，首尾对齐到step的整数倍
+
+    Parameters
+    ----------
+    - values: 数值数组，nan忽略
+    - step: 箱宽
+    '''
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return np.array([0.0, step])
+    lo = np.floor(values.min() / step) * step
+    hi = np.floor(values.max() / step) * step + step
+    # 取整避免浮点累积误差，保证不同代码的箱下限可以对齐
+    return np.arange(lo, hi + step / 2, step).round(6)
+
+
+def bins(
+    df: pd.DataFrame,
+    wind_step: float = 1.0,
+    power_step: float = 500.0,
+) -> pd.DataFrame:
+    '''
+    ~按故障代码统计触发时刻风速×功率各分箱的故障次数和持续小时数，
+    所有代码合并为一个bincount完成，只输出非空分箱
+
+    Parameters
+    ----------
+    - df: 故障明细，包含code、duration及snapshot_info中的风速、发电机功率列
+    - wind_step: 风速箱宽(m/s)
+    - power_step: 功率箱宽(kW)
+    '''
+    df = df.dropna(subset=['code', '风速', '发电机功率'])
+    wind = df['风速'].to_numpy(dtype=float)
+    power = df['发电机功率'].to_numpy(dtype=float)
+    wind_edges = band_edges(wind, wind_step)
+    power_edges = band_edges(power, power_step)
+    n_wind = wind_edges.size - 1
+    n_power = power_edges.size - 1
+    codes, uniques = pd.factorize(df['code'], sort=True)
+    # 与np.histogram2d相同的左闭右开分箱，(代码, 风速箱, 功率箱)展平为一维序号
+    i_wind = np.clip(np.searchsorted(wind_edges, wind, side='right') - 1, 0, n_wind - 1)
+    i_power = np.clip(
+        np.searchsorted(power_edges, power, side='right') - 1, 0, n_power - 1
+    )
+    flat = (codes * n_wind + i_wind) * n_power + i_power
+    size = len(uniques) * n_wind * n_power
+    count = np.bincount(flat, minlength=size)
+    hours = np.bincount(flat, weights=df['duration'].to_numpy(dtype=float), minlength=size)
+    nonzero = np.flatnonzero(count)
+    code_idx, rest = np.divmod(nonzero, n_wind * n_power)
+    wind_idx, power_idx = np.divmod(rest, n_power)
+    return pd.DataFrame(
+        {
+            'code': np.asarray(uniques)[code_idx],
+            'wind': wind_edges[wind_idx],
+            'power': power_edges[power_idx],
+            'count': count[nonzero],
+            'hours': hours[nonzero],
+        },
+        columns=bin_info,
+    )
+
+
+def grid(
+    bin_df: pd.DataFrame,
+    value: str = 'count',
+    codes: list[str] = None,
+    wind_step: float = 1.0,
+    power_step: float = 500.0,
+) -> pd.DataFrame:
+    '''
+    ~将分箱结果展开为热力图矩阵，行为功率箱，列为风速箱，中间缺少的箱补0
+
+    Parameters
+    ----------
+    - bin_df: bins得到的分箱结果
+    - value: count故障次数，hours持续小时数
+    - codes: 只统计的故障代码，为None表示全部代码合计
+    - wind_step: 风速箱宽，与bins一致
+    - power_step: 功率箱宽，与bins一致
+    '''
+    if codes is not None:
+        bin_df = bin_df[bin_df['code'].isin(codes)]
+    df = bin_df.pivot_table(
+        index='power', columns='wind', values=value, aggfunc='sum', fill_value=0
+    )
+    if df.shape[0] == 0:
+        return df
+    return df.reindex(
+        index=band_edges(df.index, power_step)[:-1],
+        columns=band_edges(df.columns, wind_step)[:-1],
+        fill_value=0,
+    )
+
+
+def profile(
+    df: pd.DataFrame,
+    rated: float = None,
+    high_load: float = 0.8,
+) -> pd.DataFrame:
+    '''
+    ~各故障代码触发时刻的工况画像：风速、功率的平均值和90分位数，高负载触发占比(%)
+
+    Parameters
+    ----------
+    - df: 故障明细，包含code、fault_en、fault_cn、duration及snapshot_info列
+    - rated: 额定功率(kW)，为None时取明细中功率设定值的最大值
+    - high_load: 发电机功率不低于rated×high_load时视为高负载
+    '''
+    df = df.dropna(subset=['code'])
+    if rated is None:
+        rated = df['功率设定值'].max() if df.shape[0] > 0 else np.nan
+    df = df.assign(high_load=df['发电机功率'] >= rated * high_load)
+    grouped = df.groupby('code', sort=True)
+    result = grouped.agg(
+        fault_en=('fault_en', 'first'),
+        fault_cn=('fault_cn', 'first'),
+        count=('code', 'size'),
+        hours=('duration', 'sum'),
+        wind_mean=('风速', 'mean'),
+        power_mean=('发电机功率', 'mean'),
+        high_load_pct=('high_load', 'mean'),
+    )
+    result['wind_p90'] = grouped['风速'].quantile(0.9)
+    result['power_p90'] = grouped['发电机功率'].quantile(0.9)
+    result['high_load_pct'] *= 100
+    return result.reset_index()[profile_info]
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+@File    : coverage.py
+@Time    : 2024/10/21 09:40:00
+@Author  : WHY
+@Version : 1.0
+@Desc    : 状态文件完整性位图，每台风机每天占1位，与故障明细分开保存
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+
+class Coverage:
+    '''
+    ~记录每台风机在时间范围内每天是否有可用的状态文件，按位压缩存储
+    '''
+
+    def __init__(self, wt_list: list[int | str], dt_list: pd.DatetimeIndex) -> None:
+        '''
+        Parameters
+        ----------
+        - wt_list: 风机列表
+        - dt_list: 日期列表
+        '''
+        self.wt_list = [str(wt) for wt in wt_list]
+        self.dt_list = pd.DatetimeIndex(dt_list)
+        self._row = {wt: i for i, wt in enumerate(self.wt_list)}
+        # 每行为一台风机，按np.packbits压缩，缺失的日期为0
+        self.bits = np.zeros(
+            (len(self.wt_list), (len(self.dt_list) + 7) // 8), dtype=np.uint8
+        )
+
+    def set(self, wt: int | str, present: np.ndarray) -> None:
+        '''
+        ~设置单台风机各天是否有文件，不在wt_list中的风机追加在最后
+
+        Parameters
+        ----------
+        - wt: 风机编号
+        - present: 与dt_list等长的bool数组
+        '''
+        wt = str(wt)
+        if wt not in self._row:
+            self._row[wt] = len(self.wt_list)
+            self.wt_list.append(wt)
+            self.bits = np.vstack([self.bits, np.zeros((1, self.bits.shape[1]), np.uint8)])
+        self.bits[self._row[wt]] = np.packbits(np.asarray(present, dtype=bool))
+
+    def matrix(self) -> np.ndarray:
+        '''
+        ~展开为风机×日期的bool矩阵
+        '''
+        return np.unpackbits(self.bits, axis=1, count=len(self.dt_list)).astype(bool)
+
+    def missing(self, wt: int | str) -> list[str]:
+        '''
+        ~单台风机缺少文件的日期，格式为`%Y%m%d`
+
+        Parameters
+        ----------
+        - wt: 风机编号
+        '''
+        row = np.unpackbits(self.bits[self._row[str(wt)]], count=len(self.dt_list))
+        return self.dt_list[row == 0].strftime('%Y%m%d').to_list()
+
+    def ratio(self) -> pd.Series:
+        '''
+        ~各风机有文件的天数占比(%)
+        '''
+        if len(self.dt_list) == 0:
+            return pd.Series(100.0, index=self.wt_list)
+        return pd.Series(100 * self.matrix().mean(axis=1), index=self.wt_list)
+
+    def to_frame(self) -> pd.DataFrame:
+        '''
+        ~转为宽表，行为风机编号，列为日期，值为是否有文件
+        '''
+        return pd.DataFrame(self.matrix(), index=self.wt_list, columns=self.dt_list)
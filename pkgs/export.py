@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+@File    : export.py
+@Time    : 2024/10/25 10:20:00
+@Author  : WHY
+@Version : 1.0
+@Desc    : 明细表分批导出为CSV或Parquet字节流，逐批编码，不在内存中拼接整张表
+"""
+
+from __future__ import annotations
+
+import codecs
+import io
+from typing import Iterable, Iterator
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow为可选依赖，未安装时只能导出CSV
+    pa = None
+    pq = None
+
+# 每批写出的行数
+BATCH_ROWS = 10_000
+
+# 支持的导出格式及对应的Content-Type
+formats = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def batches(frames: Iterable[pd.DataFrame], batch_rows: int = BATCH_ROWS):
+    '''
+    ~将多个DataFrame按行切分为不超过batch_rows行的批次，空表跳过
+
+    Parameters
+    ----------
+    - frames: DataFrame序列，通常每台风机一个
+    - batch_rows: 每批行数
+    '''
+    for df in frames:
+        for i in range(0, df.shape[0], batch_rows):
+            yield df.iloc[i : i + batch_rows]
+
+
+def csv_stream(
+    frames: Iterable[pd.DataFrame],
+    columns: list[str],
+    encoding: str = 'gbk',
+    batch_rows: int = BATCH_ROWS,
+) -> Iterator[bytes]:
+    '''
+    ~逐批生成CSV字节，表头只写一次，无法编码的字符替换为?
+
+    Parameters
+    ----------
+    - frames: DataFrame序列，列与columns一致
+    - columns: 列名
+    - encoding: 文件编码，utf-8-sig只在开头写入BOM
+    - batch_rows: 每批行数
+    '''
+    encoder = codecs.getincrementalencoder(encoding)(errors='replace')
+    yield encoder.encode(pd.DataFrame(columns=columns).to_csv(index=False))
+    for batch in batches(frames, batch_rows):
+        yield encoder.encode(batch[columns].to_csv(index=False, header=False))
+    tail = encoder.encode('', final=True)
+    if tail:
+        yield tail
+
+
+def _arrow_schema(columns: list[str], dtypes: dict) -> 'pa.Schema':
+    '''
+    ~按pandas列类型生成固定的Arrow表结构，各批次一致，全空的列不会被推断为null类型
+    '''
+    fields = []
+    for col in columns:
+        dtype = dtypes.get(col)
+        if dtype is not None and pd.api.types.is_datetime64_any_dtype(dtype):
+            fields.append(pa.field(col, pa.timestamp('ns')))
+        elif dtype is not None and pd.api.types.is_bool_dtype(dtype):
+            fields.append(pa.field(col, pa.bool_()))
+        elif dtype is not None and pd.api.types.is_integer_dtype(dtype):
+            fields.append(pa.field(col, pa.int64()))
+        elif dtype is not None and pd.api.types.is_float_dtype(dtype):
+            fields.append(pa.field(col, pa.float64()))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    return pa.schema(fields)
+
+
+def parquet_stream(
+    frames: Iterable[pd.DataFrame],
+    columns: list[str],
+    dtypes: dict = None,
+    batch_rows: int = BATCH_ROWS,
+) -> Iterator[bytes]:
+    '''
+    ~逐批写入Parquet行组并生成字节，需要安装pyarrow
+
+    Parameters
+    ----------
+    - frames: DataFrame序列，列与columns一致
+    - columns: 列名
+    - dtypes: 各列的pandas类型，未指定的列按字符串写出
+    - batch_rows: 每批行数，即每个行组的行数
+    '''
+    if pa is None:
+        raise ImportError('导出Parquet需要安装pyarrow')
+    schema = _arrow_schema(columns, dtypes or {})
+    sink = io.BytesIO()
+    writer = pq.ParquetWriter(sink, schema)
+
+    def drain() -> bytes:
+        # 取出已写入的字节并清空缓冲区
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    try:
+        for batch in batches(frames, batch_rows):
+            batch = batch[columns].copy()
+            for field in schema:
+                if field.type == pa.string():
+                    # 混合类型的object列统一为字符串，缺失值写为null
+                    batch[field.name] = batch[field.name].astype('string')
+            writer.write_table(
+                pa.Table.from_pandas(batch, schema=schema, preserve_index=False)
+            )
+            data = drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield drain()
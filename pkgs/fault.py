@@ -11,11 +11,16 @@ from __future__ import annotations
 
 import warnings
 from pathlib import Path
-from traceback import print_exc
 from typing import Literal
 
+import numpy as np
 import pandas as pd
 
+from . import bucket, profiling, validate
+from .coverage import Coverage
+from .mirror import Mirror
+from .store import ParseStore
+
 
 def time_at(dt: pd.Timestamp | str, step: pd.Timedelta | str) -> pd.Timestamp:
     '''
@@ -24,16 +29,9 @@ def time_at(dt: pd.Timestamp | str, step: pd.Timedelta | str) -> pd.Timestamp:
     Parameters
     ----------
     dt: 时间日期
-    step: 时间步长
+    step: 时间步长，也可以为W周、M月，见bucket.floor
     '''
-    dt: pd.DatetimeIndex = pd.to_datetime([dt])
-    step: pd.Timedelta = pd.Timedelta(step)
-    t = pd.to_datetime(
-        ((dt.astype('int64') // 10**9) // int(step.total_seconds()))
-        * int(step.total_seconds()),
-        unit='s',
-    )[0]
-    return t
+    return pd.Timestamp(bucket.floor(dt, step)[0])
 
 
 class FaultStatistics:
@@ -68,7 +66,6 @@ class FaultStatistics:
         'fault_en',
         'fault_cn',
         'timedelta',
-        'lose_file',
     ]
 
     def __init__(
@@ -78,6 +75,9 @@ class FaultStatistics:
         wt_list: list[int | str] = None,
         start: str = None,
         end: str = None,
+        store: ParseStore = None,
+        memory_map: bool = False,
+        mirror: Mirror = None,
     ) -> None:
         '''
         ~初始化故障代码分析类
@@ -89,11 +89,17 @@ class FaultStatistics:
         - wt_list: 风机列表，例如`wt_list=[1, 2, 3, 4]`
         - start: 开始日期，包含本天，例如`start='20231201'`，为None表示30天前
         - end: 结束日期，包含本天，例如`start='20231221'`，为None表示为昨天
+        - store: 解析结果缓存，为None表示每次都重新解析文件
+        - memory_map: 是否使用内存映射读取文件，适合本地磁盘
+        - mirror: 本地镜像，不为None时从本地副本读取文件
         '''
         # 去除ParserWarning警告，该警告会在读取文件时出现，因为表头结尾无分隔符但是数据结尾有分隔符
         warnings.filterwarnings("ignore", category=pd.errors.ParserWarning)
         # 处理输入参数
         self.src_path = Path(src_path)
+        self.store = store
+        self.memory_map = memory_map
+        self.mirror = mirror
         self.fault_map_df: pd.DataFrame = None
         if not fault_map_path is None:
             # 故障映射表
@@ -125,8 +131,24 @@ class FaultStatistics:
         self.fault_df: pd.DataFrame = None
         # 存储简易故障信息的DataFrame
         self.fault_simple_df: pd.DataFrame = None
-        # 存储丢失文件的dict
-        self.lose_file: dict[str, list[str]] = None
+        # 各风机每天是否有可用的状态文件
+        self.coverage: Coverage = None
+        # 未通过校验或解析失败的文件，见validate.quarantine_info
+        self.quarantine: list[dict] = []
+
+    @property
+    def lose_file(self) -> dict[str, list[str]]:
+        '''
+        ~各风机缺少文件的日期，由coverage得到，没有缺失的风机不包含在内
+        '''
+        if self.coverage is None:
+            return {}
+        result = {}
+        for wt in self.coverage.wt_list:
+            days = self.coverage.missing(wt)
+            if len(days) > 0:
+                result[wt] = days
+        return result
 
     @classmethod
     def read_file(
@@ -134,6 +156,7 @@ class FaultStatistics:
         path: str,
         wt_id: str = '_',
         file_name: str = '_',
+        memory_map: bool = False,
     ) -> pd.DataFrame:
         '''
         ~读取单个状态代码文件,并筛选
@@ -143,6 +166,7 @@ class FaultStatistics:
         - path: 状态代码文件路径
         - wt_id: 风机编号
         - file_name: 文件名称
+        - memory_map: 是否使用内存映射读取文件
         '''
         skiprows = 11
         df = pd.read_csv(
@@ -151,10 +175,16 @@ class FaultStatistics:
             header=0,
             index_col=False,
             sep='\t',
+            memory_map=memory_map,
         )
         # 去除列索引前后空白字符
         df.columns = [col.strip() for col in df.columns]
         df = df[['TimeStampUTC', 'TrigKey']]
+        if df.shape[0] == 0:
+            # 只有表头的文件表示当天没有状态记录
+            return pd.DataFrame(
+                columns=['time', 'code', 'fault_en', 'row_num', 'wt_id', 'file_name']
+            )
         # 去除数据前后空白字符
         df = df.map(lambda e: e.strip())
         # 时间列转化为Timestamp
@@ -243,14 +273,6 @@ class FaultStatistics:
                 val = first_trigger_df.loc[idx, 'fault_en']
                 # 以sc_开头并且不为启机代码的最先出现的代码为首触故障
                 if val.lower().startswith('sc_') and val != self.turbine_start:
-                    fault_zh = '_'
-                    if not self.fault_map_df is None:
-                        try:
-                            fault_zh = self.fault_map_df.loc[
-                                first_trigger_df.loc[idx, 'code'], '中文描述'
-                            ]
-                        except:
-                            fault_zh = '无中文映射'
                     fault_df.loc[dfx.index[0]] = [
                         dfx['wt_id'].iloc[0],  # 风机编号
                         dfx['file_name'].iloc[0],  # 状态代码文件名称
@@ -260,61 +282,116 @@ class FaultStatistics:
                         *first_trigger_df.loc[
                             idx, ['time', 'code', 'fault_en']
                         ],  # 首触故障时刻，状态代码，状态英文描述
-                        fault_zh,  # 状态中文描述
+                        '_',  # 状态中文描述，之后统一映射
                         dfx['time'].iloc[-1] - dfx['time'].iloc[0],  # 故障持续时长
                     ]
                     break
         fault_df = fault_df.reset_index(drop=True)
+        if not self.fault_map_df is None:
+            fault_df['fault_cn'] = self._map_cn(fault_df['code'])
 
         return fault_df
 
+    def _map_cn(self, code: pd.Series) -> pd.Series:
+        '''
+        ~将故障代码映射为中文描述，映射表中没有的代码为`无中文映射`
+
+        Parameters
+        ----------
+        - code: 故障代码
+        '''
+        names = self.fault_map_df['中文描述']
+        names = names[~names.index.duplicated()]
+        # 反连接找出映射表中没有的代码
+        missing = ~code.isin(names.index)
+        if missing.any():
+            print(f'无中文映射的故障代码: {sorted(code[missing].unique())}')
+        return code.map(names).where(~missing, '无中文映射')
+
+    def read_wt(self, wt: str) -> pd.DataFrame | None:
+        '''
+        ~读取单台风机时间范围内的所有状态代码文件，各天是否读取成功记入coverage
+
+        Parameters
+        ----------
+        - wt: 风机编号
+        '''
+        if self.coverage is None:
+            self.coverage = Coverage(self.wt_list, self.dt_list)
+        present = np.zeros(len(self.dt_list), dtype=bool)
+        local = lambda p: p if self.mirror is None else self.mirror.local(p)
+        reader = lambda p: self.read_file(
+            local(p),
+            wt_id=wt,
+            file_name=p.name,
+            memory_map=self.memory_map,
+        )
+        wt_df_list = []
+        for i, dt in enumerate(self.dt_list):
+            dt_str = dt.strftime("%Y%m%d")
+            file = self.src_path / wt / f'BufferStatuscodes{dt_str}.txt'
+            print(f'风机: {wt:<6}文件名: {file.name:<40}', end='')
+            if not file.exists():
+                print('--不存在')
+                continue
+            # 已缓存的文件曾经解析成功，无需校验
+            if self.store is None or not self.store.contains(file):
+                # 校验本地副本，启用镜像时文件只经网络共享读取一次
+                problem = validate.check(local(file), **validate.onshore_signature)
+                if problem is not None and problem[0] == 'empty':
+                    # 空文件表示当天没有状态记录，不隔离
+                    present[i] = True
+                    print('--成功(空表)')
+                    continue
+                if problem is not None:
+                    print(f'--隔离({problem[1]})')
+                    self.quarantine.append(validate.record(wt, file, *problem))
+                    continue
+            try:
+                with profiling.stage('read_file'):
+                    if self.store is None:
+                        df = reader(file)
+                    else:
+                        df = self.store.get(file, reader)
+            except profiling.MemoryBudgetExceeded:
+                raise
+            except Exception as exc:
+                # 通过校验但解析失败，同样记入隔离报告
+                print(f'--失败({exc!r})')
+                self.quarantine.append(validate.record(wt, file, 'parse', repr(exc)))
+                continue
+            if df.shape[0] > 0:
+                wt_df_list.append(df)
+            present[i] = True
+            print('--成功')
+        self.coverage.set(wt, present)
+        if len(wt_df_list) > 0:
+            # 合并数据
+            with profiling.stage('concat'):
+                return pd.concat(wt_df_list, axis=0, ignore_index=True)
+        return None
+
     def get_fault(self) -> pd.DataFrame | None:
         '''
         ~获取实例故障代码汇总
         '''
         self.fault_df = pd.DataFrame(columns=self._fault_info)
-        self.lose_file = {}
+        self.coverage = Coverage(self.wt_list, self.dt_list)
+        self.quarantine = []
         all_df_list = []
         # 循环读取文件
         for wt in self.wt_list:
-            wt_df_list = []
-            for dt in self.dt_list:
-                dt_str = dt.strftime("%Y%m%d")
-                file = self.src_path / wt / f'BufferStatuscodes{dt_str}.txt'
-                print(file)
-                try:
-                    print(f'风机: {wt:<6}文件名: {file.name:<40}', end='')
-                    df = self.read_file(file, wt_id=wt, file_name=file.name)
-                    wt_df_list.append(df)
-                    print('--成功')
-                except FileNotFoundError:
-                    print('--不存在')
-                    # 将该天加入丢失文件dict
-                    if wt in self.lose_file:
-                        self.lose_file[wt].append(dt_str)
-                    else:
-                        self.lose_file[wt] = [dt_str]
-                except pd.errors.EmptyDataError:
-                    print('--成功(空表)')
-                except:
-                    print('--失败')
-                    print_exc()
-            if len(wt_df_list) > 0:
-                # 合并数据
-                df = pd.concat(wt_df_list, axis=0, ignore_index=True)
+            df = self.read_wt(wt)
+            if df is not None:
                 # 分析故障
-                df = self._get_df_fault(df=df)
+                with profiling.stage('get_df_fault'):
+                    df = self._get_df_fault(df=df)
                 all_df_list.append(df)
         if len(all_df_list) > 0:
             # 合并数据
             self.fault_df = pd.concat(all_df_list, axis=0, ignore_index=True)
 
-        # 将丢失文件加入故障信息数据
-        for wt in self.lose_file.keys():
-            for dt in self.lose_file[wt]:
-                self.fault_df.loc[
-                    self.fault_df.shape[0] + 1, ['wt_id', 'file_name']
-                ] = [wt, f'{dt}_lose']
+        # 缺少的文件记录在coverage中，故障信息数据只包含故障
         self.fault_df = self.fault_df[self.fault_df['fault_en'] != 'SC_WaitingForWind']
 
         self.fault_df['wt_id'] = self.fault_df['wt_id'].astype('int')
@@ -330,11 +407,7 @@ class FaultStatistics:
             self.get_fault()
         self.fault_simple_df = pd.DataFrame(columns=self._fault_simple_info)
         for wt_id, dfx in self.fault_df.groupby('wt_id'):
-            lose_file = dfx['file_name'][
-                dfx['file_name'].str.endswith('lose')
-            ].values.tolist()
-            dfx = dfx[~(dfx['file_name'].str.endswith('lose'))]
-            # ['wt_id', 'code', 'count', 'fault_en','fault_cn', 'timedelta', 'lose_file']
+            # ['wt_id', 'code', 'count', 'fault_en','fault_cn', 'timedelta']
             for code, dfx1 in dfx.groupby('code'):
                 self.fault_simple_df.loc[f'{wt_id}&{code}'] = [
                     wt_id,
@@ -343,12 +416,7 @@ class FaultStatistics:
                     dfx1['fault_en'].iloc[0],
                     dfx1['fault_cn'].iloc[0],
                     dfx1['timedelta'].sum(),
-                    '_',
                 ]
-            self.fault_simple_df.loc[f'{wt_id}&lose', 'lose_file'] = (
-                f"[{','.join(lose_file)}]"
-            )
-            self.fault_simple_df.loc[f'{wt_id}&lose', 'wt_id'] = wt_id
         self.fault_simple_df['wt_id'] = self.fault_simple_df['wt_id'].astype('int')
         self.fault_simple_df.sort_values('wt_id')
         return self.fault_simple_df
@@ -392,6 +460,12 @@ def fault_control(
         index=False,
         encoding='gbk',
     )
+    # 各风机每天是否有状态文件
+    fs.coverage.to_frame().astype(int).to_csv(
+        doc_path / f'coverage_{(today - pd.Timedelta("1d")).strftime("%Y%m%d")}.csv',
+        date_format='%Y-%m-%d',
+        encoding='gbk',
+    )
 
 
 if __name__ == '__main__':
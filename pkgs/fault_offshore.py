@@ -7,15 +7,24 @@
 @Desc    : None
 """
 from __future__ import annotations
-from traceback import print_exc
 import pandas as pd
 from pathlib import Path
 import csv
 
+from . import profiling, validate
+from .mirror import Mirror
+from .store import ParseStore
+
 
 class FaultStatisticsOffshore:
 
-    def __init__(self, fault_map_path: str | Path) -> None:
+    def __init__(
+        self,
+        fault_map_path: str | Path,
+        store: ParseStore = None,
+        memory_map: bool = False,
+        mirror: Mirror = None,
+    ) -> None:
 
         self.header = {
             'SeqNo': '序号',
@@ -32,40 +41,136 @@ class FaultStatisticsOffshore:
             'Error': '持续时间',
         }
         self.fault_map_df = self.get_map(fault_map_path)
+        # 解析结果缓存，为None表示每次都重新解析文件
+        self.store = store
+        # 是否使用内存映射读取文件，适合本地磁盘
+        self.memory_map = memory_map
+        # 本地镜像，不为None时从本地副本读取文件
+        self.mirror = mirror
+        # 未通过校验或解析失败的文件，见validate.quarantine_info
+        self.quarantine: list[dict] = []
 
-    def get_single(self, wt: str, src_path: str | Path, start: str, end: str):
+    @staticmethod
+    def read_file(path: str | Path, memory_map: bool = False) -> pd.DataFrame:
+        '''
+        ~读取单个ErrorList文件
+
+        Parameters
+        ----------
+        - path: ErrorList文件路径
+        - memory_map: 是否使用内存映射读取文件
+        '''
+        return pd.read_csv(
+            path,
+            skiprows=8,
+            skipfooter=1,
+            encoding='utf8',
+            header=None,
+            engine='python',
+            memory_map=memory_map,
+        )
+
+    def get_detail(
+        self, wt: str, src_path: str | Path, start: str, end: str
+    ) -> pd.DataFrame:
+        '''
+        ~读取单台风机时间范围内的ErrorList文件，返回逐条故障明细
+
+        Parameters
+        ----------
+        - wt: 风机编号，例如`001#`
+        - src_path: 包含Statuscode文件夹的路径
+        - start: 开始日期
+        - end: 结束日期
+
+        Returns
+        -------
+        故障明细，attrs['duplicates']为去除的重复记录数
+        '''
         src_path = Path(src_path)
         start = pd.to_datetime(start)
         end = pd.to_datetime(end)
+        local = lambda p: p if self.mirror is None else self.mirror.local(p)
+        reader = lambda p: self.read_file(local(p), memory_map=self.memory_map)
         df_list = []
-        for file in (src_path / 'Statuscode' / wt).iterdir():
-            if file.name.startswith('ErrorList') and file.suffix == '.csv':
-                try:
-                    dt = pd.to_datetime(file.stem[9:])
-                    if start <= dt <= end:
-                        print(file)
-                        df = pd.read_csv(
-                            file,
-                            skiprows=8,
-                            skipfooter=1,
-                            encoding='utf8',
-                            header=None,
-                            engine='python',
-                        )
-                        df_list.append(df)
-                except:
-                    print_exc()
-        df = pd.concat(df_list, axis=0, ignore_index=True)
+        for file in sorted((src_path / 'Statuscode' / wt).glob('ErrorList*.csv')):
+            dt = pd.to_datetime(file.stem[9:], errors='coerce')
+            if pd.isna(dt):
+                self.quarantine.append(
+                    validate.record(wt, file, 'name', '文件名中没有日期')
+                )
+                continue
+            if not start <= dt <= end:
+                continue
+            print(file)
+            # 已缓存的文件曾经解析成功，无需校验
+            if self.store is None or not self.store.contains(file):
+                # 校验本地副本，启用镜像时文件只经网络共享读取一次
+                problem = validate.check(local(file), **validate.offshore_signature)
+                if problem is not None:
+                    print(f'--隔离({problem[1]})')
+                    self.quarantine.append(validate.record(wt, file, *problem))
+                    continue
+            try:
+                with profiling.stage('read_file'):
+                    if self.store is None:
+                        df = reader(file)
+                    else:
+                        df = self.store.get(file, reader)
+            except profiling.MemoryBudgetExceeded:
+                raise
+            except Exception as exc:
+                # 通过校验但解析失败，同样记入隔离报告
+                print(f'--失败({exc!r})')
+                self.quarantine.append(validate.record(wt, file, 'parse', repr(exc)))
+                continue
+            if df.shape[0] > 0:
+                df_list.append(df)
+        if len(df_list) == 0:
+            df = pd.DataFrame(
+                columns=[*self.header.values(), '故障代码', '故障描述_中文', '故障等级']
+            )
+            df.attrs['duplicates'] = 0
+            return df
+        with profiling.stage('concat'):
+            df = pd.concat(df_list, axis=0, ignore_index=True)
         df.columns = self.header.values()
         df[['触发时间', '故障描述_英文', '复位时间', '持续时间']] = df[
             ['触发时间', '故障描述_英文', '复位时间', '持续时间']
         ].apply(lambda x: x.str.strip())
+        # 控制器导出的时间窗口互相重叠，同一条记录可能出现在多个文件中，按(序号, 触发时间)去重
+        duplicated = df.duplicated(subset=['序号', '触发时间'], keep='first')
+        df = df[~duplicated].reset_index(drop=True)
+        df.attrs['duplicates'] = int(duplicated.sum())
+        if df.attrs['duplicates'] > 0:
+            print(f'去除重复记录: {df.attrs["duplicates"]}条')
         df['持续时间'] = -pd.to_timedelta(df['持续时间'])
         df = df[df['持续时间'] > pd.to_timedelta(0)]
         df['故障代码'] = df['故障描述_英文'].str.split('_SC_', expand=True)[0]
         df.index = df['故障代码']
-        df['故障描述_中文'] = self.fault_map_df.loc[df['故障代码'], '故障描述_中文']
-        df['故障等级'] = self.fault_map_df.loc[df['故障代码'], '故障等级']
+        # 映射表中没有的代码（反连接）不再抛出KeyError，中文描述标记为无中文映射
+        fault_map_df = self.fault_map_df[~self.fault_map_df.index.duplicated()]
+        missing = ~df['故障代码'].isin(fault_map_df.index)
+        if missing.any():
+            print(f'无中文映射的故障代码: {sorted(df["故障代码"][missing].unique())}')
+        df['故障描述_中文'] = (
+            df['故障代码'].map(fault_map_df['故障描述_中文']).where(~missing, '无中文映射')
+        )
+        df['故障等级'] = df['故障代码'].map(fault_map_df['故障等级'])
+        return df
+
+    def get_single(self, wt: str, src_path: str | Path, start: str, end: str):
+        '''
+        ~单台风机按故障代码汇总的故障次数和持续时间(小时)
+
+        Parameters
+        ----------
+        - wt: 风机编号，例如`001#`
+        - src_path: 包含Statuscode文件夹的路径
+        - start: 开始日期
+        - end: 结束日期
+        '''
+        df = self.get_detail(wt=wt, src_path=src_path, start=start, end=end)
 
         result_df = pd.DataFrame(
             columns=[
@@ -85,6 +190,7 @@ class FaultStatisticsOffshore:
             result_df.loc[error_code, '持续时间'] = (
                 group['持续时间'].sum().total_seconds() / 3600
             )
+        result_df.attrs['duplicates'] = df.attrs['duplicates']
         return result_df
 
     def get_map(self, fault_map_path: str | Path) -> pd.DataFrame:
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+@File    : mirror.py
+@Time    : 2024/10/18 10:30:00
+@Author  : WHY
+@Version : 1.0
+@Desc    : 网络共享数据的本地镜像，首次访问时复制到本地磁盘，按容量LRU淘汰
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+class Mirror:
+    '''
+    ~按远程文件路径、大小、修改时间将文件复制到本地，远程文件变化后重新复制
+
+    本地文件的修改时间即最近访问时间，超出容量时删除最久未访问的文件
+    '''
+
+    def __init__(self, mirror_path: str | Path, capacity: int) -> None:
+        '''
+        Parameters
+        ----------
+        - mirror_path: 本地镜像文件夹路径
+        - capacity: 镜像容量上限(字节)
+        '''
+        self.mirror_path = Path(mirror_path)
+        self.mirror_path.mkdir(parents=True, exist_ok=True)
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        # 镜像总大小估计值，超出容量时重新扫描
+        self._size = sum(entry.stat().st_size for entry in self._entries())
+
+    def __getstate__(self) -> dict:
+        # 锁不能序列化，传递到子进程时重新创建
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _entries(self) -> list[Path]:
+        '''
+        ~全部镜像文件，不含正在写入的临时文件
+        '''
+        return [entry for entry in self.mirror_path.iterdir() if entry.suffix != '.tmp']
+
+    def _prefix(self, path: Path) -> str:
+        '''
+        ~远程文件对应的镜像文件名前缀
+        '''
+        return hashlib.sha1(str(Path(path).absolute()).encode('utf-8')).hexdigest()
+
+    def _entry(self, path: Path, stat: os.stat_result) -> Path:
+        '''
+        ~远程文件当前版本对应的镜像文件，保留原扩展名
+        '''
+        return (
+            self.mirror_path
+            / f'{self._prefix(path)}_{stat.st_size}_{stat.st_mtime_ns}{path.suffix}'
+        )
+
+    def local(self, path: str | Path) -> Path:
+        '''
+        ~获取远程文件的本地副本路径，未镜像时先复制，远程文件不存在时抛出FileNotFoundError
+
+        Parameters
+        ----------
+        - path: 远程文件路径
+        '''
+        path = Path(path)
+        stat = os.stat(path)
+        entry = self._entry(path, stat)
+        try:
+            # 更新修改时间作为最近访问时间
+            os.utime(entry)
+            return entry
+        except FileNotFoundError:
+            pass
+        # 先复制到临时文件再替换，避免其他线程或进程读到复制了一半的文件
+        tmp = entry.with_name(f'{entry.name}.{os.getpid()}_{threading.get_ident()}.tmp')
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, entry)
+        for old in self.mirror_path.glob(f'{self._prefix(path)}_*'):
+            if old != entry and old.suffix != '.tmp':
+                self._remove(old)
+        with self._lock:
+            self._size += stat.st_size
+            if self._size > self.capacity:
+                self._evict(keep=entry)
+        return entry
+
+    def prefetch(self, paths: list[str | Path], max_workers: int = 4) -> None:
+        '''
+        ~并发复制多个远程文件到本地，不存在或复制失败的文件跳过
+
+        Parameters
+        ----------
+        - paths: 远程文件路径
+        - max_workers: 同时复制的文件数
+        '''
+        def copy(path):
+            try:
+                self.local(path)
+            except OSError:
+                pass
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            list(pool.map(copy, paths))
+
+    def _remove(self, entry: Path) -> None:
+        '''
+        ~删除镜像文件，文件正在被读取(Windows)或已被删除时跳过
+        '''
+        try:
+            entry.unlink()
+        except OSError:
+            pass
+
+    def _evict(self, keep: Path = None) -> None:
+        '''
+        ~按最近访问时间从旧到新删除镜像文件，直到总大小不超过容量
+
+        Parameters
+        ----------
+        - keep: 不删除的文件，通常为刚复制的文件
+        '''
+        stats = []
+        for entry in self._entries():
+            try:
+                stats.append((entry, entry.stat()))
+            except FileNotFoundError:
+                continue
+        stats.sort(key=lambda item: item[1].st_mtime_ns)
+        size = sum(stat.st_size for _, stat in stats)
+        for entry, stat in stats:
+            if size <= self.capacity:
+                break
+            if entry == keep:
+                continue
+            self._remove(entry)
+            size -= stat.st_size
+        self._size = size
@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+"""
+@File    : power_curve.py
+@Time    : 2024/10/24 09:30:00
+@Author  : WHY
+@Version : 1.0
+@Desc    : 基于10分钟SCADA数据的功率曲线与停机损失电量，按风机-月份缓存分箱统计量
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Iterator
+
+import numpy as np
+import pandas as pd
+
+# 风速分箱宽度(m/s)，与IEC 61400-12-1一致，箱中心为0.5的整数倍
+WIND_BIN = 0.5
+# 风速分箱上限(m/s)，超出的样本归入最后一箱
+WIND_MAX = 30.0
+# 每个风速箱至少的样本数，少于该值的箱不用于功率曲线
+MIN_BIN_COUNT = 3
+# 10分钟样本对应的小时数
+SAMPLE_HOURS = 1 / 6
+
+# 风速箱中心
+wind_bins = np.arange(0, WIND_MAX + WIND_BIN / 2, WIND_BIN)
+
+# 风机-月份分箱统计量包含信息list
+# - count、wind_sum、power_sum、power_sq_sum: 正常运行样本数及风速、功率的和、功率平方和
+# - down_count: 落在停机区间内的样本数，乘以参考功率即为损失电量
+stats_info = [
+    'wt_id',
+    'month',
+    'bin',
+    'count',
+    'wind_sum',
+    'power_sum',
+    'power_sq_sum',
+    'down_count',
+]
+
+# 功率曲线包含信息list
+curve_info = ['wt_id', 'bin', 'count', 'wind_mean', 'power_mean', 'power_std']
+
+
+def bin_index(wind: np.ndarray) -> np.ndarray:
+    '''
+    ~风速对应的分箱序号，负风速归入第一箱
+
+    Parameters
+    ----------
+    - wind: 风速数组(m/s)
+    '''
+    return np.clip(np.rint(wind / WIND_BIN), 0, wind_bins.size - 1).astype(np.int64)
+
+
+def in_intervals(
+    time: np.ndarray,
+    start: np.ndarray,
+    end: np.ndarray,
+) -> np.ndarray:
+    '''
+    ~时刻是否落在任一区间[start, end)内，区间须已合并且按开始时刻排序
+
+    Parameters
+    ----------
+    - time: datetime64[ns]时刻数组
+    - start: 区间开始时刻
+    - end: 区间结束时刻
+    '''
+    if len(start) == 0:
+        return np.zeros(len(time), dtype=bool)
+    i = np.searchsorted(start, time, side='right') - 1
+    return (i >= 0) & (time < end[np.maximum(i, 0)])
+
+
+def accumulate(
+    wt_codes: np.ndarray,
+    n_wt: int,
+    wind: np.ndarray,
+    power: np.ndarray,
+    down: np.ndarray,
+) -> dict[str, np.ndarray]:
+    '''
+    ~多台风机的样本一次bincount完成分箱统计，结果为(风机, 风速箱)矩阵
+
+    Parameters
+    ----------
+    - wt_codes: 每个样本的风机序号，0至n_wt-1
+    - n_wt: 风机数
+    - wind: 风速(m/s)
+    - power: 有功功率(kW)
+    - down: 样本是否处于停机区间
+    '''
+    flat = wt_codes * wind_bins.size + bin_index(wind)
+    size = n_wt * wind_bins.size
+    shape = (n_wt, wind_bins.size)
+    run = ~down
+
+    def count(weights=None, mask=run):
+        return np.bincount(
+            flat[mask],
+            weights=None if weights is None else weights[mask],
+            minlength=size,
+        ).reshape(shape)
+
+    return {
+        'count': count().astype(np.int64),
+        'wind_sum': count(wind),
+        'power_sum': count(power),
+        'power_sq_sum': count(power * power),
+        'down_count': count(mask=down).astype(np.int64),
+    }
+
+
+class ScadaSource:
+    '''
+    ~10分钟SCADA数据源，每台风机一个文件夹，文件名包含日期或月份，按风机-月份缓存分箱统计量
+    '''
+
+    def __init__(
+        self,
+        src_path: str | Path,
+        store_path: str | Path,
+        columns: dict[str, str],
+        pattern: str = '{wt}/*{month}*.csv',
+        encoding: str = 'utf-8',
+        chunksize: int = 100_000,
+    ) -> None:
+        '''
+        Parameters
+        ----------
+        - src_path: 数据根目录
+        - store_path: 分箱统计量缓存文件夹
+        - columns: 文件中的列名，键为time、wind、power
+        - pattern: 单台风机单月文件的glob模式，{wt}为风机编号，{month}为`%Y%m`
+        - encoding: 文件编码
+        - chunksize: 分块读取的行数，大文件不一次读入内存
+        '''
+        self.src_path = Path(src_path)
+        self.store_path = Path(store_path)
+        self.store_path.mkdir(parents=True, exist_ok=True)
+        self.columns = columns
+        self.pattern = pattern
+        self.encoding = encoding
+        self.chunksize = chunksize
+
+    def turbines(self) -> list[str]:
+        '''
+        ~数据根目录下的全部风机编号
+        '''
+        if not self.src_path.is_dir():
+            return []
+        return sorted(
+            (wt.name for wt in self.src_path.iterdir() if wt.is_dir()),
+            key=lambda wt: (len(wt), wt),
+        )
+
+    def month_files(self, wt: str, month: pd.Timestamp) -> list[Path]:
+        '''
+        ~单台风机单月的SCADA文件
+
+        Parameters
+        ----------
+        - wt: 风机编号
+        - month: 月份
+        '''
+        return sorted(
+            self.src_path.glob(self.pattern.format(wt=wt, month=month.strftime('%Y%m')))
+        )
+
+    def read(self, paths: list[Path]) -> Iterator[pd.DataFrame]:
+        '''
+        ~分块读取SCADA文件，每块为time、wind、power三列
+
+        Parameters
+        ----------
+        - paths: 文件路径
+        '''
+        rename = {v: k for k, v in self.columns.items()}
+        for path in paths:
+            for chunk in pd.read_csv(
+                path,
+                usecols=list(self.columns.values()),
+                encoding=self.encoding,
+                chunksize=self.chunksize,
+            ):
+                chunk = chunk.rename(columns=rename)
+                chunk['time'] = pd.to_datetime(chunk['time'], errors='coerce')
+                chunk['wind'] = pd.to_numeric(chunk['wind'], errors='coerce')
+                chunk['power'] = pd.to_numeric(chunk['power'], errors='coerce')
+                yield chunk.dropna()
+
+    def month_stats(
+        self,
+        wt_list: list[str],
+        month: pd.Timestamp,
+        intervals: dict[str, pd.DataFrame],
+    ) -> pd.DataFrame:
+        '''
+        ~多台风机单月的分箱统计量，各风机样本合并后一次完成分箱统计，
+        停机区间内的样本只计入down_count
+
+        Parameters
+        ----------
+        - wt_list: 风机编号
+        - month: 月份
+        - intervals: 各风机已合并的停机区间，列为start、end
+        '''
+        month_start = month.to_datetime64()
+        month_end = (month + pd.offsets.MonthBegin(1)).to_datetime64()
+        codes, wind, power, down = [], [], [], []
+        for i, wt in enumerate(wt_list):
+            start = intervals[wt]['start'].to_numpy('datetime64[ns]')
+            end = intervals[wt]['end'].to_numpy('datetime64[ns]')
+            order = np.argsort(start)
+            start, end = start[order], end[order]
+            for chunk in self.read(self.month_files(wt, month)):
+                time = chunk['time'].to_numpy('datetime64[ns]')
+                keep = (time >= month_start) & (time < month_end)
+                time = time[keep]
+                codes.append(np.full(time.size, i, dtype=np.int64))
+                wind.append(chunk['wind'].to_numpy(dtype=float)[keep])
+                power.append(chunk['power'].to_numpy(dtype=float)[keep])
+                down.append(in_intervals(time, start, end))
+        # 全部风机的样本拼接后只调用一次accumulate
+        total = accumulate(
+            np.concatenate([np.empty(0, np.int64), *codes]),
+            len(wt_list),
+            np.concatenate([np.empty(0), *wind]),
+            np.concatenate([np.empty(0), *power]),
+            np.concatenate([np.empty(0, bool), *down]),
+        )
+        df = pd.DataFrame({k: v.ravel() for k, v in total.items()})
+        df.insert(0, 'bin', np.tile(wind_bins, len(wt_list)))
+        df.insert(0, 'month', month)
+        df.insert(0, 'wt_id', np.repeat([str(wt) for wt in wt_list], wind_bins.size))
+        return df[stats_info]
+
+    def _entry(self, wt: str, month: pd.Timestamp) -> Path:
+        '''
+        ~风机-月份对应的缓存文件
+        '''
+        return self.store_path / f'{wt}_{month.strftime("%Y%m")}.pkl'
+
+    @staticmethod
+    def _signature(paths: list[Path]) -> str:
+        '''
+        ~按文件路径、大小、修改时间计算签名，任一文件变化后缓存失效
+        '''
+        h = hashlib.sha1()
+        for path in sorted(paths):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            h.update(f'{path}|{stat.st_size}|{stat.st_mtime_ns};'.encode('utf-8'))
+        return h.hexdigest()
+
+    def cached_stats(
+        self,
+        wt_list: list[str],
+        month: pd.Timestamp,
+        depends: dict[str, list[Path]],
+        intervals: Callable[[str], pd.DataFrame],
+    ) -> pd.DataFrame:
+        '''
+        ~读取多台风机单月的分箱统计量，SCADA文件和depends均未变化的风机直接使用缓存，
+        其余风机一起重新计算后按风机分别写入缓存
+
+        Parameters
+        ----------
+        - wt_list: 风机编号
+        - month: 月份
+        - depends: 各风机停机区间依赖的文件，通常为该月的状态文件
+        - intervals: 传入风机编号返回停机区间的函数，只对缓存失效的风机调用
+        '''
+        df_list, stale, signatures = [], [], {}
+        for wt in wt_list:
+            entry = self._entry(wt, month)
+            signatures[wt] = self._signature(
+                [*self.month_files(wt, month), *depends.get(wt, [])]
+            )
+            if entry.exists():
+                try:
+                    df = pd.read_pickle(entry)
+                    if df.attrs.get('signature') == signatures[wt]:
+                        df_list.append(df)
+                        continue
+                except Exception:
+                    # 缓存文件损坏时重新计算
+                    pass
+            stale.append(wt)
+        if stale:
+            stats = self.month_stats(stale, month, {wt: intervals(wt) for wt in stale})
+            for wt, df in stats.groupby('wt_id', sort=False):
+                df = df.reset_index(drop=True)
+                df.attrs['signature'] = signatures[wt]
+                # 先写临时文件再替换，避免其他进程读到写了一半的缓存
+                entry = self._entry(wt, month)
+                tmp = entry.with_suffix(f'.{os.getpid()}_{threading.get_ident()}.tmp')
+                df.to_pickle(tmp)
+                os.replace(tmp, entry)
+                df_list.append(df)
+        if len(df_list) == 0:
+            return pd.DataFrame(columns=stats_info)
+        return pd.concat(df_list, ignore_index=True)
+
+
+def months(start: str, end: str) -> pd.DatetimeIndex:
+    '''
+    ~时间范围覆盖的月份，每月1日
+
+    Parameters
+    ----------
+    - start: 开始日期
+    - end: 结束日期，包含本天
+    '''
+    return pd.date_range(
+        pd.to_datetime(start).to_period('M').to_timestamp(),
+        pd.to_datetime(end),
+        freq='MS',
+    )
+
+
+def curve(stats_df: pd.DataFrame, by: list[str] = None) -> pd.DataFrame:
+    '''
+    ~由分箱统计量汇总功率曲线，样本数少于MIN_BIN_COUNT的箱不输出
+
+    Parameters
+    ----------
+    - stats_df: 分箱统计量，可包含多台风机、多个月份
+    - by: 分组列，默认为['wt_id']，[]表示全场合并为一条曲线
+    '''
+    by = ['wt_id'] if by is None else by
+    sums = ['count', 'wind_sum', 'power_sum', 'power_sq_sum']
+    df = stats_df.groupby([*by, 'bin'], sort=True)[sums].sum().reset_index()
+    df = df[df['count'] >= MIN_BIN_COUNT]
+    n = df['count'].to_numpy(dtype=float)
+    df['wind_mean'] = df['wind_sum'] / n
+    df['power_mean'] = df['power_sum'] / n
+    var = df['power_sq_sum'] / n - df['power_mean'] ** 2
+    # 样本标准差，消除相减带来的微小负数
+    df['power_std'] = np.sqrt(np.maximum(var, 0) * n / np.maximum(n - 1, 1))
+    if 'wt_id' not in by:
+        df['wt_id'] = '全场'
+    return df[curve_info].reset_index(drop=True)
+
+
+def lost_energy(stats_df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    ~停机损失电量(kWh)：停机样本数×参考功率×10分钟，
+    参考功率为该风机整个时间范围的功率曲线，缺少的风速箱使用全场曲线
+
+    Parameters
+    ----------
+    - stats_df: 分箱统计量，可包含多台风机、多个月份
+    '''
+    own = curve(stats_df).set_index(['wt_id', 'bin'])['power_mean']
+    fleet = curve(stats_df, by=[]).set_index('bin')['power_mean']
+    df = stats_df[stats_df['down_count'] > 0]
+    ref = own.reindex(pd.MultiIndex.from_frame(df[['wt_id', 'bin']])).to_numpy()
+    ref = np.where(np.isnan(ref), fleet.reindex(df['bin']).to_numpy(), ref)
+    df = df.assign(
+        down_hours=df['down_count'] * SAMPLE_HOURS,
+        lost_kwh=df['down_count'] * np.nan_to_num(np.maximum(ref, 0)) * SAMPLE_HOURS,
+    )
+    result = df.groupby(['wt_id', 'month'])[['down_hours', 'lost_kwh']].sum()
+    # 没有停机的风机-月份补0
+    index = pd.MultiIndex.from_frame(
+        stats_df[['wt_id', 'month']].drop_duplicates().sort_values(['wt_id', 'month'])
+    )
+    return result.reindex(index, fill_value=0.0).reset_index()
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+@File    : profiling.py
+@Time    : 2024/10/30 09:30:00
+@Author  : WHY
+@Version : 1.0
+@Desc    : 分析请求各阶段耗时和内存记录，以及单次查询内存预算检查
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+try:
+    import psutil
+except ImportError:  # psutil为可选依赖，未安装时Linux下读取/proc，其他系统不记录常驻内存
+    psutil = None
+
+MB = 1024 * 1024
+
+# 记录模式：rss只记录常驻内存变化，tracemalloc另外记录Python分配峰值，开销较大
+modes = ('rss', 'tracemalloc')
+
+_local = threading.local()
+# 多个请求同时使用tracemalloc时，最后一个结束的请求停止跟踪
+_trace_lock = threading.Lock()
+_trace_users = 0
+
+
+def rss() -> int | None:
+    '''
+    ~当前进程常驻内存(字节)，无法获取时为None
+    '''
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class MemoryBudgetExceeded(MemoryError):
+    '''
+    ~查询占用内存超出预算，在阶段结束或读取循环中检查时抛出
+    '''
+
+    def __init__(self, stage: str, used: int, budget: int) -> None:
+        self.stage = stage
+        self.used = used
+        self.budget = budget
+        super().__init__(
+            f'阶段{stage}占用内存{used / MB:.1f}MB，超出预算{budget / MB:.1f}MB'
+        )
+
+
+class Profiler:
+    '''
+    ~记录一次查询各阶段的耗时、常驻内存变化和Python分配峰值，并检查内存预算
+
+    - 通过with激活，之后本线程中的profiling.stage、profiling.check使用该记录器，
+      线程池中的函数经bind包装后同样使用该记录器
+    - 同名阶段多次出现时累计耗时，峰值取最大值
+    - 常驻内存和tracemalloc均为进程级，多个查询同时进行时数值互相包含，预算检查按进程计，
+      默认关闭，排查时宜将ANALYSIS_MAX_WORKERS设为1
+    '''
+
+    def __init__(self, mode: str = '', budget: int = 0) -> None:
+        '''
+        Parameters
+        ----------
+        - mode: 记录模式，见modes，为空时只检查预算
+        - budget: 内存预算(字节)，按查询开始后常驻内存的增长计算，为0时不检查
+        '''
+        self.mode = mode if mode in modes else ''
+        self.budget = budget
+        # 阶段名称: {'count', 'seconds', 'rss', 'peak'}
+        self.stages: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        # 各线程的阶段嵌套栈，线程池中的阶段各自嵌套
+        self._frames = threading.local()
+        self._outer = None
+        self.traced0 = 0
+
+    @property
+    def _stack(self) -> list[dict]:
+        stack = getattr(self._frames, 'stack', None)
+        if stack is None:
+            stack = self._frames.stack = []
+        return stack
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.mode)
+
+    @property
+    def tracing(self) -> bool:
+        return self.mode == 'tracemalloc'
+
+    def __enter__(self) -> 'Profiler':
+        global _trace_users
+        if self.tracing:
+            with _trace_lock:
+                if _trace_users == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                _trace_users += 1
+        self._outer = getattr(_local, 'profiler', None)
+        _local.profiler = self
+        self.t0 = time.perf_counter()
+        self.rss0 = rss()
+        self._push()
+        self.traced0 = self._stack[0].get('traced0', 0)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        global _trace_users
+        try:
+            self._pop('total')
+        finally:
+            _local.profiler = self._outer
+            if self.tracing:
+                with _trace_lock:
+                    _trace_users -= 1
+                    if _trace_users == 0:
+                        tracemalloc.stop()
+
+    def _push(self) -> None:
+        '''
+        ~进入阶段，记录开始时的耗时、内存，嵌套阶段重置峰值前先把当前峰值记入外层阶段
+        '''
+        frame = {'t0': time.perf_counter(), 'rss0': rss(), 'peak': 0}
+        if self.tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            for outer in self._stack:
+                outer['peak'] = max(outer['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['traced0'] = current
+        self._stack.append(frame)
+
+    def _pop(self, name: str) -> None:
+        '''
+        ~结束阶段并累计到stages
+        '''
+        frame = self._stack.pop()
+        seconds = time.perf_counter() - frame['t0']
+        now = rss()
+        delta = 0
+        if now is not None and frame['rss0'] is not None:
+            delta = now - frame['rss0']
+        peak = 0
+        if self.tracing:
+            peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+            if self._stack:
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+            peak -= frame['traced0']
+        with self._lock:
+            stats = self.stages.setdefault(
+                name, {'count': 0, 'seconds': 0.0, 'rss': 0, 'peak': 0}
+            )
+            stats['count'] += 1
+            stats['seconds'] += seconds
+            stats['rss'] += delta
+            stats['peak'] = max(stats['peak'], peak)
+
+    @contextmanager
+    def stage(self, name: str):
+        '''
+        ~记录一个阶段，结束时检查内存预算
+
+        Parameters
+        ----------
+        - name: 阶段名称，仅包含字母、数字、下划线，用作Server-Timing的指标名
+        '''
+        if self.enabled:
+            self._push()
+            try:
+                yield self
+            finally:
+                self._pop(name)
+        else:
+            yield self
+        self.check(name)
+
+    def used(self) -> int | None:
+        '''
+        ~查询开始后常驻内存的增长(字节)，无法获取常驻内存时使用tracemalloc当前分配量
+        '''
+        now = rss()
+        if now is not None and self.rss0 is not None:
+            return now - self.rss0
+        if self.tracing:
+            return tracemalloc.get_traced_memory()[0] - self.traced0
+        return None
+
+    def check(self, stage: str) -> None:
+        '''
+        ~内存超出预算时抛出MemoryBudgetExceeded
+
+        Parameters
+        ----------
+        - stage: 当前阶段名称
+        '''
+        if not self.budget:
+            return
+        used = self.used()
+        if used is not None and used > self.budget:
+            raise MemoryBudgetExceeded(stage, used, self.budget)
+
+    def server_timing(self) -> str:
+        '''
+        ~各阶段记录转为Server-Timing响应头，浏览器开发者工具中可直接查看
+        '''
+        items = []
+        for name, stats in self.stages.items():
+            desc = f'x{stats["count"]} rss{stats["rss"] / MB:+.1f}MB'
+            if self.tracing:
+                desc += f' peak {stats["peak"] / MB:.1f}MB'
+            items.append(f'{name};dur={1000 * stats["seconds"]:.1f};desc="{desc}"')
+        return ', '.join(items)
+
+
+def current() -> Profiler | None:
+    '''
+    ~本线程当前激活的记录器
+    '''
+    return getattr(_local, 'profiler', None)
+
+
+def stage(name: str):
+    '''
+    ~在当前记录器中记录一个阶段，未激活记录器时不做任何事，供pkgs中各读取、计算函数使用
+
+    Parameters
+    ----------
+    - name: 阶段名称
+    '''
+    profiler = current()
+    return nullcontext() if profiler is None else profiler.stage(name)
+
+
+def check(name: str) -> None:
+    '''
+    ~检查当前记录器的内存预算，用于逐个文件读取的循环中，尽早中止超出预算的查询
+
+    Parameters
+    ----------
+    - name: 当前阶段名称
+    '''
+    profiler = current()
+    if profiler is not None:
+        profiler.check(name)
+
+
+def bind(func):
+    '''
+    ~将本线程当前的记录器带入线程池中执行的函数，其中的阶段同样被记录和检查预算，
+    未激活记录器时原样返回
+
+    Parameters
+    ----------
+    - func: 提交到线程池的函数
+    '''
+    profiler = current()
+    if profiler is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        outer = getattr(_local, 'profiler', None)
+        _local.profiler = profiler
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.profiler = outer
+
+    return wrapper
+
+
+def staged(name: str):
+    '''
+    ~装饰器，每次调用记录为一个阶段，未激活记录器时直接调用
+
+    Parameters
+    ----------
+    - name: 阶段名称
+    '''
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+@File    : sequence.py
+@Time    : 2024/10/12 10:05:00
+@Author  : WHY
+@Version : 1.0
+@Desc    : 停机前故障代码序列挖掘，统计频繁共现代码与连锁故障
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from .fault import FaultStatistics
+
+# 挖掘结果包含信息list
+cascade_info = [
+    'kind',
+    'length',
+    'codes',
+    'names',
+    'count',
+    'support',
+    'support_pct',
+    'turbines',
+]
+
+
+def stop_events(df: pd.DataFrame) -> np.ndarray:
+    '''
+    ~获取停机时刻，连续出现的停机代码视为一次，与FaultStatistics._get_df_fault一致
+
+    Parameters
+    ----------
+    - df: 按时间排序的状态代码数据
+    '''
+    fault_en = df['fault_en'].to_numpy()
+    is_switch = (fault_en == FaultStatistics.turbine_start) | (
+        fault_en == FaultStatistics.turbine_stop
+    )
+    switch = fault_en[is_switch]
+    times = df['time'].to_numpy('datetime64[ns]')[is_switch]
+    # 启停代码中与上一个不同的停机代码
+    first = np.concatenate([[True], switch[1:] != switch[:-1]])
+    return times[first & (switch == FaultStatistics.turbine_stop)]
+
+
+def window_codes(
+    df: pd.DataFrame,
+    window: pd.Timedelta | str = '10min',
+    dedup: bool = True,
+) -> tuple[np.ndarray, np.ndarray, int]:
+    '''
+    ~提取每次停机前window内按时间排列的故障代码
+
+    Parameters
+    ----------
+    - df: 单台风机的状态代码数据
+    - window: 停机前的时间窗口
+    - dedup: 是否合并同一窗口内连续重复出现的代码
+
+    Returns
+    -------
+    (每个代码所属停机序号, 故障代码, 停机次数)，按停机序号和时间排序
+    '''
+    df = df.sort_values('time', kind='stable')
+    stops = stop_events(df)
+    fault_en = df['fault_en'].str.lower()
+    is_fault = fault_en.str.startswith('sc_') & (
+        df['fault_en'] != FaultStatistics.turbine_start
+    )
+    times = df['time'].to_numpy('datetime64[ns]')[is_fault.to_numpy()]
+    codes = df['code'].to_numpy()[is_fault.to_numpy()]
+    # 在有序时间数组上用二分查找得到每个窗口的起止位置
+    window = pd.Timedelta(window).to_timedelta64()
+    lo = np.searchsorted(times, stops - window, side='left')
+    hi = np.searchsorted(times, stops, side='right')
+    count = hi - lo
+    stop_id = np.repeat(np.arange(len(stops)), count)
+    # 将各窗口的位置区间展开为一维位置数组
+    offset = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    codes = codes[np.repeat(lo, count) + offset]
+    if dedup and codes.size > 0:
+        keep = np.concatenate(
+            [[True], (codes[1:] != codes[:-1]) | (stop_id[1:] != stop_id[:-1])]
+        )
+        stop_id, codes = stop_id[keep], codes[keep]
+    return stop_id, codes, len(stops)
+
+
+def _hash_ngrams(
+    ids: np.ndarray,
+    stop_id: np.ndarray,
+    n: int,
+    radix: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    ~将同一窗口内连续的n个代码编码为一个64位整数键
+
+    Parameters
+    ----------
+    - ids: 代码整数编号，取值范围为0~radix-1
+    - stop_id: 停机序号
+    - n: 序列长度
+    - radix: 代码种类数
+
+    Returns
+    -------
+    (键, 每个n元组起始位置)
+    '''
+    start = np.flatnonzero(stop_id[: ids.size - n + 1] == stop_id[n - 1 :])
+    if radix**n <= np.iinfo(np.int64).max:
+        # 按代码种类数进位的精确编码，不同序列的键一定不同
+        key = np.zeros(start.size, dtype=np.int64)
+        for j in range(n):
+            key = key * radix + ids[start + j]
+        return key, start
+    # 超出int64范围时退回FNV风格的乘法混合
+    key = np.zeros(start.size, dtype=np.uint64)
+    for j in range(n):
+        key = (key ^ ids[start + j].astype(np.uint64)) * np.uint64(1099511628211)
+    # 校验同一键下的代码序列是否一致，出现碰撞时按序列本身重新编号
+    grams = np.column_stack([ids[start + j] for j in range(n)])
+    order = np.argsort(key, kind='stable')
+    same_key = key[order][1:] == key[order][:-1]
+    diff_gram = (grams[order][1:] != grams[order][:-1]).any(axis=1)
+    if (same_key & diff_gram).any():
+        key = np.unique(grams, axis=0, return_inverse=True)[1].reshape(-1)
+    return key, start
+
+
+def _count(
+    key: np.ndarray,
+    stop_id: np.ndarray,
+    wt: np.ndarray,
+) -> pd.DataFrame:
+    '''
+    ~统计每个键的出现次数、包含该键的停机次数和风机数
+
+    Parameters
+    ----------
+    - key: 序列键
+    - stop_id: 键所在的全局停机序号
+    - wt: 键所在的风机序号
+    '''
+    df = pd.DataFrame({'key': key, 'stop': stop_id, 'wt': wt})
+    grouped = df.groupby('key')
+    return pd.DataFrame(
+        {
+            'count': grouped.size(),
+            'support': grouped['stop'].nunique(),
+            'turbines': grouped['wt'].nunique(),
+        }
+    )
+
+
+def mine(
+    fs: FaultStatistics,
+    window: pd.Timedelta | str = '10min',
+    max_length: int = 3,
+    min_support: int = 2,
+    dedup: bool = True,
+) -> pd.DataFrame:
+    '''
+    ~挖掘全场停机前的频繁故障代码组合
+
+    - kind=code: 单个代码
+    - kind=cascade: 按时间先后连续出现的代码序列（连锁故障）
+    - kind=pair: 在同一窗口内出现的代码对，不考虑先后
+
+    Parameters
+    ----------
+    - fs: FaultStatistics实例，使用其风机列表、时间范围和故障映射表
+    - window: 停机前的时间窗口
+    - max_length: 连锁故障序列的最大长度
+    - min_support: 至少在多少次停机中出现
+    - dedup: 是否合并同一窗口内连续重复出现的代码
+
+    Returns
+    -------
+    DataFrame ~ 列为cascade_info，按support、count降序
+    '''
+    stop_parts, code_parts, wt_parts = [], [], []
+    n_stops = 0
+    # 逐台读取，只保留窗口内的代码，内存与风机数量无关
+    for i, wt in enumerate(fs.wt_list):
+        df = fs.read_wt(wt)
+        if df is None:
+            continue
+        stop_id, codes, count = window_codes(df, window=window, dedup=dedup)
+        stop_parts.append(stop_id + n_stops)
+        code_parts.append(codes)
+        wt_parts.append(np.full(codes.size, i))
+        n_stops += count
+    if n_stops == 0 or sum(part.size for part in code_parts) == 0:
+        return pd.DataFrame(columns=cascade_info)
+    stop_id = np.concatenate(stop_parts)
+    wt = np.concatenate(wt_parts)
+    ids, uniques = pd.factorize(np.concatenate(code_parts))
+
+    result_list = []
+    # 连锁故障：同一窗口内连续的n个代码
+    for n in range(1, max_length + 1):
+        if ids.size < n:
+            break
+        key, start = _hash_ngrams(ids, stop_id, n, len(uniques))
+        if key.size == 0:
+            continue
+        df = _count(key, stop_id[start], wt[start])
+        df = df[df['support'] >= min_support].copy()
+        # 用每个键第一次出现的位置还原代码序列
+        first = pd.Series(start).groupby(key).first().reindex(df.index).to_numpy()
+        df['codes'] = [tuple(uniques[ids[p : p + n]]) for p in first]
+        df['kind'] = 'code' if n == 1 else 'cascade'
+        df['length'] = n
+        result_list.append(df)
+
+    # 代码对：同一窗口内任意两个不同代码
+    end = np.searchsorted(stop_id, stop_id, side='right')
+    count = end - np.arange(stop_id.size) - 1
+    left = np.repeat(np.arange(stop_id.size), count)
+    offset = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    right = left + 1 + offset
+    a, b = np.minimum(ids[left], ids[right]), np.maximum(ids[left], ids[right])
+    keep = a != b
+    if keep.any():
+        a, b, left = a[keep], b[keep], left[keep]
+        df = _count(a.astype(np.int64) * len(uniques) + b, stop_id[left], wt[left])
+        df = df[df['support'] >= min_support].copy()
+        df['codes'] = [
+            (uniques[k // len(uniques)], uniques[k % len(uniques)]) for k in df.index
+        ]
+        df['kind'] = 'pair'
+        df['length'] = 2
+        result_list.append(df)
+
+    result = pd.concat(result_list, ignore_index=True)
+    result['support_pct'] = (100 * result['support'] / n_stops).round(2)
+    # 代码名称，优先中文映射
+    names = pd.Series(dtype=object)
+    if fs.fault_map_df is not None:
+        names = fs.fault_map_df['中文描述']
+    names = names[~names.index.duplicated()]
+    # 连锁故障有先后顺序，代码对没有
+    sep = np.where(result['kind'] == 'pair', ' + ', ' → ')
+    result['names'] = [
+        s.join(str(names.get(code, code)) for code in codes)
+        for s, codes in zip(sep, result['codes'])
+    ]
+    result['codes'] = [s.join(codes) for s, codes in zip(sep, result['codes'])]
+    return result[cascade_info].sort_values(
+        ['support', 'count'], ascending=False, ignore_index=True
+    )
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+@File    : shared.py
+@Time    : 2024/10/28 10:00:00
+@Author  : WHY
+@Version : 1.0
+@Desc    : 多进程共享的列式数据集，每列一个.npy文件按内存映射只读加载，各进程共用操作系统页缓存
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 指向当前版本的文件名
+CURRENT = 'CURRENT'
+# 表结构文件名
+SCHEMA = 'schema.json'
+
+
+class SharedDataset:
+    '''
+    ~按版本发布DataFrame，每个版本一个文件夹，CURRENT文件记录当前版本
+
+    - 数值、时间列直接保存为.npy，字符串等其他列按类别编码为整数代码和类别表
+    - 加载时np.load(mmap_mode='r')，各进程零拷贝共享同一份数据
+    - 发布时先写临时文件夹再改名，最后os.replace更新CURRENT，读取方不会看到写了一半的版本
+    '''
+
+    def __init__(self, root: str | Path, name: str, keep: int = 2) -> None:
+        '''
+        Parameters
+        ----------
+        - root: 共享数据集根目录
+        - name: 数据集名称，对应root下的文件夹
+        - keep: 保留的历史版本数，正在被其他进程读取的旧版本不会立即失效
+        '''
+        self.path = Path(root) / name
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.keep = keep
+        self._lock = threading.Lock()
+        # 本进程已加载的版本，版本未变化时直接返回
+        self._loaded: tuple[str, pd.DataFrame, dict] | None = None
+
+    def version(self) -> str | None:
+        '''
+        ~当前版本号，尚未发布时为None
+        '''
+        try:
+            return (self.path / CURRENT).read_text(encoding='utf-8').strip() or None
+        except FileNotFoundError:
+            return None
+
+    def publish(self, df: pd.DataFrame, meta: dict = None) -> str:
+        '''
+        ~发布新版本并切换为当前版本，返回版本号
+
+        Parameters
+        ----------
+        - df: 数据，列名为字符串
+        - meta: 附加信息，可json序列化，随版本保存
+        '''
+        version = f'{time.time_ns()}_{os.getpid()}'
+        tmp = self.path / f'{version}.tmp'
+        tmp.mkdir()
+        columns = []
+        for i, col in enumerate(df.columns):
+            s = df[col]
+            if s.dtype.kind in 'biufmM':
+                np.save(tmp / f'{i}.npy', s.to_numpy())
+                columns.append({'name': col, 'kind': 'array'})
+            else:
+                s = s.astype('category')
+                # 代码类型与pandas按类别数选择的一致，加载时不会被复制
+                np.save(tmp / f'{i}.npy', s.cat.codes.to_numpy())
+                columns.append(
+                    {
+                        'name': col,
+                        'kind': 'category',
+                        'categories': [str(c) for c in s.cat.categories],
+                    }
+                )
+        (tmp / SCHEMA).write_text(
+            json.dumps(
+                {'columns': columns, 'rows': len(df), 'meta': meta or {}},
+                ensure_ascii=False,
+            ),
+            encoding='utf-8',
+        )
+        os.replace(tmp, self.path / version)
+        pointer = self.path / f'{CURRENT}.{version}.tmp'
+        pointer.write_text(version, encoding='utf-8')
+        os.replace(pointer, self.path / CURRENT)
+        self._prune(version)
+        return version
+
+    def _prune(self, current: str) -> None:
+        '''
+        ~删除多余的旧版本和中断发布留下的临时文件夹，Windows下正在映射的文件删除失败时跳过
+        '''
+        versions = sorted(
+            (p for p in self.path.iterdir() if p.is_dir() and p.suffix != '.tmp'),
+            key=lambda p: int(p.name.split('_')[0]),
+        )
+        old = [p for p in versions if p.name != current]
+        old = old[: max(len(old) - self.keep, 0)]
+        # 超过一小时的临时文件夹为中断的发布
+        stale = [
+            p
+            for p in self.path.glob('*.tmp')
+            if p.is_dir() and time.time() - p.stat().st_mtime > 3600
+        ]
+        for p in [*old, *stale]:
+            shutil.rmtree(p, ignore_errors=True)
+
+    def load(self) -> tuple[pd.DataFrame, dict] | None:
+        '''
+        ~以内存映射方式加载当前版本，返回(数据, 附加信息)，尚未发布时返回None，
+        版本未变化时返回本进程已加载的对象
+        '''
+        with self._lock:
+            for _ in range(3):
+                version = self.version()
+                if version is None:
+                    return None
+                if self._loaded is not None and self._loaded[0] == version:
+                    return self._loaded[1], self._loaded[2]
+                try:
+                    return self._load(version)
+                except FileNotFoundError:
+                    # 读取期间该版本已被更新的发布删除，重新读取CURRENT
+                    continue
+            return None
+
+    def _load(self, version: str) -> tuple[pd.DataFrame, dict]:
+        '''
+        ~加载指定版本
+        '''
+        folder = self.path / version
+        schema = json.loads((folder / SCHEMA).read_text(encoding='utf-8'))
+        data = {}
+        for i, col in enumerate(schema['columns']):
+            values = np.load(folder / f'{i}.npy', mmap_mode='r')
+            if col['kind'] == 'category':
+                values = pd.Categorical.from_codes(
+                    values,
+                    dtype=pd.CategoricalDtype(col['categories']),
+                    validate=False,
+                )
+            data[col['name']] = values
+        # copy=False保持每列独立，不合并为二维块，避免复制映射的数据
+        df = pd.DataFrame(data, copy=False)
+        self._loaded = (version, df, schema['meta'])
+        return df, schema['meta']
@@ -0,0 +1,547 @@
+# -*- coding: utf-8 -*-
+"""
+@File    : sources.py
+@Time    : 2024/10/15 15:40:00
+@Author  : WHY
+@Version : 1.0
+@Desc    : 故障数据源适配层，将陆上、海上等不同格式的故障数据统一为同一列式结构
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import pandas as pd
+
+from . import condition, profiling, validate
+from .coverage import Coverage
+from .fault import FaultStatistics
+from .fault_offshore import FaultStatisticsOffshore
+from .mirror import Mirror
+from .store import ParseStore
+
+# 统一故障明细包含信息list，start_time、end_time为datetime64，duration为小时
+fault_schema = [
+    'farm',
+    'wt_id',
+    'code',
+    'fault_en',
+    'fault_cn',
+    'start_time',
+    'end_time',
+    'duration',
+]
+
+# 数据根目录的默认I/O参数
+# - concurrency: 同时读取解析的文件数，大于1时查询前先并发预读到解析缓存
+# - read_ahead: 正在读取的文件之外最多排队预读的文件数，限制对网络共享的请求量
+# - mmap: 是否使用内存映射读取文件，适合本地磁盘
+# - mirror: 是否先复制到本地镜像再读取，适合网络共享
+io_defaults = {'concurrency': 1, 'read_ahead': 0, 'mmap': False, 'mirror': False}
+
+
+class FaultSource(ABC):
+    '''
+    ~故障数据源基类，子类实现turbines、day_files、parse_file、load，load返回fault_schema格式的明细
+    '''
+
+    kind: str = ''
+    '''数据源类型，对应source_types中的键'''
+    pattern: str = ''
+    '''状态文件相对数据根目录的glob模式'''
+    signature: dict = {}
+    '''状态文件校验参数，见validate.check'''
+    empty_ok: bool = False
+    '''空文件是否表示当天没有记录，为True时空文件不隔离'''
+
+    def __init__(
+        self,
+        farm: str,
+        src_path: str | Path,
+        fault_map_path: str | Path,
+        store: ParseStore = None,
+        pattern: str = None,
+        io: dict = None,
+        mirror: Mirror = None,
+    ):
+        '''
+        Parameters
+        ----------
+        - farm: 风场名称
+        - src_path: 数据根目录
+        - fault_map_path: 故障代码映射表路径
+        - store: 解析结果缓存
+        - pattern: 状态文件glob模式，为None表示使用该类型的默认模式
+        - io: I/O参数，未指定的项取io_defaults
+        - mirror: 本地镜像，仅在io参数mirror为True时使用
+        '''
+        self.farm = farm
+        self.src_path = Path(src_path)
+        self.fault_map_path = fault_map_path
+        self.store = store
+        if pattern is not None:
+            self.pattern = pattern
+        self.io = {**io_defaults, **(io or {})}
+        self.mirror = mirror if self.io['mirror'] else None
+
+    @abstractmethod
+    def turbines(self) -> list[str]:
+        '''
+        ~数据根目录下的全部风机编号
+        '''
+
+    @abstractmethod
+    def day_files(self, wt: str, start: str, end: str) -> dict[str, Path | None]:
+        '''
+        ~单台风机时间范围内每天对应的状态文件，缺少文件的日期为None
+
+        Parameters
+        ----------
+        - wt: 风机编号
+        - start: 开始日期，包含本天
+        - end: 结束日期，包含本天
+        '''
+
+    def coverage(
+        self,
+        start: str,
+        end: str,
+        wt_list: list[int | str] = None,
+    ) -> Coverage:
+        '''
+        ~时间范围内各风机每天是否有状态文件，只检查文件是否存在，不读取内容
+
+        Parameters
+        ----------
+        - start: 开始日期，包含本天
+        - end: 结束日期，包含本天
+        - wt_list: 风机列表，为None表示全部风机
+        '''
+        if wt_list is None:
+            wt_list = self.turbines()
+        dt_list = pd.date_range(pd.to_datetime(start), pd.to_datetime(end))
+        coverage = Coverage(wt_list, dt_list)
+        for wt in coverage.wt_list:
+            files = self.day_files(wt, start, end)
+            coverage.set(wt, [path is not None for path in files.values()])
+        return coverage
+
+    def files(self) -> list[Path]:
+        '''
+        ~数据根目录下所有状态文件
+        '''
+        return sorted(self.src_path.glob(self.pattern))
+
+    @abstractmethod
+    def parse_file(self, path: Path) -> pd.DataFrame:
+        '''
+        ~解析单个状态文件，结果与load读取时写入缓存的内容一致
+
+        Parameters
+        ----------
+        - path: 状态文件路径
+        '''
+
+    def _local(self, path: Path) -> Path:
+        '''
+        ~实际读取的文件路径，启用镜像时为本地副本
+        '''
+        return Path(path) if self.mirror is None else self.mirror.local(path)
+
+    def check(self, path: str | Path) -> tuple[str, str] | None:
+        '''
+        ~解析前校验状态文件，通过时返回None，否则返回(原因, 说明)
+
+        Parameters
+        ----------
+        - path: 状态文件路径
+        '''
+        return validate.check(path, **self.signature)
+
+    def ingest(self, path: str | Path) -> None:
+        '''
+        ~预先解析单个状态文件并写入缓存，已缓存时跳过，未通过校验时抛出MalformedFileError
+
+        Parameters
+        ----------
+        - path: 状态文件路径
+        '''
+        if self.store is not None and not self.store.contains(path):
+            # 校验本地副本，启用镜像时文件只经网络共享读取一次
+            problem = self.check(self._local(path))
+            if problem is not None and problem[0] == 'empty' and self.empty_ok:
+                return
+            if problem is not None:
+                raise validate.MalformedFileError(path, *problem)
+            self.store.get(path, self.parse_file)
+
+    def quarantine(
+        self,
+        start: str,
+        end: str,
+        wt_list: list[int | str] = None,
+    ) -> pd.DataFrame:
+        '''
+        ~校验时间范围内未缓存的状态文件，返回隔离报告
+
+        Parameters
+        ----------
+        - start: 开始日期，包含本天
+        - end: 结束日期，包含本天
+        - wt_list: 风机列表，为None表示全部风机
+        '''
+        if wt_list is None:
+            wt_list = self.turbines()
+        records = []
+        for wt in wt_list:
+            for path in self.day_files(str(wt), start, end).values():
+                if path is None:
+                    continue
+                # 已缓存的文件曾经解析成功，无需校验
+                if self.store is not None and self.store.contains(path):
+                    continue
+                problem = self.check(path)
+                if problem is not None and problem[0] == 'empty' and self.empty_ok:
+                    continue
+                if problem is not None:
+                    records.append(validate.record(str(wt), path, *problem))
+        df = validate.report(records)
+        df.insert(0, 'farm', self.farm)
+        return df
+
+    def prefetch(self, wt_list: list[str], start: str, end: str) -> None:
+        '''
+        ~按io参数并发预读时间范围内的文件，之后的顺序读取直接命中解析缓存或本地镜像
+
+        Parameters
+        ----------
+        - wt_list: 风机列表
+        - start: 开始日期，包含本天
+        - end: 结束日期，包含本天
+        '''
+        concurrency = self.io['concurrency']
+        if concurrency <= 1:
+            return
+        paths = [
+            path
+            for wt in wt_list
+            for path in self.day_files(wt, start, end).values()
+            if path is not None
+        ]
+        if self.store is not None:
+            paths = [path for path in paths if not self.store.contains(path)]
+            task = self.ingest
+        elif self.mirror is not None:
+            self.mirror.prefetch(paths, max_workers=concurrency)
+            return
+        else:
+            return
+        limit = concurrency + self.io['read_ahead']
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            pending = set()
+            for path in paths:
+                if len(pending) >= limit:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                # 预读失败的文件在正式读取时会再次解析并报告
+                pending.add(pool.submit(task, path))
+            wait(pending)
+
+    @abstractmethod
+    def load(
+        self,
+        start: str,
+        end: str,
+        wt_list: list[int | str] = None,
+    ) -> pd.DataFrame:
+        '''
+        ~读取时间范围内的故障明细
+
+        Parameters
+        ----------
+        - start: 开始日期，包含本天
+        - end: 结束日期，包含本天
+        - wt_list: 风机列表，为None表示全部风机
+        '''
+
+    def _normalize(self, df: pd.DataFrame) -> pd.DataFrame:
+        '''
+        ~补充风场名称、结束时刻，并统一列类型
+
+        Parameters
+        ----------
+        - df: 包含wt_id、code、fault_en、fault_cn、start_time、duration列的明细
+        '''
+        df = df.copy()
+        df['farm'] = self.farm
+        df['wt_id'] = df['wt_id'].astype(str)
+        df['start_time'] = pd.to_datetime(df['start_time'])
+        df['duration'] = df['duration'].astype(float)
+        df['end_time'] = df['start_time'] + pd.to_timedelta(df['duration'], unit='h')
+        return df[fault_schema].reset_index(drop=True)
+
+
+class OnshoreSource(FaultSource):
+    '''
+    ~陆上风机BufferStatuscodes数据源
+    '''
+
+    kind = 'onshore'
+    pattern = '*/BufferStatuscodes*.txt'
+    signature = validate.onshore_signature
+    empty_ok = True
+
+    def turbines(self):
+        return sorted(folder.name for folder in self.src_path.iterdir() if folder.is_dir())
+
+    def day_files(self, wt, start, end):
+        result = {}
+        for dt in pd.date_range(pd.to_datetime(start), pd.to_datetime(end)):
+            dt_str = dt.strftime('%Y%m%d')
+            path = self.src_path / str(wt) / f'BufferStatuscodes{dt_str}.txt'
+            result[dt_str] = path if path.exists() else None
+        return result
+
+    def parse_file(self, path):
+        path = Path(path)
+        return FaultStatistics.read_file(
+            self._local(path),
+            wt_id=path.parent.name,
+            file_name=path.name,
+            memory_map=self.io['mmap'],
+        )
+
+    def statistics(
+        self,
+        start: str = None,
+        end: str = None,
+        wt_list: list[int | str] = None,
+    ) -> FaultStatistics:
+        '''
+        ~按本数据源的路径、缓存和I/O参数创建FaultStatistics，并预读所需文件
+
+        Parameters
+        ----------
+        - start: 开始日期，包含本天
+        - end: 结束日期，包含本天
+        - wt_list: 风机列表，为None表示全部风机
+        '''
+        fs = FaultStatistics(
+            src_path=self.src_path,
+            fault_map_path=self.fault_map_path,
+            wt_list=wt_list,
+            start=start,
+            end=end,
+            store=self.store,
+            memory_map=self.io['mmap'],
+            mirror=self.mirror,
+        )
+        if len(fs.dt_list) > 0:
+            self.prefetch(fs.wt_list, fs.dt_list[0], fs.dt_list[-1])
+        return fs
+
+    def load(self, start, end, wt_list=None):
+        fs = self.statistics(start, end, wt_list)
+        if len(fs.dt_list) == 0:
+            # 开始日期晚于结束日期
+            return self._normalize(pd.DataFrame(columns=fault_schema))
+        df = fs.get_fault()
+        df = df.rename(columns={'stop_time': 'start_time'})
+        df['duration'] = pd.to_timedelta(df['timedelta']).dt.total_seconds() / 3600
+        return self._normalize(df)
+
+
+class OffshoreSource(FaultSource):
+    '''
+    ~海上风机ErrorList数据源
+    '''
+
+    kind = 'offshore'
+    pattern = 'Statuscode/*/ErrorList*.csv'
+    signature = validate.offshore_signature
+
+    def turbines(self):
+        folder = self.src_path / 'Statuscode'
+        return sorted(wt.name for wt in folder.iterdir() if wt.is_dir())
+
+    def day_files(self, wt, start, end):
+        dt_list = pd.date_range(pd.to_datetime(start), pd.to_datetime(end))
+        result = {dt.strftime('%Y%m%d'): None for dt in dt_list}
+        for path in (self.src_path / 'Statuscode' / str(wt)).glob('ErrorList*.csv'):
+            # 与FaultStatisticsOffshore.get_detail一致，文件名ErrorList后为日期
+            dt = pd.to_datetime(path.stem[9:], errors='coerce')
+            if not pd.isna(dt) and dt.strftime('%Y%m%d') in result:
+                result[dt.strftime('%Y%m%d')] = path
+        return result
+
+    def parse_file(self, path):
+        return FaultStatisticsOffshore.read_file(
+            self._local(path), memory_map=self.io['mmap']
+        )
+
+    def statistics(self) -> FaultStatisticsOffshore:
+        '''
+        ~按本数据源的缓存和I/O参数创建FaultStatisticsOffshore
+        '''
+        return FaultStatisticsOffshore(
+            fault_map_path=self.fault_map_path,
+            store=self.store,
+            memory_map=self.io['mmap'],
+            mirror=self.mirror,
+        )
+
+    def _detail(self, start, end, wt_list=None) -> pd.DataFrame:
+        '''
+        ~读取时间范围内的ErrorList逐条明细，保留全部原始列，attrs['duplicates']为去除的重复记录数
+        '''
+        fs = self.statistics()
+        if wt_list is None:
+            wt_list = self.turbines()
+        self.prefetch([str(wt) for wt in wt_list], start, end)
+        df_list = []
+        duplicates = 0
+        for wt in wt_list:
+            df = fs.get_detail(wt=str(wt), src_path=self.src_path, start=start, end=end)
+            duplicates += df.attrs['duplicates']
+            df['wt_id'] = wt
+            df_list.append(df.reset_index(drop=True))
+        if len(df_list) == 0:
+            # 没有风机时返回与get_detail相同列的空表
+            df_list.append(
+                pd.DataFrame(
+                    columns=[
+                        *fs.header.values(),
+                        '故障代码',
+                        '故障描述_中文',
+                        '故障等级',
+                        'wt_id',
+                    ]
+                )
+            )
+        df = pd.concat(df_list, ignore_index=True)
+        # 各风机去除的重复记录数合计
+        df.attrs['duplicates'] = duplicates
+        df = df.rename(
+            columns={
+                '故障代码': 'code',
+                '故障描述_英文': 'fault_en',
+                '故障描述_中文': 'fault_cn',
+                '触发时间': 'start_time',
+            }
+        )
+        df['duration'] = pd.to_timedelta(df['持续时间']).dt.total_seconds() / 3600
+        return df
+
+    def load(self, start, end, wt_list=None):
+        return self._normalize(self._detail(start, end, wt_list))
+
+    def snapshot(
+        self,
+        start: str,
+        end: str,
+        wt_list: list[int | str] = None,
+    ) -> pd.DataFrame:
+        '''
+        ~故障明细及触发时刻的运行工况，列为fault_schema加condition.snapshot_info（浮点数）
+
+        Parameters
+        ----------
+        - start: 开始日期，包含本天
+        - end: 结束日期，包含本天
+        - wt_list: 风机列表，为None表示全部风机
+        '''
+        df = self._detail(start, end, wt_list)
+        result = self._normalize(df)
+        for col in condition.snapshot_info:
+            result[col] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)
+        return result
+
+
+# 数据源类型注册表，新增数据格式时在此注册
+source_types: dict[str, type[FaultSource]] = {
+    OnshoreSource.kind: OnshoreSource,
+    OffshoreSource.kind: OffshoreSource,
+}
+
+
+def from_config(
+    config: dict,
+    store: ParseStore = None,
+    mirror: Mirror = None,
+) -> FaultSource:
+    '''
+    ~由settings.FAULT_DATA_ROOTS中的一项创建数据源
+
+    Parameters
+    ----------
+    - config: 包含farm、kind、path、fault_map，可选pattern、io
+    - store: 解析结果缓存
+    - mirror: 本地镜像，io参数mirror为True的数据源使用
+    '''
+    if config['kind'] not in source_types:
+        raise ValueError(
+            f'未知数据源类型: {config["kind"]}，可选: {", ".join(source_types)}'
+        )
+    return source_types[config['kind']](
+        config['farm'],
+        config['path'],
+        config['fault_map'],
+        store=store,
+        pattern=config.get('pattern'),
+        io=config.get('io'),
+        mirror=mirror,
+    )
+
+
+def load_sources(
+    sources: list[FaultSource],
+    start: str,
+    end: str,
+    wt_lists: dict[str, list] = None,
+    max_workers: int = None,
+) -> pd.DataFrame:
+    '''
+    ~并发读取多个数据源，合并为统一的故障明细
+
+    Parameters
+    ----------
+    - sources: 数据源列表
+    - start: 开始日期，包含本天
+    - end: 结束日期，包含本天
+    - wt_lists: 各风场的风机列表，键为风场名称，未指定的风场读取全部风机
+    - max_workers: 最大并发数，为None表示与数据源数量相同
+    '''
+    wt_lists = wt_lists or {}
+    if len(sources) == 0:
+        return pd.DataFrame(columns=fault_schema)
+    with ThreadPoolExecutor(max_workers=max_workers or len(sources)) as pool:
+        futures = [
+            # 查询的记录器带入线程池，各风场的读取同样记录耗时、检查内存预算
+            pool.submit(
+                profiling.bind(source.load), start, end, wt_lists.get(source.farm)
+            )
+            for source in sources
+        ]
+        df_list = [future.result() for future in futures]
+    return pd.concat(df_list, ignore_index=True)
+
+
+def summarize(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    ~按风场、风机、故障代码汇总故障次数和持续时间(小时)
+
+    Parameters
+    ----------
+    - df: fault_schema格式的故障明细
+    '''
+    return (
+        df.groupby(['farm', 'wt_id', 'code'], sort=True)
+        .agg(
+            fault_en=('fault_en', 'first'),
+            fault_cn=('fault_cn', 'first'),
+            count=('code', 'size'),
+            duration=('duration', 'sum'),
+        )
+        .reset_index()
+    )
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+@File    : store.py
+@Time    : 2024/10/17 09:10:00
+@Author  : WHY
+@Version : 1.0
+@Desc    : 状态文件解析结果缓存，同一文件只解析一次
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+
+
+class ParseStore:
+    '''
+    ~按源文件路径、大小、修改时间缓存解析后的DataFrame，源文件变化后自动重新解析
+
+    - 每个源文件一个文件夹：{sha1前2位}/{sha1}/{大小}_{修改时间}.pkl，
+      写入新版本时只列出该文件夹删除旧版本，不扫描整个缓存
+    '''
+
+    def __init__(self, store_path: str | Path) -> None:
+        '''
+        Parameters
+        ----------
+        - store_path: 缓存文件夹路径
+        '''
+        self.store_path = Path(store_path)
+        self.store_path.mkdir(parents=True, exist_ok=True)
+
+    def _folder(self, path: Path) -> Path:
+        '''
+        ~源文件对应的缓存文件夹，按路径哈希的前2位分为256组，避免单个文件夹条目过多
+        '''
+        digest = hashlib.sha1(str(Path(path).absolute()).encode('utf-8')).hexdigest()
+        return self.store_path / digest[:2] / digest
+
+    def _entry(self, path: Path, stat: os.stat_result = None) -> Path:
+        '''
+        ~源文件当前版本对应的缓存文件，源文件不存在时抛出FileNotFoundError
+        '''
+        if stat is None:
+            stat = os.stat(path)
+        return self._folder(path) / f'{stat.st_size}_{stat.st_mtime_ns}.pkl'
+
+    def contains(self, path: str | Path) -> bool:
+        '''
+        ~源文件当前版本是否已缓存
+
+        Parameters
+        ----------
+        - path: 源文件路径
+        '''
+        try:
+            return self._entry(Path(path)).exists()
+        except FileNotFoundError:
+            return False
+
+    def get(
+        self,
+        path: str | Path,
+        parser: Callable[[Path], pd.DataFrame],
+    ) -> pd.DataFrame:
+        '''
+        ~获取源文件的解析结果，未缓存时调用parser解析并写入缓存
+
+        Parameters
+        ----------
+        - path: 源文件路径
+        - parser: 解析函数，参数为源文件路径
+        '''
+        path = Path(path)
+        entry = self._entry(path)
+        if entry.exists():
+            try:
+                return pd.read_pickle(entry)
+            except Exception:
+                # 缓存文件损坏时重新解析
+                pass
+        df = parser(path)
+        self.put(path, df, entry=entry)
+        return df
+
+    def put(self, path: str | Path, df: pd.DataFrame, entry: Path = None) -> None:
+        '''
+        ~写入解析结果，并删除该源文件的旧版本缓存
+
+        Parameters
+        ----------
+        - path: 源文件路径
+        - df: 解析结果
+        '''
+        path = Path(path)
+        if entry is None:
+            entry = self._entry(path)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再替换，避免其他进程读到写了一半的缓存
+        tmp = entry.with_suffix(f'.{os.getpid()}_{threading.get_ident()}.tmp')
+        df.to_pickle(tmp)
+        os.replace(tmp, entry)
+        # 文件夹中只有该源文件的各版本，通常只有一两个
+        for old in entry.parent.glob('*.pkl'):
+            if old != entry:
+                old.unlink(missing_ok=True)
@@ -1,12 +1,57 @@
 from __future__ import annotations
 
+import json
 import os
 import sys
+import threading
 
 from loguru import logger
 
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，未安装时使用标准库json
+    orjson = None
+
+
+def _json_default(obj):
+    '''
+    ~json无法直接编码对象的兜底转换，处理numpy数组、标量和pandas时间
+
+    Parameters
+    ----------
+    - obj: json无法直接序列化的对象
+    '''
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def json_dumps(obj) -> bytes:
+    '''
+    ~将对象序列化为json字节串，安装orjson时使用orjson加速
+
+    Parameters
+    ----------
+    - obj: 需要序列化的对象
+    '''
+    if orjson is not None:
+        return orjson.dumps(
+            obj, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY
+        )
+    return json.dumps(obj, ensure_ascii=False, default=_json_default).encode('utf-8')
+
 
 class HiddenPrints:
+    '''
+    ~屏蔽print输出，可在多线程中同时使用，最后一个退出的线程恢复输出
+    '''
+
+    # sys.stdout为进程共享，用计数和锁保证多线程同时使用时只替换和恢复一次
+    _lock = threading.Lock()
+    _depth = 0
+    _original_stdout = None
 
     def __init__(self, hide: bool = True):
         self.__hide = hide
@@ -17,8 +62,11 @@ class HiddenPrints:
 
     def __enter__(self):
         if self.hide:
-            self._original_stdout = sys.stdout
-            sys.stdout = open(os.devnull, 'w')
+            with HiddenPrints._lock:
+                if HiddenPrints._depth == 0:
+                    HiddenPrints._original_stdout = sys.stdout
+                    sys.stdout = open(os.devnull, 'w')
+                HiddenPrints._depth += 1
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.hide:
@@ -26,8 +74,11 @@ class HiddenPrints:
 
     def restore_output(self):
         if self.hide:
-            sys.stdout.close()
-            sys.stdout = self._original_stdout
+            with HiddenPrints._lock:
+                HiddenPrints._depth -= 1
+                if HiddenPrints._depth == 0:
+                    sys.stdout.close()
+                    sys.stdout = HiddenPrints._original_stdout
 
 
 import sys
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+@File    : validate.py
+@Time    : 2024/10/18 15:20:00
+@Author  : WHY
+@Version : 1.0
+@Desc    : 状态文件解析前校验，只读取文件开头检查编码和表头，格式错误的文件记入隔离报告
+"""
+
+from __future__ import annotations
+
+import codecs
+import os
+from pathlib import Path
+
+import pandas as pd
+
+# 隔离报告包含信息list
+quarantine_info = ['wt_id', 'file_name', 'reason', 'detail', 'path']
+
+# 校验时读取的文件开头字节数
+HEAD_BYTES = 64 * 1024
+
+# 陆上BufferStatuscodes文件：前11行为说明，第12行为制表符分隔的表头
+onshore_signature = {
+    'row': 11,
+    'sep': '\t',
+    'encoding': 'utf-8',
+    'columns': ('TimeStampUTC', 'TrigKey'),
+}
+
+# 海上ErrorList文件：前8行为说明，之后为12列逗号分隔的数据，最后一行为结尾
+offshore_signature = {
+    'row': 8,
+    'sep': ',',
+    'encoding': 'utf8',
+    'n_fields': 12,
+}
+
+
+class MalformedFileError(ValueError):
+    '''
+    ~状态文件未通过校验
+    '''
+
+    def __init__(self, path: str | Path, reason: str, detail: str) -> None:
+        super().__init__(f'{path}: {reason} {detail}')
+        self.path = Path(path)
+        self.reason = reason
+        self.detail = detail
+
+    def __reduce__(self):
+        # 保证多进程之间传递时可以还原
+        return type(self), (self.path, self.reason, self.detail)
+
+
+def check(
+    path: str | Path,
+    row: int,
+    sep: str,
+    encoding: str = 'utf-8',
+    columns: tuple[str, ...] = (),
+    n_fields: int = None,
+) -> tuple[str, str] | None:
+    '''
+    ~校验文件开头的编码和签名行，通过时返回None，否则返回(原因, 说明)
+
+    - empty: 文件为空或签名行之后没有内容
+    - encoding: 文件开头无法按encoding解码
+    - truncated: 行数不足签名行，通常为写了一半的文件
+    - header: 签名行缺少必需的列或列数不符
+
+    Parameters
+    ----------
+    - path: 文件路径
+    - row: 签名行序号，从0开始
+    - sep: 分隔符
+    - encoding: 文件编码
+    - columns: 签名行必须包含的列名
+    - n_fields: 签名行的列数
+    '''
+    size = os.stat(path).st_size
+    if size == 0:
+        return 'empty', '文件为空'
+    with open(path, 'rb') as f:
+        head = f.read(HEAD_BYTES)
+    # 开头可能截断在多字节字符中间，只有读到文件末尾时才要求完整
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        text = decoder.decode(head, final=size <= HEAD_BYTES)
+    except UnicodeDecodeError as exc:
+        return 'encoding', f'非{encoding}编码，第{exc.start}字节'
+    lines = text.splitlines()
+    if len(lines) <= row:
+        return 'truncated', f'只有{len(lines)}行，少于说明行数{row}'
+    fields = [field.strip() for field in lines[row].split(sep)]
+    missing = [col for col in columns if col not in fields]
+    if missing:
+        return 'header', f'第{row + 1}行缺少列: {", ".join(missing)}'
+    if n_fields is not None and len(fields) != n_fields:
+        if len(lines) == row + 1 and size <= HEAD_BYTES:
+            return 'empty', '没有数据行'
+        return 'header', f'第{row + 1}行有{len(fields)}列，应为{n_fields}列'
+    return None
+
+
+def report(records: list[dict]) -> pd.DataFrame:
+    '''
+    ~将隔离记录整理为报告
+
+    Parameters
+    ----------
+    - records: 隔离记录，键为quarantine_info
+    '''
+    return pd.DataFrame(records, columns=quarantine_info)
+
+
+def record(wt_id: str, path: Path, reason: str, detail: str) -> dict:
+    '''
+    ~生成一条隔离记录
+
+    Parameters
+    ----------
+    - wt_id: 风机编号
+    - path: 文件路径
+    - reason: 原因
+    - detail: 说明
+    '''
+    return {
+        'wt_id': wt_id,
+        'file_name': path.name,
+        'reason': reason,
+        'detail': detail,
+        'path': str(path),
+    }
@@ -0,0 +1,1435 @@
+# 分析计算，依赖pandas、pyecharts等较重的模块，由views在首次请求时导入
+from __future__ import annotations
+
+import codecs
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlencode
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
+from loguru import logger
+
+from pkgs import (
+    anomaly,
+    availability,
+    condition,
+    export,
+    power_curve,
+    profiling,
+    sequence,
+    sources,
+)
+from pkgs.charts import bar_json, heatmap_json, line_json, scatter_json
+from pkgs.coverage import Coverage
+from pkgs.mirror import Mirror
+from pkgs.shared import SharedDataset
+from pkgs.store import ParseStore
+from pkgs.utils.table import table_page
+from pkgs.utils.tools import HiddenPrints, json_dumps
+
+from .executor import run_analysis
+
+# 表格每页默认行数
+TABLE_PAGE_SIZE = 50
+# 分页、排序、筛选参数，不影响表格内容，不参与缓存键
+TABLE_PAGE_PARAMS = ('page', 'size', 'sort', 'order', 'search')
+# 热力图freq=auto时，超过该天数按周统计
+HEATMAP_WEEK_DAYS = 92
+# 估算缓存比例时抽样的风机数
+COST_SAMPLE = 3
+# 陆上风机故障统计简表(test1)的风机编号
+FAULT_TABLE_WT = 20
+# 超出内存预算时可以逐台风机分块计算的表格类型，结果与整体计算一致
+CHUNKED_VIEWS = ('fleet',)
+
+# 状态文件解析结果缓存，由ingest_watch预先写入
+STORE = ParseStore(settings.FAULT_STORE_DIR)
+
+# 网络共享数据的本地镜像
+MIRROR = Mirror(settings.FAULT_MIRROR_DIR, settings.FAULT_MIRROR_CAPACITY)
+
+# 全部风场数据源，由settings.FAULT_DATA_ROOTS配置，跨风场统计时并发读取
+FAULT_SOURCES = [
+    sources.from_config(config, store=STORE, mirror=MIRROR)
+    for config in settings.FAULT_DATA_ROOTS
+]
+# 全部风场最近SHARED_DATASET_DAYS天的故障明细，各worker进程共享同一份内存映射数据
+SHARED_FAULTS = SharedDataset(settings.SHARED_DATASET_DIR, 'faults')
+
+# 10分钟SCADA数据源，停机区间取自陆上风场
+SCADA = power_curve.ScadaSource(
+    settings.SCADA_DATA_ROOT['path'],
+    settings.POWER_CURVE_DIR,
+    columns=settings.SCADA_DATA_ROOT['columns'],
+    pattern=settings.SCADA_DATA_ROOT['pattern'],
+    encoding=settings.SCADA_DATA_ROOT['encoding'],
+)
+# 单风场页面使用各类型的第一个数据源，未配置该类型时为None，相关页面返回404
+ONSHORE = next((source for source in FAULT_SOURCES if source.kind == 'onshore'), None)
+OFFSHORE = next((source for source in FAULT_SOURCES if source.kind == 'offshore'), None)
+# 需要陆上或海上数据源的表格类型，power的停机区间取自陆上风场
+ONSHORE_VIEWS = ('test1', 'anomaly', 'availability', 'cascade', 'power')
+OFFSHORE_VIEWS = ('test7', 'condition')
+
+
+def _fault_table(start: str, end: str) -> pd.DataFrame:
+    '''
+    ~陆上风机故障统计简表
+
+    Parameters
+    ----------
+    - start: 开始日期
+    - end: 结束日期
+    '''
+    with HiddenPrints():
+        fs = ONSHORE.statistics(
+            start=start,
+            end=end,
+            # start='20240401',
+            # end='20240601',
+            wt_list=[FAULT_TABLE_WT],
+        )
+        fs.get_fault()
+        df = fs.get_fault_simple()
+
+    df['timedelta'] = (
+        pd.to_timedelta(df['timedelta']).dt.total_seconds() / 3600
+    ).round(2)
+    df = df.rename(
+        columns={
+            'wt_id': '风机编号',
+            'code': '故障代码',
+            'fault_en': '故障名称_英文',
+            'fault_cn': '故障名称_中文',
+            'count': '故障次数',
+            'timedelta': '故障时间(小时)',
+        },
+        inplace=False,
+    )[['风机编号', '故障代码', '故障名称_中文', '故障名称_英文', '故障次数', '故障时间(小时)']]
+    return df
+
+
+def _offshore_table(wt_id: str, start: str, end: str) -> pd.DataFrame:
+    '''
+    ~海上风机故障统计简表
+
+    Parameters
+    ----------
+    - wt_id: 风机编号
+    - start: 开始日期
+    - end: 结束日期
+    '''
+    with HiddenPrints():
+        wt = f'00{wt_id}#'
+        OFFSHORE.prefetch([wt], start, end)
+        df = OFFSHORE.statistics().get_single(
+            wt=wt,
+            src_path=OFFSHORE.src_path,
+            start=start,
+            end=end,
+        )
+    df['持续时间'] = df['持续时间'].astype(float).round(2)
+    df = df[df['持续时间'] > 0.1]
+    return df
+
+
+def _anomaly_table(
+    start: str,
+    end: str,
+    value: str = 'count',
+    method: str = 'robust',
+    window: int = 14,
+    threshold: float = 3.0,
+) -> pd.DataFrame:
+    '''
+    ~全场风机故障频次异常表，参数见pkgs.anomaly.detect
+
+    Parameters
+    ----------
+    - start: 开始日期
+    - end: 结束日期
+    '''
+    start = pd.to_datetime(start)
+    with HiddenPrints():
+        # 向前多读window天作为基线
+        fs = ONSHORE.statistics(start=start - pd.Timedelta(days=window), end=end)
+        fs.get_fault()
+    df = anomaly.detect(
+        fs.fault_df,
+        dt_list=fs.dt_list,
+        value=value,
+        method=method,
+        window=window,
+        threshold=threshold,
+    )
+    df = df[df['day'] >= start]
+    df['day'] = df['day'].dt.strftime('%Y-%m-%d')
+    df[['value', 'baseline', 'score']] = df[['value', 'baseline', 'score']].round(2)
+    return df.rename(
+        columns={
+            'day': '日期',
+            'wt_id': '风机编号',
+            'code': '故障代码',
+            'fault_en': '故障名称_英文',
+            'fault_cn': '故障名称_中文',
+            'value': '当日值',
+            'baseline': '基线',
+            'score': '异常分数',
+        }
+    )
+
+
+def _availability_table(start: str, end: str, freq: str = 'D') -> pd.DataFrame:
+    '''
+    ~全场风机时间可利用率(%)表，每行为一个周期，每台风机一列
+
+    Parameters
+    ----------
+    - start: 开始日期
+    - end: 结束日期（包含本天）
+    - freq: 统计周期，D日、W周、M月
+    '''
+    with HiddenPrints():
+        fs = ONSHORE.statistics(start=start, end=end)
+        fs.get_fault()
+    hours, period_hours = availability.downtime(
+        availability.fault_intervals(fs.fault_df),
+        fs.dt_list[0],
+        fs.dt_list[-1] + pd.Timedelta('1d'),
+        freq=freq,
+        wt_list=sorted(int(wt) for wt in fs.wt_list),
+    )
+    df = (100 * (1 - hours.div(period_hours, axis=0))).round(2)
+    df.columns = [str(wt) for wt in df.columns]
+    df.insert(0, '周期小时数', period_hours.to_numpy())
+    df.insert(0, '周期', df.index.strftime('%Y-%m-%d'))
+    return df.reset_index(drop=True)
+
+
+def _cascade_table(
+    start: str,
+    end: str,
+    window: str = '10min',
+    max_length: int = 3,
+    min_support: int = 2,
+) -> pd.DataFrame:
+    '''
+    ~全场停机前频繁故障代码组合排名表，参数见pkgs.sequence.mine
+
+    Parameters
+    ----------
+    - start: 开始日期
+    - end: 结束日期
+    '''
+    with HiddenPrints():
+        fs = ONSHORE.statistics(start=start, end=end)
+        df = sequence.mine(
+            fs, window=window, max_length=max_length, min_support=min_support
+        )
+    return df.rename(
+        columns={
+            'kind': '类型',
+            'length': '长度',
+            'codes': '故障代码',
+            'names': '故障名称',
+            'count': '出现次数',
+            'support': '停机次数',
+            'support_pct': '停机占比(%)',
+            'turbines': '风机数',
+        }
+    )
+
+
+def publish_faults(start: str = None, end: str = None) -> str | None:
+    '''
+    ~读取全部风场的故障明细并发布为共享数据集，返回版本号，SHARED_DATASET_DAYS为0时不发布
+
+    Parameters
+    ----------
+    - start: 开始日期，默认为end之前SHARED_DATASET_DAYS天
+    - end: 结束日期（包含本天），默认为今天
+    '''
+    if not settings.SHARED_DATASET_DAYS:
+        return None
+    end = pd.Timestamp(end or pd.Timestamp.now()).normalize()
+    if start is None:
+        start = end - pd.Timedelta(days=settings.SHARED_DATASET_DAYS - 1)
+    start = pd.Timestamp(start).normalize()
+    with HiddenPrints():
+        df = sources.load_sources(
+            FAULT_SOURCES, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+        )
+    meta = {
+        'start': start.strftime('%Y-%m-%d'),
+        'end': end.strftime('%Y-%m-%d'),
+        'farms': [source.farm for source in FAULT_SOURCES],
+    }
+    return SHARED_FAULTS.publish(df[sources.fault_schema], meta)
+
+
+def _shared_covers(meta: dict, start: pd.Timestamp, end: pd.Timestamp) -> bool:
+    '''
+    ~共享数据集是否覆盖全部风场和查询范围
+    '''
+    return (
+        meta['farms'] == [source.farm for source in FAULT_SOURCES]
+        and pd.Timestamp(meta['start']) <= start
+        and end <= pd.Timestamp(meta['end'])
+    )
+
+
+def _load_faults(start: str, end: str) -> pd.DataFrame:
+    '''
+    ~全部风场的故障明细，共享数据集覆盖查询范围时直接切片，否则读取状态文件
+
+    Parameters
+    ----------
+    - start: 开始日期
+    - end: 结束日期（包含本天）
+    '''
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    loaded = SHARED_FAULTS.load()
+    if loaded is not None:
+        df, meta = loaded
+        if _shared_covers(meta, start, end):
+            t = df['start_time'].to_numpy()
+            mask = (t >= start.to_datetime64()) & (
+                t < (end + pd.Timedelta('1d')).to_datetime64()
+            )
+            df = df[mask]
+            # 类别编码的列还原为字符串，切片是本次查询的副本
+            return df.astype(
+                {col: object for col in df.columns if df[col].dtype == 'category'}
+            ).reset_index(drop=True)
+    with HiddenPrints():
+        return sources.load_sources(
+            FAULT_SOURCES, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+        )
+
+
+def _fleet_table(start: str, end: str, chunked: bool = False) -> pd.DataFrame:
+    '''
+    ~全部风场按风机、故障代码汇总的故障统计表
+
+    Parameters
+    ----------
+    - start: 开始日期
+    - end: 结束日期
+    - chunked: 逐台风机读取并汇总，同时只保留一台风机的明细，汇总按风机分组，结果与整体计算一致
+    '''
+    if chunked:
+        df_list = []
+        for source in FAULT_SOURCES:
+            for wt in source.turbines():
+                with HiddenPrints():
+                    df_list.append(sources.summarize(source.load(start, end, [wt])))
+                profiling.check('fleet_chunk')
+        df = pd.concat(df_list, ignore_index=True) if df_list else sources.summarize(
+            pd.DataFrame(columns=sources.fault_schema)
+        )
+        df = df.sort_values(['farm', 'wt_id', 'code']).reset_index(drop=True)
+    else:
+        df = sources.summarize(_load_faults(start, end))
+    df['duration'] = df['duration'].round(2)
+    return df.rename(
+        columns={
+            'farm': '风场',
+            'wt_id': '风机编号',
+            'code': '故障代码',
+            'fault_en': '故障名称_英文',
+            'fault_cn': '故障名称_中文',
+            'count': '故障次数',
+            'duration': '故障时间(小时)',
+        }
+    )
+
+
+def _heatmap_table(
+    start: str,
+    end: str,
+    value: str = 'hours',
+    freq: str = 'auto',
+) -> pd.DataFrame:
+    '''
+    ~全部风场风机×周期的故障小时数或故障次数，每行为一台风机，每个周期一列
+
+    Parameters
+    ----------
+    - start: 开始日期
+    - end: 结束日期（包含本天）
+    - value: hours故障小时数，count故障次数
+    - freq: 统计周期，D日、W周，auto为超过HEATMAP_WEEK_DAYS天时按周
+    '''
+    start = pd.to_datetime(start)
+    end = pd.to_datetime(end) + pd.Timedelta('1d')
+    if freq == 'auto':
+        freq = 'W' if (end - start).days > HEATMAP_WEEK_DAYS else 'D'
+    df = _load_faults(start, end - pd.Timedelta('1d'))
+    # 风场-风机作为区间表的风机编号，不同风场的同号风机不会合并
+    intervals = pd.DataFrame(
+        {
+            'wt_id': (df['farm'] + '-' + df['wt_id']).to_numpy(),
+            'start': df['start_time'].to_numpy(),
+            'end': df['end_time'].to_numpy(),
+        }
+    )
+    wt_list = [
+        f'{source.farm}-{wt}'
+        for source in FAULT_SOURCES
+        for wt in sorted(source.turbines(), key=lambda wt: (len(wt), wt))
+    ]
+    matrix = availability.fault_matrix(
+        intervals, start, end, value=value, freq=freq, wt_list=wt_list
+    )
+    df = matrix.T.round(2)
+    df.columns = matrix.index.strftime('%Y-%m-%d')
+    return df.reset_index(names='风机')
+
+
+def _power_stats(start: str, end: str) -> pd.DataFrame:
+    '''
+    ~全部风机按月的功率曲线分箱统计量，范围扩展为整月，
+    SCADA文件和状态文件未变化的风机-月份直接读取缓存
+
+    Parameters
+    ----------
+    - start: 开始日期
+    - end: 结束日期
+    '''
+    wt_list = SCADA.turbines()
+    df_list = []
+    for month in power_curve.months(start, end):
+        last = month + pd.offsets.MonthEnd(0)
+        depends = {
+            wt: [
+                path
+                for path in ONSHORE.day_files(wt, month, last).values()
+                if path is not None
+            ]
+            for wt in wt_list
+        }
+
+        def intervals(wt, month=month, last=last):
+            with HiddenPrints():
+                fs = ONSHORE.statistics(start=month, end=last, wt_list=[wt])
+                fs.get_fault()
+            return availability.merge_intervals(
+                availability.fault_intervals(fs.fault_df)
+            )
+
+        df_list.append(SCADA.cached_stats(wt_list, month, depends, intervals))
+    if len(df_list) == 0:
+        return pd.DataFrame(columns=power_curve.stats_info)
+    return pd.concat(df_list, ignore_index=True)
+
+
+def _power_table(start: str, end: str) -> pd.DataFrame:
+    '''
+    ~各风机按月的停机小时数和损失电量(kWh)
+
+    Parameters
+    ----------
+    - start: 开始日期
+    - end: 结束日期
+    '''
+    df = power_curve.lost_energy(_power_stats(start, end))
+    df['month'] = pd.to_datetime(df['month']).dt.strftime('%Y-%m')
+    df[['down_hours', 'lost_kwh']] = df[['down_hours', 'lost_kwh']].round(2)
+    return df.rename(
+        columns={
+            'wt_id': '风机编号',
+            'month': '月份',
+            'down_hours': '停机小时数',
+            'lost_kwh': '损失电量(kWh)',
+        }
+    )
+
+
+def _get_coverage(start: str, end: str) -> list[tuple[str, Coverage]]:
+    '''
+    ~全部风场的状态文件完整性位图，结果会被缓存
+
+    Parameters
+    ----------
+    - start: 开始日期
+    - end: 结束日期
+    '''
+    key = f'coverage:{urlencode({"start": start, "end": end})}'
+    result = cache.get(key)
+    if result is None:
+        result = [
+            (source.farm, source.coverage(start, end)) for source in FAULT_SOURCES
+        ]
+        cache.set(key, result)
+    return result
+
+
+def _coverage_table(start: str, end: str) -> pd.DataFrame:
+    '''
+    ~全部风场各风机状态文件完整率及缺失日期
+
+    Parameters
+    ----------
+    - start: 开始日期
+    - end: 结束日期
+    '''
+    df_list = []
+    for farm, coverage in _get_coverage(start, end):
+        missing = [coverage.missing(wt) for wt in coverage.wt_list]
+        df_list.append(
+            pd.DataFrame(
+                {
+                    '风场': farm,
+                    '风机编号': coverage.wt_list,
+                    '完整率(%)': coverage.ratio().round(2).to_numpy(),
+                    '缺失天数': [len(days) for days in missing],
+                    '缺失日期': [','.join(days) for days in missing],
+                }
+            )
+        )
+    return pd.concat(df_list, ignore_index=True)
+
+
+def _get_snapshot(start: str, end: str) -> pd.DataFrame:
+    '''
+    ~全部海上风场故障明细及触发时刻运行工况，结果会被缓存
+
+    Parameters
+    ----------
+    - start: 开始日期
+    - end: 结束日期
+    '''
+    key = f'snapshot:{urlencode({"start": start, "end": end})}'
+    df = cache.get(key)
+    if df is None:
+        with HiddenPrints():
+            df = pd.concat(
+                [
+                    source.snapshot(start, end)
+                    for source in FAULT_SOURCES
+                    if source.kind == 'offshore'
+                ],
+                ignore_index=True,
+            )
+        cache.set(key, df)
+    return df
+
+
+def _condition_table(
+    start: str,
+    end: str,
+    rated: float = None,
+    high_load: float = 0.8,
+) -> pd.DataFrame:
+    '''
+    ~全部海上风场各故障代码触发时刻工况画像，参数见pkgs.condition.profile
+
+    Parameters
+    ----------
+    - start: 开始日期
+    - end: 结束日期
+    '''
+    df = condition.profile(_get_snapshot(start, end), rated=rated, high_load=high_load)
+    cols = ['hours', 'wind_mean', 'wind_p90', 'power_mean', 'power_p90', 'high_load_pct']
+    df[cols] = df[cols].round(2)
+    return df.rename(
+        columns={
+            'code': '故障代码',
+            'fault_en': '故障名称_英文',
+            'fault_cn': '故障名称_中文',
+            'count': '故障次数',
+            'hours': '故障时间(小时)',
+            'wind_mean': '平均风速',
+            'wind_p90': '风速P90',
+            'power_mean': '平均功率',
+            'power_p90': '功率P90',
+            'high_load_pct': '高负载占比(%)',
+        }
+    )
+
+
+def _quarantine_table(start: str, end: str) -> pd.DataFrame:
+    '''
+    ~全部风场未通过校验的状态文件隔离报告
+
+    Parameters
+    ----------
+    - start: 开始日期
+    - end: 结束日期
+    '''
+    df = pd.concat(
+        [source.quarantine(start, end) for source in FAULT_SOURCES], ignore_index=True
+    )
+    return df.rename(
+        columns={
+            'farm': '风场',
+            'wt_id': '风机编号',
+            'file_name': '文件名',
+            'reason': '原因',
+            'detail': '说明',
+            'path': '路径',
+        }
+    )
+
+
+def _table_key(view: str, params: dict) -> str:
+    '''
+    ~统计表的缓存键，不包含分页、排序、筛选参数
+    '''
+    params = {k: str(v) for k, v in params.items() if k not in TABLE_PAGE_PARAMS}
+    params['view'] = view
+    return f'table:{urlencode(sorted(params.items()))}'
+
+
+def _get_table(
+    view: str,
+    params: dict,
+    refresh: bool = False,
+    timeout: float = DEFAULT_TIMEOUT,
+    chunked: bool = False,
+) -> pd.DataFrame | None:
+    '''
+    ~按请求参数获取统计表，结果会被缓存，翻页、排序、筛选时不再重复计算
+
+    Parameters
+    ----------
+    - view: 表格类型
+    - params: 请求参数，包含start、end以及各表格类型需要的其他参数
+    - refresh: 忽略已有缓存，重新计算
+    - timeout: 缓存秒数，默认为CACHES中的TIMEOUT
+    - chunked: 逐台风机分块计算，只对CHUNKED_VIEWS有效，用于超出内存预算的查询
+    '''
+    params = {k: str(v) for k, v in params.items() if k not in TABLE_PAGE_PARAMS}
+    key = _table_key(view, params)
+    df = None if refresh else cache.get(key)
+    if df is None:
+        with profiling.stage('table'):
+            start = params['start']
+            end = params['end']
+            if view == 'test1':
+                df = _fault_table(start, end)
+            elif view == 'test7':
+                df = _offshore_table(params.get('id', ''), start, end)
+            elif view == 'anomaly':
+                df = _anomaly_table(
+                    start,
+                    end,
+                    value=params.get('value', 'count'),
+                    method=params.get('method', 'robust'),
+                    window=int(params.get('window', 14)),
+                    threshold=float(params.get('threshold', 3.0)),
+                )
+            elif view == 'fleet':
+                df = _fleet_table(start, end, chunked=chunked)
+            elif view == 'cascade':
+                df = _cascade_table(
+                    start,
+                    end,
+                    window=params.get('window', '10min'),
+                    max_length=int(params.get('max_length', 3)),
+                    min_support=int(params.get('min_support', 2)),
+                )
+            elif view == 'availability':
+                df = _availability_table(start, end, freq=params.get('freq', 'D'))
+            elif view == 'heatmap':
+                df = _heatmap_table(
+                    start,
+                    end,
+                    value=params.get('value', 'hours'),
+                    freq=params.get('freq', 'auto'),
+                )
+            elif view == 'condition':
+                rated = params.get('rated', '')
+                df = _condition_table(
+                    start,
+                    end,
+                    rated=float(rated) if rated else None,
+                    high_load=float(params.get('high_load', 0.8)),
+                )
+            elif view == 'power':
+                df = _power_table(start, end)
+            elif view == 'coverage':
+                df = _coverage_table(start, end)
+            elif view == 'quarantine':
+                df = _quarantine_table(start, end)
+            else:
+                return None
+            # 先写入缓存再于阶段结束时检查内存预算，超出预算时已算好的结果不被丢弃
+            cache.set(key, df, timeout)
+    return df
+
+
+def _turbine_count(source) -> int:
+    '''
+    ~数据源的风机数，数据根目录不可访问时为0
+    '''
+    try:
+        return len(source.turbines())
+    except OSError:
+        return 0
+
+
+def _cached_fraction(source, start: str, end: str, sample: int = COST_SAMPLE) -> float:
+    '''
+    ~抽样估计时间范围内状态文件已解析缓存的比例，按编号均匀抽取sample台风机
+
+    Parameters
+    ----------
+    - source: 故障数据源
+    - start: 开始日期
+    - end: 结束日期
+    - sample: 抽样风机数
+    '''
+    if source.store is None:
+        return 0.0
+    try:
+        wt_list = source.turbines()
+    except OSError:
+        return 0.0
+    wt_list = wt_list[:: max(len(wt_list) // sample, 1)][:sample]
+    paths = [
+        path
+        for wt in wt_list
+        for path in source.day_files(wt, start, end).values()
+        if path is not None
+    ]
+    if not paths:
+        # 没有文件时读取很快，按已缓存处理
+        return 1.0
+    return sum(source.store.contains(path) for path in paths) / len(paths)
+
+
+def _source_cost(source_list: list, start: str, end: str) -> float:
+    '''
+    ~多个数据源未缓存部分的风机×天
+    '''
+    days = (pd.Timestamp(end) - pd.Timestamp(start)).days + 1
+    return sum(
+        _turbine_count(source) * days * (1 - _cached_fraction(source, start, end))
+        for source in source_list
+    )
+
+
+def _missing_source(view: str) -> str | None:
+    '''
+    ~表格类型需要但未在settings.FAULT_DATA_ROOTS中配置的数据源类型，均已配置时为None
+
+    Parameters
+    ----------
+    - view: 表格类型
+    '''
+    if view in ONSHORE_VIEWS and ONSHORE is None:
+        return 'onshore'
+    if view in OFFSHORE_VIEWS and OFFSHORE is None:
+        return 'offshore'
+    return None
+
+
+def _view_inputs(view: str, params: dict) -> tuple[list, str]:
+    '''
+    ~统计表读取的故障数据源及实际读取的开始日期
+
+    Parameters
+    ----------
+    - view: 表格类型
+    - params: 请求参数，包含start
+    '''
+    start = params['start']
+    if view == 'anomaly':
+        # 向前多读window天作为基线
+        window = int(params.get('window', 14))
+        start = (pd.Timestamp(start) - pd.Timedelta(days=window)).strftime('%Y-%m-%d')
+    if _missing_source(view) is not None:
+        return [], start
+    if view in ONSHORE_VIEWS:
+        return [ONSHORE], start
+    if view == 'test7':
+        return [OFFSHORE], start
+    if view in ('fleet', 'heatmap'):
+        return FAULT_SOURCES, start
+    if view == 'condition':
+        return [source for source in FAULT_SOURCES if source.kind == 'offshore'], start
+    return [], start
+
+
+def estimate_cost(request: HttpRequest) -> float:
+    '''
+    ~估算请求的计算代价：风机数×天数×未缓存比例，统计表已缓存时为0，
+    用于分析任务调度，代价小的请求优先，代价大的请求限制并发
+
+    Parameters
+    ----------
+    - request: /data/、/table/或各分析页面的请求
+    '''
+    params = request.GET.dict()
+    view = params.get('view') or request.path.strip('/').split('/')[-1]
+    if _missing_source(view) is not None:
+        # 由guarded_response返回404
+        return 0.0
+    try:
+        start, end = params['start'], params['end']
+        days = (pd.Timestamp(end) - pd.Timestamp(start)).days + 1
+        source_list, start = _view_inputs(view, params)
+    except (KeyError, ValueError):
+        # 参数有误，由视图返回错误
+        return 0.0
+    if view == 'export':
+        # 导出逐台风机读取全部明细，不使用统计表缓存
+        _, source_list, wt_lists = _export_scope(request)
+        return days * sum(
+            len(wt_lists.get(source.farm, [])) or _turbine_count(source)
+            for source in source_list
+        )
+    if view != 'test8' and cache.has_key(_table_key(view, params)):
+        return 0.0
+    if view in ('test1', 'test7'):
+        # 单台风机
+        return days * (1 - _cached_fraction(source_list[0], start, end, sample=1))
+    if view in ('fleet', 'heatmap'):
+        loaded = SHARED_FAULTS.load()
+        if loaded is not None and _shared_covers(
+            loaded[1], pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+        ):
+            # 共享数据集覆盖查询范围，只需切片
+            return 0.0
+    if view == 'power':
+        return len(SCADA.turbines()) * days
+    return _source_cost(source_list, start, end)
+
+
+def _view_files(view: str, params: dict) -> list[Path]:
+    '''
+    ~统计表读取的全部输入文件
+
+    Parameters
+    ----------
+    - view: 表格类型
+    - params: 请求参数，包含start、end，test7包含id
+    '''
+    source_list, start = _view_inputs(view, params)
+    end = params['end']
+    paths = []
+    for source in source_list:
+        if view == 'test1':
+            wt_list = [str(FAULT_TABLE_WT)]
+        elif view == 'test7':
+            wt_list = [f'00{params.get("id", "")}#']
+        else:
+            wt_list = source.turbines()
+        for wt in wt_list:
+            paths += [p for p in source.day_files(wt, start, end).values() if p is not None]
+    if view == 'power':
+        paths += [
+            path
+            for wt in SCADA.turbines()
+            for month in power_curve.months(start, end)
+            for path in SCADA.month_files(wt, month)
+        ]
+    return paths
+
+
+def _input_signature(view: str, params: dict) -> str:
+    '''
+    ~统计表输入文件的签名，按文件路径、大小、修改时间计算，任一文件新增或变化后签名改变
+
+    Parameters
+    ----------
+    - view: 表格类型
+    - params: 请求参数，包含start、end
+    '''
+    h = hashlib.sha1()
+    for path in sorted(_view_files(view, params)):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        h.update(f'{path}|{stat.st_size}|{stat.st_mtime_ns};'.encode('utf-8'))
+    return h.hexdigest()
+
+
+def warmup_jobs(views: list[str] = None) -> list[tuple[str, dict]]:
+    '''
+    ~页面默认查询范围的预热任务，返回(表格类型, 请求参数)，参数与页面请求一致，命中同一缓存键
+
+    Parameters
+    ----------
+    - views: 表格类型，默认为settings.CACHE_WARMUP_VIEWS
+    '''
+    from .views import default_range
+
+    params = default_range()
+    jobs = []
+    for view in settings.CACHE_WARMUP_VIEWS if views is None else views:
+        if _missing_source(view) is not None:
+            continue
+        if view == 'test1':
+            jobs.append((view, {**params, 'view': view}))
+        elif view == 'test7':
+            # 页面按id查询，风机文件夹名为00{id}#
+            for wt in OFFSHORE.turbines():
+                if wt.startswith('00') and wt.endswith('#'):
+                    jobs.append((view, {**params, 'id': wt[2:-1], 'view': view}))
+        else:
+            # 各分析页面的请求只有start、end
+            jobs.append((view, dict(params)))
+    return jobs
+
+
+def _warm_table(view: str, params: dict, force: bool = False) -> str:
+    '''
+    ~预热单个统计表，输入文件签名与缓存时一致且缓存仍存在时跳过，返回fresh或computed
+    '''
+    key = _table_key(view, params)
+    signature = _input_signature(view, params)
+    if not force and cache.get(f'warmup:{key}') == signature and cache.has_key(key):
+        return 'fresh'
+    _get_table(view, params, refresh=True, timeout=settings.CACHE_WARMUP_TIMEOUT)
+    cache.set(f'warmup:{key}', signature, settings.CACHE_WARMUP_TIMEOUT)
+    return 'computed'
+
+
+def warm_cache(
+    views: list[str] = None,
+    workers: int = None,
+    force: bool = False,
+) -> list[tuple[str, dict, str, float]] | None:
+    '''
+    ~按页面默认查询范围预先计算统计表，同时计算的表格数有上限，多进程间通过锁文件只运行一次，
+    返回各任务的(表格类型, 请求参数, 结果, 耗时秒数)，其他进程正在预热时返回None
+
+    Parameters
+    ----------
+    - views: 表格类型，默认为settings.CACHE_WARMUP_VIEWS
+    - workers: 同时计算的表格数，默认为settings.CACHE_WARMUP_WORKERS
+    - force: 忽略已有缓存，全部重新计算
+    '''
+    lock = Path(settings.CACHE_WARMUP_LOCK)
+    lock.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        # 超过一小时的锁文件为中断的预热，删除后重试
+        try:
+            if time.time() - lock.stat().st_mtime < 3600:
+                return None
+            lock.unlink()
+        except FileNotFoundError:
+            pass
+        return warm_cache(views, workers, force)
+    os.close(fd)
+
+    def run(job: tuple[str, dict]) -> tuple[str, dict, str, float]:
+        view, params = job
+        t0 = time.perf_counter()
+        try:
+            status = _warm_table(view, params, force)
+        except Exception as exc:
+            status = f'failed: {exc!r}'
+        return view, params, status, time.perf_counter() - t0
+
+    try:
+        with ThreadPoolExecutor(
+            max_workers=workers or settings.CACHE_WARMUP_WORKERS,
+            thread_name_prefix='warmup',
+        ) as pool:
+            return list(pool.map(run, warmup_jobs(views)))
+    finally:
+        lock.unlink(missing_ok=True)
+
+
+def estimate_memory(view: str, params: dict) -> int:
+    '''
+    ~查询前估算计算统计表需要的内存(字节)：输入文件总大小×ANALYSIS_MEMORY_FACTOR，统计表已缓存时为0
+
+    Parameters
+    ----------
+    - view: 表格类型
+    - params: 请求参数
+    '''
+    if view == 'test8' or cache.has_key(_table_key(view, params)):
+        return 0
+    try:
+        paths = _view_files(view, params)
+    except (KeyError, ValueError, OSError):
+        return 0
+    size = 0
+    for path in paths:
+        try:
+            size += os.stat(path).st_size
+        except FileNotFoundError:
+            continue
+    return int(size * settings.ANALYSIS_MEMORY_FACTOR)
+
+
+def _over_budget(view: str, used: int, stage: str = None) -> HttpResponse:
+    '''
+    ~超出内存预算的查询返回413，提示缩短查询范围或流式导出明细
+    '''
+    budget = settings.ANALYSIS_MEMORY_BUDGET
+    context = {
+        'error': 'memory budget exceeded',
+        'view': view,
+        'stage': stage or 'estimate',
+        'used_mb': round(used / profiling.MB, 1),
+        'budget_mb': round(budget / profiling.MB, 1),
+        'hint': '请缩短查询范围，或通过/export/流式导出故障明细',
+    }
+    return JsonResponse(context, status=413, json_dumps_params={'ensure_ascii': False})
+
+
+def guarded_response(func, request: HttpRequest) -> HttpResponse:
+    '''
+    ~在内存预算内执行分析视图：估算超出ANALYSIS_MEMORY_BUDGET时，CHUNKED_VIEWS中的表格改为
+    逐台风机分块计算，其他表格直接拒绝；执行中各阶段结束时常驻内存增长超出预算同样中止并拒绝。
+    开启ANALYSIS_MEMORY_PROFILE时各阶段耗时和内存写入响应头Server-Timing。
+    表格类型需要的数据源未配置时返回404
+
+    Parameters
+    ----------
+    - func: 同步视图函数
+    - request: 请求
+    '''
+    params = request.GET.dict()
+    view = params.get('view') or request.path.strip('/').split('/')[-1]
+    missing = _missing_source(view)
+    if missing is not None:
+        return JsonResponse({'error': f'no {missing} source configured'}, status=404)
+    budget = settings.ANALYSIS_MEMORY_BUDGET
+    with profiling.Profiler(settings.ANALYSIS_MEMORY_PROFILE, budget) as profiler:
+        try:
+            if budget:
+                need = estimate_memory(view, params)
+                if need > budget:
+                    if view not in CHUNKED_VIEWS:
+                        return _over_budget(view, need)
+                    # 分块计算结果写入同一缓存键，之后的视图直接使用
+                    _get_table(view, params, chunked=True)
+            response = func(request)
+        except profiling.MemoryBudgetExceeded as exc:
+            return _over_budget(view, exc.used, exc.stage)
+    if profiler.enabled:
+        response['Server-Timing'] = profiler.server_timing()
+        logger.info(f'{request.get_full_path()}  {response["Server-Timing"]}')
+    return response
+
+
+def _options(chart: str | None) -> dict | None:
+    '''
+    ~将图表json文本转为对象，随响应一次性序列化，前端无需二次解析
+
+    Parameters
+    ----------
+    - chart: charts模块生成的图表json文本
+    '''
+    return None if chart is None else json.loads(chart)
+
+
+def _json_response(context: dict) -> HttpResponse:
+    '''
+    ~打包为json并回传
+    '''
+    with profiling.stage('dump'):
+        return HttpResponse(json_dumps(context), content_type='application/json')
+
+
+def table_response(request: HttpRequest) -> HttpResponse:
+    '''
+    ~分页获取统计表，支持page、size、sort（列序号）、order（asc/desc）、search参数
+    '''
+    # 先校验分页参数，避免计算统计表后才出错
+    try:
+        page = int(request.GET.get('page', 1))
+        size = int(request.GET.get('size', TABLE_PAGE_SIZE))
+        sort = request.GET.get('sort')
+        sort = None if sort in (None, '') else int(sort)
+    except ValueError:
+        return JsonResponse(
+            {'error': 'page, size and sort must be integers'}, status=400
+        )
+    if 'view' not in request.GET:
+        return JsonResponse({'error': 'view is required'}, status=400)
+    df = _get_table(request.GET['view'], request.GET.dict())
+    if df is None:
+        return JsonResponse({'error': 'unknown view'}, status=400)
+    return _json_response(
+        table_page(
+            df,
+            page=page,
+            size=size,
+            sort=sort,
+            ascending=request.GET.get('order', 'asc') != 'desc',
+            search=request.GET.get('search'),
+        )
+    )
+
+
+def data_response(request: HttpRequest) -> HttpResponse:
+    '''
+    ~按view参数计算图表和统计表
+    '''
+    if request.GET['view'] == 'test1':
+        context = {}
+        df = _get_table(request.GET['view'], request.GET.dict())
+
+        # 只回传首页，其余页通过get_table获取
+        context['table'] = table_page(df, size=TABLE_PAGE_SIZE)
+        y_label_0 = '故障时间(小时)'
+        y_label_1 = '故障次数'
+        context['chart'] = []
+        df = df.sort_values(by=y_label_0, ascending=False)
+        context['chart'].append(
+            _options(bar_json(df[['故障名称_中文', y_label_0]], y_label_0))
+        )
+        df = df.sort_values(by=y_label_1, ascending=False)
+        context['chart'].append(
+            _options(bar_json(df[['故障名称_中文', y_label_1]], y_label_1))
+        )
+        context['id'] = 1
+        # 打包为json，回传
+        return _json_response(context)
+
+    if request.GET['view'] == 'test7':
+        context = {}
+        df = _get_table(request.GET['view'], request.GET.dict())
+        # 只回传首页，其余页通过get_table获取
+        context['table'] = table_page(df, size=TABLE_PAGE_SIZE)
+
+        context['chart'] = []
+        df = df.sort_values(by='持续时间', ascending=False)
+        context['chart'].append(
+            _options(
+                bar_json(df[['故障描述_中文', '持续时间']].head(10), '故障时间(小时)')
+            )
+        )
+
+        df = df.sort_values(by='故障次数', ascending=False)
+        context['chart'].append(
+            _options(bar_json(df[['故障描述_中文', '故障次数']].head(10), '故障次数'))
+        )
+        # 重叠导出文件中去除的重复记录数
+        context['duplicates'] = df.attrs.get('duplicates', 0)
+        context['id'] = 1
+        # 打包为json，回传
+        return _json_response(context)
+
+    if request.GET['view'] == 'fleet':
+        context = {}
+        df = _get_table(request.GET['view'], request.GET.dict())
+        context['table'] = table_page(df, size=TABLE_PAGE_SIZE)
+        # 各风场合并后按故障名称统计
+        name_df = df.groupby('故障名称_中文')[['故障时间(小时)', '故障次数']].sum()
+        name_df = name_df.reset_index()
+        context['chart'] = []
+        for y_label in ['故障时间(小时)', '故障次数']:
+            top_df = name_df.sort_values(by=y_label, ascending=False).head(10)
+            context['chart'].append(
+                _options(bar_json(top_df[['故障名称_中文', y_label]], y_label))
+            )
+        return _json_response(context)
+
+    if request.GET['view'] == 'test8':
+        context = {}
+        start = str(request.GET['start'])
+        end = str(request.GET['end'])
+        context['chart'] = []
+        df = pd.DataFrame()
+        df['时间'] = pd.date_range(start=start, end=end, freq='1d').strftime('%Y-%m-%d')
+        df['1p频率'] = np.random.randint(0, 100, len(df))
+        df['3p频率'] = np.random.randint(0, 100, len(df))
+        context['chart'].append(
+            _options(
+                line_json(
+                    df.drop(columns=['时间']),
+                    df['时间'].to_list(),
+                    title='振动频率',
+                )
+            )
+        )
+        return _json_response(context)
+
+
+def anomaly_response(request: HttpRequest) -> HttpResponse:
+    '''
+    ~全场故障频次异常，支持start、end、value（count/hours）、method（robust/ewma）、window、threshold参数，
+    翻页时使用table_response并传入view=anomaly
+    '''
+    context = {}
+    df = _get_table('anomaly', request.GET.dict())
+    context['table'] = table_page(df, size=TABLE_PAGE_SIZE)
+    # 各风机异常次数
+    count_df = df.groupby('风机编号').size().rename('异常次数').reset_index()
+    count_df['风机编号'] = count_df['风机编号'].astype(str)
+    context['chart'] = [_options(bar_json(count_df, '异常次数'))]
+    return _json_response(context)
+
+
+def availability_response(request: HttpRequest) -> HttpResponse:
+    '''
+    ~全场风机时间可利用率，支持start、end、freq（D/W/M）参数，翻页时使用table_response并传入view=availability
+    '''
+    context = {}
+    df = _get_table('availability', request.GET.dict())
+    context['table'] = table_page(df, size=TABLE_PAGE_SIZE)
+    wt_df = df.drop(columns=['周期', '周期小时数'])
+    context['chart'] = []
+    # 全场各周期平均与最低可利用率
+    fleet_df = pd.DataFrame(
+        {'全场平均(%)': wt_df.mean(axis=1).round(2), '最低(%)': wt_df.min(axis=1)}
+    )
+    context['chart'].append(
+        _options(line_json(fleet_df, df['周期'].to_list(), title='时间可利用率'))
+    )
+    # 各风机整个时段的可利用率，按周期小时数加权
+    weight = df['周期小时数'] / df['周期小时数'].sum()
+    wt_rate = wt_df.mul(weight, axis=0).sum().round(2)
+    bar_df = pd.DataFrame({'风机编号': wt_rate.index, '可利用率(%)': wt_rate.to_numpy()})
+    context['chart'].append(
+        _options(bar_json(bar_df.sort_values('可利用率(%)'), '可利用率(%)'))
+    )
+    return _json_response(context)
+
+
+def heatmap_response(request: HttpRequest) -> HttpResponse:
+    '''
+    ~全部风场风机×周期故障热力图，支持start、end、value（hours/count）、freq（D/W/auto）参数，
+    只回传图表，明细可使用table_response并传入view=heatmap
+    '''
+    df = _get_table('heatmap', request.GET.dict())
+    title = '故障次数' if request.GET.get('value') == 'count' else '故障时间(小时)'
+    # 故障矩阵大多为0，只输出非0格子
+    chart = heatmap_json(df.set_index('风机'), title, skip_zero=True)
+    return _json_response({'chart': [_options(chart)]})
+
+
+def coverage_response(request: HttpRequest) -> HttpResponse:
+    '''
+    ~全部风场状态文件完整性，支持start、end参数，翻页时使用table_response并传入view=coverage
+    '''
+    context = {}
+    df = _get_table('coverage', request.GET.dict())
+    context['table'] = table_page(df, size=TABLE_PAGE_SIZE)
+    # 完整性热力图，行为风场-风机，列为日期
+    frame_list = []
+    for farm, coverage in _get_coverage(request.GET['start'], request.GET['end']):
+        frame = coverage.to_frame().astype(int)
+        frame.index = [f'{farm}-{wt}' for wt in frame.index]
+        frame_list.append(frame)
+    frame = pd.concat(frame_list)
+    frame.columns = frame.columns.strftime('%Y-%m-%d')
+    pieces = [
+        {'value': 0, 'label': '缺失', 'color': '#D62728'},
+        {'value': 1, 'label': '完整', 'color': '#227447'},
+    ]
+    context['chart'] = [_options(heatmap_json(frame, '数据完整性', pieces=pieces))]
+    return _json_response(context)
+
+
+def condition_response(request: HttpRequest) -> HttpResponse:
+    '''
+    ~海上风场故障触发工况，支持start、end、rated、high_load、value（count/hours）、
+    code（逗号分隔，默认全部代码）、wind_step、power_step参数，翻页时使用table_response并传入view=condition
+    '''
+    context = {}
+    df = _get_table('condition', request.GET.dict())
+    context['table'] = table_page(df, size=TABLE_PAGE_SIZE)
+    value = request.GET.get('value', 'count')
+    code = request.GET.get('code')
+    wind_step = float(request.GET.get('wind_step', 1.0))
+    power_step = float(request.GET.get('power_step', 500.0))
+    snapshot_df = _get_snapshot(request.GET['start'], request.GET['end'])
+    codes = code.split(',') if code else None
+    bin_df = condition.bins(snapshot_df, wind_step=wind_step, power_step=power_step)
+    matrix = condition.grid(
+        bin_df,
+        value=value,
+        codes=codes,
+        wind_step=wind_step,
+        power_step=power_step,
+    )
+    matrix.index = [f'{power:g}' for power in matrix.index]
+    matrix.columns = [f'{wind:g}' for wind in matrix.columns]
+    title = '故障时间(小时)' if value == 'hours' else '故障次数'
+    context['chart'] = [
+        _options(heatmap_json(matrix, f'风速×功率{title}', skip_zero=True))
+    ]
+    # 高负载时触发最多的故障
+    top_df = df.assign(
+        高负载次数=(df['故障次数'] * df['高负载占比(%)'] / 100).round().astype(int)
+    ).sort_values('高负载次数', ascending=False)
+    context['chart'].append(
+        _options(bar_json(top_df[['故障名称_中文', '高负载次数']].head(10), '高负载次数'))
+    )
+    # 逐条故障的触发工况散点，点数较多时在服务端聚合为密度图
+    if codes is not None:
+        snapshot_df = snapshot_df[snapshot_df['code'].isin(codes)]
+    context['chart'].append(
+        _options(scatter_json(snapshot_df[['风速', '发电机功率']], '触发工况'))
+    )
+    return _json_response(context)
+
+
+def power_response(request: HttpRequest) -> HttpResponse:
+    '''
+    ~功率曲线与停机损失电量，支持start、end参数（扩展为整月），翻页时使用table_response并传入view=power
+    '''
+    context = {}
+    df = _get_table('power', request.GET.dict())
+    context['table'] = table_page(df, size=TABLE_PAGE_SIZE)
+    # 各风机各风速箱的平均风速、平均功率，全部风机画在同一张散点图中
+    curve_df = power_curve.curve(_power_stats(request.GET['start'], request.GET['end']))
+    context['chart'] = [
+        _options(
+            scatter_json(
+                curve_df[['wind_mean', 'power_mean']].rename(
+                    columns={'wind_mean': '风速(m/s)', 'power_mean': '功率(kW)'}
+                ),
+                '功率曲线',
+            )
+        )
+    ]
+    lost_df = df.groupby('风机编号', sort=False)['损失电量(kWh)'].sum().round(2)
+    lost_df = lost_df.sort_values(ascending=False).reset_index()
+    context['chart'].append(_options(bar_json(lost_df, '损失电量(kWh)')))
+    return _json_response(context)
+
+
+def cascade_response(request: HttpRequest) -> HttpResponse:
+    '''
+    ~全场停机前频繁故障代码组合，支持start、end、window、max_length、min_support参数，
+    翻页时使用table_response并传入view=cascade
+    '''
+    df = _get_table('cascade', request.GET.dict())
+    return _json_response({'table': table_page(df, size=TABLE_PAGE_SIZE)})
+
+
+def _export_frames(
+    source_list: list[sources.FaultSource],
+    start: str,
+    end: str,
+    wt_lists: dict[str, list[str]],
+    snapshot: bool,
+):
+    '''
+    ~逐台风机读取故障明细，每次只有一台风机的数据在内存中
+
+    Parameters
+    ----------
+    - source_list: 数据源
+    - start: 开始日期
+    - end: 结束日期
+    - wt_lists: 各风场的风机列表，未指定的风场导出全部风机
+    - snapshot: 是否附带海上触发工况列，只在全部数据源为海上时使用
+    '''
+    for source in source_list:
+        for wt in wt_lists.get(source.farm) or source.turbines():
+            # 只在读取时屏蔽输出，生成器挂起期间不能占用进程共享的sys.stdout
+            with HiddenPrints():
+                if snapshot:
+                    df = source.snapshot(start, end, [wt])
+                else:
+                    df = source.load(start, end, [wt])
+            yield df
+
+
+def _stream(request: HttpRequest, chunks, cost: float = 0.0):
+    '''
+    ~按服务器类型包装字节流：WSGI直接迭代；ASGI下每块在分析线程池中生成，避免整体读入内存，
+    各块按导出的代价调度，同样受重任务并发上限限制
+    '''
+    if not isinstance(request, ASGIRequest):
+        return chunks
+
+    async def agen():
+        while True:
+            chunk = await run_analysis(next, chunks, None, cost=cost)
+            if chunk is None:
+                break
+            yield chunk
+
+    return agen()
+
+
+def _export_scope(request: HttpRequest) -> tuple[list[str], list, dict]:
+    '''
+    ~导出请求的范围，返回(未知风场, 数据源, 各风场的风机列表)
+
+    Parameters
+    ----------
+    - request: 包含farm、wt参数的请求
+    '''
+    farms = request.GET.getlist('farm')
+    by_farm = {source.farm: source for source in FAULT_SOURCES}
+    unknown = [farm for farm in farms if farm not in by_farm]
+    if farms:
+        source_list = [by_farm[farm] for farm in farms if farm in by_farm]
+    else:
+        source_list = FAULT_SOURCES
+    wt_lists = {}
+    for item in request.GET.getlist('wt'):
+        farm, _, wts = item.partition('=')
+        wt_lists[farm] = [wt.strip() for wt in wts.split(',') if wt.strip()]
+    return unknown, source_list, wt_lists
+
+
+def export_response(request: HttpRequest) -> HttpResponse:
+    '''
+    ~流式导出故障明细，支持start、end、farm（可重复，默认全部风场）、wt（可重复，格式为 风场=1,2,3）、
+    format（csv/parquet）、encoding（csv编码，默认gbk）参数，逐台风机读取并分批写出
+    '''
+    start, end = request.GET.get('start'), request.GET.get('end')
+    if not start or not end:
+        return JsonResponse({'error': 'start and end are required'}, status=400)
+    # 数据在响应头发出后才读取，日期须预先解析，否则错误只能表现为截断的文件
+    try:
+        start, end = pd.to_datetime(start), pd.to_datetime(end)
+    except (ValueError, OverflowError):
+        return JsonResponse({'error': 'invalid start or end'}, status=400)
+    if pd.isna(start) or pd.isna(end) or start > end:
+        return JsonResponse({'error': 'invalid start or end'}, status=400)
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in export.formats:
+        return JsonResponse({'error': f'unknown format: {fmt}'}, status=400)
+    if fmt == 'parquet' and export.pa is None:
+        return JsonResponse({'error': 'parquet export requires pyarrow'}, status=400)
+    unknown, source_list, wt_lists = _export_scope(request)
+    if unknown:
+        return JsonResponse({'error': f'unknown farm: {",".join(unknown)}'}, status=400)
+    snapshot = all(source.kind == 'offshore' for source in source_list)
+    columns = [*sources.fault_schema, *(condition.snapshot_info if snapshot else [])]
+    frames = _export_frames(source_list, start, end, wt_lists, snapshot)
+    if fmt == 'csv':
+        encoding = request.GET.get('encoding', 'gbk')
+        try:
+            # hex_codec等非文本编解码器同样可以查到，不能用于写出csv
+            text = codecs.lookup(encoding)._is_text_encoding
+        except LookupError:
+            text = False
+        if not text:
+            return JsonResponse({'error': f'unknown encoding: {encoding}'}, status=400)
+        chunks = export.csv_stream(frames, columns, encoding=encoding)
+    else:
+        dtypes = {
+            'start_time': 'datetime64[ns]',
+            'end_time': 'datetime64[ns]',
+            'duration': 'float64',
+            **{col: 'float64' for col in condition.snapshot_info},
+        }
+        chunks = export.parquet_stream(frames, columns, dtypes=dtypes)
+    response = StreamingHttpResponse(
+        _stream(request, chunks, cost=estimate_cost(request)),
+        content_type=export.formats[fmt],
+    )
+    # 文件名只使用解析后的日期，原始参数可能包含破坏响应头的字符
+    name = f'fault_{start:%Y%m%d}_{end:%Y%m%d}.{fmt}'
+    response['Content-Disposition'] = f'attachment; filename="{name}"'
+    return response
@@ -1,6 +1,28 @@
+import sys
+import threading
+from pathlib import Path
+
 from django.apps import AppConfig
+from django.conf import settings
+
+
+def _warm_cache():
+    # 分析模块较重，在后台线程中导入，不影响启动耗时
+    from . import analysis
+
+    result = analysis.warm_cache()
+    for view, params, status, _ in result or []:
+        if status.startswith('failed'):
+            sys.stderr.write(f'预热失败: {view} {params}  {status}\n')
 
 
 class TestAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'website.apps.test_app1'
+
+    def ready(self):
+        # manage.py的其他命令不提供服务，不预热；ingest_watch在每批文件解析后自行预热
+        if Path(sys.argv[0]).name == 'manage.py' and sys.argv[1:2] != ['runserver']:
+            return
+        if settings.CACHE_WARMUP_ON_START:
+            threading.Thread(target=_warm_cache, name='cache_warmup', daemon=True).start()
@@ -0,0 +1,309 @@
+# 分析任务调度：按估算代价排队，便宜的任务优先，限制同时进行的重任务数，避免耗时的pandas计算阻塞事件循环
+from __future__ import annotations
+
+import asyncio
+import bisect
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from functools import partial
+from typing import Any, Callable
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.http.response import HttpResponseBase
+
+# 最近完成任务的排队等待时间(秒)，用于统计
+WAIT_HISTORY = 200
+# 已完成但未被轮询取走的结果保留秒数
+RESULT_TTL = 300
+
+# 不合并的请求在任务标识后追加的序号
+_unique = itertools.count()
+
+
+def _ms(seconds: float) -> float:
+    return round(1000 * seconds, 1)
+
+
+class _Job:
+    '''
+    ~排队中的任务
+    '''
+
+    __slots__ = (
+        'cost', 'seq', 'func', 'future', 'heavy', 'key', 'submitted', 'finished'
+    )
+
+    def __init__(self, cost: float, seq: int, func: Callable, heavy: bool, key: str):
+        self.cost = cost
+        self.seq = seq
+        self.func = func
+        self.future: Future = Future()
+        self.heavy = heavy
+        self.key = key
+        self.submitted = time.monotonic()
+        self.finished: float | None = None
+
+    def __lt__(self, other: '_Job') -> bool:
+        return (self.cost, self.seq) < (other.cost, other.seq)
+
+
+class Scheduler:
+    '''
+    ~分析任务调度器，工作线程每次取出可运行的代价最小的任务
+
+    - 代价不低于heavy_cost的为重任务，同时运行的重任务不超过max_heavy个
+    - 重任务排队时轻任务仍可执行，已缓存的查询不会被重任务阻塞
+    '''
+
+    def __init__(self, max_workers: int, max_heavy: int, heavy_cost: float) -> None:
+        '''
+        Parameters
+        ----------
+        - max_workers: 工作线程数
+        - max_heavy: 同时运行的重任务数上限
+        - heavy_cost: 重任务的代价下限(风机×天)
+        '''
+        self.max_workers = max_workers
+        self.max_heavy = max_heavy
+        self.heavy_cost = heavy_cost
+        self._cond = threading.Condition()
+        # 按(代价, 提交顺序)排序的等待队列
+        self._queue: list[_Job] = []
+        self._seq = itertools.count()
+        self._running = 0
+        self._running_heavy = 0
+        # 进行中或未取走结果的任务，相同key的请求共用同一个任务
+        self._jobs: dict[str, _Job] = {}
+        self._waits: deque[float] = deque(maxlen=WAIT_HISTORY)
+        self._completed = 0
+        self._queued_responses = 0
+        self._threads = [
+            threading.Thread(target=self._work, name=f'analysis_{i}', daemon=True)
+            for i in range(max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(
+        self,
+        func: Callable[[], Any],
+        cost: float = 0.0,
+        key: str = None,
+    ) -> Future:
+        '''
+        ~提交任务，key相同且尚未取走结果的任务直接返回已有的Future
+
+        Parameters
+        ----------
+        - func: 无参数的同步函数
+        - cost: 估算代价(风机×天)，越小越先执行
+        - key: 任务标识，通常为请求的完整路径，为None时不合并
+        '''
+        with self._cond:
+            self._expire()
+            if key is not None and key in self._jobs:
+                return self._jobs[key].future
+            job = _Job(cost, next(self._seq), func, cost >= self.heavy_cost, key)
+            bisect.insort(self._queue, job)
+            if key is not None:
+                self._jobs[key] = job
+            self._cond.notify()
+            return job.future
+
+    def position(self, key: str) -> int:
+        '''
+        ~返回排队状态时调用，记录次数并返回任务在等待队列中的位置，从1开始，已开始运行时为0
+        '''
+        with self._cond:
+            self._queued_responses += 1
+            job = self._jobs.get(key)
+            if job is None or job not in self._queue:
+                return 0
+            return self._queue.index(job) + 1
+
+    def release(self, key: str) -> None:
+        '''
+        ~结果已回传，移除任务，之后相同key的请求重新计算
+        '''
+        with self._cond:
+            job = self._jobs.get(key)
+            if job is not None and job.future.done():
+                del self._jobs[key]
+
+    def _expire(self) -> None:
+        '''
+        ~移除完成超过RESULT_TTL秒仍未取走的结果，须在持有锁时调用
+        '''
+        now = time.monotonic()
+        for key, job in list(self._jobs.items()):
+            if job.finished is not None and now - job.finished > RESULT_TTL:
+                del self._jobs[key]
+
+    def _next(self) -> _Job | None:
+        '''
+        ~取出可运行的代价最小的任务，须在持有锁时调用
+        '''
+        for i, job in enumerate(self._queue):
+            if not job.heavy or self._running_heavy < self.max_heavy:
+                return self._queue.pop(i)
+        return None
+
+    def _work(self) -> None:
+        '''
+        ~工作线程
+        '''
+        while True:
+            with self._cond:
+                job = self._next()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next()
+                self._running += 1
+                self._running_heavy += job.heavy
+                self._waits.append(time.monotonic() - job.submitted)
+            try:
+                if job.future.set_running_or_notify_cancel():
+                    try:
+                        job.future.set_result(job.func())
+                    except BaseException as exc:
+                        job.future.set_exception(exc)
+            finally:
+                with self._cond:
+                    job.finished = time.monotonic()
+                    self._running -= 1
+                    self._running_heavy -= job.heavy
+                    self._completed += 1
+                    # 重任务结束后可能有排队的重任务可以运行
+                    self._cond.notify_all()
+
+    def metrics(self) -> dict:
+        '''
+        ~队列深度、运行数和排队等待时间统计
+        '''
+        with self._cond:
+            waits = sorted(self._waits)
+            return {
+                'max_workers': self.max_workers,
+                'max_heavy': self.max_heavy,
+                'heavy_cost': self.heavy_cost,
+                'running': self._running,
+                'running_heavy': self._running_heavy,
+                'queued': len(self._queue),
+                'queued_heavy': sum(job.heavy for job in self._queue),
+                'completed': self._completed,
+                'queued_responses': self._queued_responses,
+                # 最近WAIT_HISTORY个任务从提交到开始运行的等待时间
+                'wait_ms': {
+                    'mean': _ms(sum(waits) / len(waits)) if waits else 0,
+                    'p95': _ms(waits[int(0.95 * (len(waits) - 1))]) if waits else 0,
+                    'max': _ms(waits[-1]) if waits else 0,
+                },
+            }
+
+
+_scheduler: Scheduler | None = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    '''
+    ~获取分析任务调度器，首次使用时创建，参数见settings.ANALYSIS_*
+    '''
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler(
+                max_workers=settings.ANALYSIS_MAX_WORKERS,
+                max_heavy=settings.ANALYSIS_MAX_HEAVY,
+                heavy_cost=settings.ANALYSIS_HEAVY_COST,
+            )
+    return _scheduler
+
+
+async def run_analysis(
+    func: Callable[..., Any],
+    *args,
+    cost: float = 0.0,
+    **kwargs,
+) -> Any:
+    '''
+    ~在分析线程中执行同步函数并等待结果
+
+    Parameters
+    ----------
+    - func: 同步函数
+    - args, kwargs: 函数参数
+    - cost: 估算代价(风机×天)，默认为0即最高优先级
+    '''
+    future = get_scheduler().submit(partial(func, *args, **kwargs), cost=cost)
+    return await asyncio.wrap_future(future)
+
+
+def _payload(
+    func: Callable[[HttpRequest], HttpResponse],
+    request: HttpRequest,
+) -> tuple[int, bytes, dict] | HttpResponseBase:
+    '''
+    ~执行视图并取出状态码、内容和响应头，合并的请求共用该结果，各自重新生成响应对象，
+    压缩、ETag等中间件按各自请求处理，互不影响；流式响应只能迭代一次，原样返回
+    '''
+    response = func(request)
+    if response.streaming:
+        return response
+    return response.status_code, response.content, dict(response.items())
+
+
+async def run_request(
+    func: Callable[[HttpRequest], HttpResponse],
+    request: HttpRequest,
+    cost: float,
+    merge: bool = True,
+) -> HttpResponse:
+    '''
+    ~按代价调度视图计算，重任务等待超过ANALYSIS_QUEUE_WAIT秒时返回202和排队状态，
+    任务继续在后台进行，相同URL再次请求时取回结果
+
+    Parameters
+    ----------
+    - func: 同步视图函数
+    - request: 请求
+    - cost: 估算代价(风机×天)
+    - merge: 是否与相同URL的请求共用结果，返回流式响应的视图须为False
+    '''
+    scheduler = get_scheduler()
+    key = request.get_full_path()
+    if not merge:
+        key = f'{key}#{next(_unique)}'
+    future = scheduler.submit(partial(_payload, func, request), cost=cost, key=key)
+    timeout = None if cost < scheduler.heavy_cost else settings.ANALYSIS_QUEUE_WAIT
+    try:
+        # shield保证超时后任务继续进行，结果留给之后的请求
+        result = await asyncio.wait_for(
+            asyncio.shield(asyncio.wrap_future(future)), timeout
+        )
+    except asyncio.TimeoutError:
+        position = scheduler.position(key)
+        retry_after = max(math.ceil(settings.ANALYSIS_QUEUE_WAIT), 1)
+        return JsonResponse(
+            {
+                'state': 'queued' if position else 'running',
+                'position': position,
+                'cost': round(cost, 1),
+                'retry_after': retry_after,
+            },
+            status=202,
+            headers={'Retry-After': str(retry_after)},
+        )
+    except BaseException:
+        scheduler.release(key)
+        raise
+    scheduler.release(key)
+    if isinstance(result, HttpResponseBase):
+        return result
+    status, content, headers = result
+    return HttpResponse(content, status=status, headers=headers)
@@ -0,0 +1,229 @@
+# 批量故障统计报表：跨风场、多进程分片，按(风机, 日期)记录断点，中断后可继续
+from __future__ import annotations
+
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from pkgs.sources import FaultSource, fault_schema, summarize
+from pkgs.utils.tools import HiddenPrints
+from pkgs.validate import MalformedFileError, quarantine_info
+
+# 断点文件名，每完成一个单元追加一行
+CHECKPOINT = 'checkpoint.jsonl'
+# 本次任务参数，继续运行时必须一致
+RUN_INFO = 'run.json'
+
+
+def _parse_unit(source: FaultSource, path: Path) -> None:
+    '''
+    ~子进程：解析单个状态文件并写入缓存
+
+    Parameters
+    ----------
+    - source: 数据源
+    - path: 状态文件路径
+    '''
+    source.ingest(path)
+
+
+def _load_turbine(source: FaultSource, start: str, end: str, wt: str) -> pd.DataFrame:
+    '''
+    ~子进程：汇总单台风机的故障明细，状态文件已在缓存中
+
+    Parameters
+    ----------
+    - source: 数据源
+    - start: 开始日期
+    - end: 结束日期
+    - wt: 风机编号
+    '''
+    with HiddenPrints():
+        return source.load(start, end, [wt])
+
+
+class Command(BaseCommand):
+    help = '批量生成多个风场的故障明细和汇总表，多进程处理，支持中断后继续'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--farm', action='append', help='风场名称，可重复指定，默认全部风场')
+        parser.add_argument(
+            '--wt',
+            action='append',
+            default=[],
+            help='风机列表，格式为 风场=1,2,3，可重复指定，未指定的风场处理全部风机',
+        )
+        parser.add_argument('--start', required=True, help='开始日期，包含本天')
+        parser.add_argument('--end', required=True, help='结束日期，包含本天')
+        parser.add_argument('--output', required=True, help='输出文件夹，同时保存断点')
+        parser.add_argument(
+            '--format', choices=['csv', 'json', 'pickle'], default='csv', help='输出格式'
+        )
+        parser.add_argument('--encoding', default='gbk', help='csv编码')
+        parser.add_argument('--processes', type=int, default=None, help='进程数，默认为CPU核数')
+        parser.add_argument('--restart', action='store_true', help='忽略已有断点，重新开始')
+
+    def _sources(self, farms: list[str] | None) -> list[FaultSource]:
+        from website.apps.test_app1 import analysis
+
+        sources = {source.farm: source for source in analysis.FAULT_SOURCES}
+        if farms is None:
+            return list(sources.values())
+        unknown = [farm for farm in farms if farm not in sources]
+        if unknown:
+            raise CommandError(f'未知风场: {", ".join(unknown)}，可选: {", ".join(sources)}')
+        return [sources[farm] for farm in farms]
+
+    def _checkpoint(self, output: Path, run: dict, restart: bool) -> set[tuple]:
+        '''
+        ~读取断点，返回已完成的单元
+        '''
+        run_path = output / RUN_INFO
+        checkpoint_path = output / CHECKPOINT
+        if restart or not run_path.exists():
+            checkpoint_path.unlink(missing_ok=True)
+            for part in (output / 'parts').glob('*.pkl'):
+                part.unlink()
+            run_path.write_text(json.dumps(run, ensure_ascii=False), encoding='utf-8')
+            return set()
+        if json.loads(run_path.read_text(encoding='utf-8')) != run:
+            raise CommandError(f'{output}中的断点参数与本次不同，请使用--restart或更换输出文件夹')
+        return {tuple(item['unit']) for item in self._records(output)}
+
+    def _records(self, output: Path) -> list[dict]:
+        '''
+        ~读取断点文件中的全部记录
+        '''
+        checkpoint_path = output / CHECKPOINT
+        records = []
+        if checkpoint_path.exists():
+            for line in checkpoint_path.read_text(encoding='utf-8').splitlines():
+                # 中断时最后一行可能不完整
+                try:
+                    item = json.loads(line)
+                    item['unit']
+                except (ValueError, KeyError):
+                    continue
+                records.append(item)
+        return records
+
+    def handle(self, *args, **options):
+        output = Path(options['output'])
+        (output / 'parts').mkdir(parents=True, exist_ok=True)
+        start, end = options['start'], options['end']
+        sources = self._sources(options['farm'])
+        wt_lists = {}
+        for item in options['wt']:
+            farm, _, wts = item.partition('=')
+            wt_lists[farm] = [wt.strip() for wt in wts.split(',') if wt.strip()]
+        run = {
+            'farms': [source.farm for source in sources],
+            'wt': wt_lists,
+            'start': start,
+            'end': end,
+        }
+        done = self._checkpoint(output, run, options['restart'])
+        checkpoint = open(output / CHECKPOINT, 'a', encoding='utf-8')
+
+        def mark(unit: tuple, **info):
+            checkpoint.write(json.dumps({'unit': unit, **info}, ensure_ascii=False) + '\n')
+            checkpoint.flush()
+
+        # 划分单元：每个(风场, 风机, 日期)对应一个文件
+        turbines = [
+            (source, wt)
+            for source in sources
+            for wt in wt_lists.get(source.farm, source.turbines())
+        ]
+        day_units = []
+        for source, wt in turbines:
+            for day, path in source.day_files(wt, start, end).items():
+                unit = ('day', source.farm, wt, day)
+                if unit in done:
+                    continue
+                if path is None:
+                    mark(unit, status='missing')
+                    continue
+                day_units.append((unit, source, path))
+        self.stdout.write(f'待解析文件: {len(day_units)}，已完成: {len(done)}')
+
+        with ProcessPoolExecutor(max_workers=options['processes']) as pool:
+            # 第一阶段：解析文件写入缓存
+            t0 = time.perf_counter()
+            futures = {
+                pool.submit(_parse_unit, source, path): unit
+                for unit, source, path in day_units
+            }
+            for i, future in enumerate(as_completed(futures), start=1):
+                unit = futures[future]
+                error = future.exception()
+                if error is None:
+                    mark(unit, status='ok')
+                elif isinstance(error, MalformedFileError):
+                    # 格式错误的文件重试也不会成功，记为完成并写入隔离报告
+                    mark(
+                        unit,
+                        status='quarantined',
+                        reason=error.reason,
+                        detail=error.detail,
+                        path=str(error.path),
+                    )
+                else:
+                    # 失败的文件不记为完成，继续运行时会重试
+                    self.stderr.write(f'解析失败: {unit}  {error!r}')
+                if i % 100 == 0 or i == len(futures):
+                    elapsed = time.perf_counter() - t0
+                    self.stdout.write(
+                        f'解析: {i}/{len(futures)}  {i / max(elapsed, 1e-9):.1f} files/s'
+                    )
+
+            # 第二阶段：按风机汇总故障，结果分片保存
+            futures = {}
+            for source, wt in turbines:
+                unit = ('turbine', source.farm, wt)
+                if unit not in done:
+                    futures[pool.submit(_load_turbine, source, start, end, wt)] = unit
+            for future in as_completed(futures):
+                unit = futures[future]
+                try:
+                    df = future.result()
+                except Exception as exc:
+                    self.stderr.write(f'汇总失败: {unit}  {exc!r}')
+                    continue
+                df.to_pickle(output / 'parts' / f'{unit[1]}_{unit[2]}.pkl')
+                mark(unit, status='ok', rows=len(df))
+        checkpoint.close()
+
+        parts = [pd.read_pickle(part) for part in sorted((output / 'parts').glob('*.pkl'))]
+        detail_df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=fault_schema)
+        simple_df = summarize(detail_df)
+        quarantine_df = pd.DataFrame(
+            [
+                {
+                    'farm': item['unit'][1],
+                    'wt_id': item['unit'][2],
+                    'file_name': Path(item['path']).name,
+                    **item,
+                }
+                for item in self._records(output)
+                if item.get('status') == 'quarantined'
+            ],
+            columns=['farm', *quarantine_info],
+        )
+        for name, df in [
+            ('fault', detail_df),
+            ('fault_simple', simple_df),
+            ('quarantine', quarantine_df),
+        ]:
+            path = output / f'{name}_{start}_{end}.{options["format"]}'
+            if options['format'] == 'csv':
+                df.to_csv(path, index=False, encoding=options['encoding'], errors='replace')
+            elif options['format'] == 'json':
+                df.to_json(path, orient='records', force_ascii=False, date_format='iso')
+            else:
+                df.to_pickle(path)
+            self.stdout.write(f'输出: {path}  {len(df)}行')
@@ -0,0 +1,249 @@
+# 监视数据根目录，新落盘的状态文件立即解析写入缓存，交互查询时无需再解析
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from pkgs.validate import MalformedFileError
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog为可选依赖，未安装时使用轮询
+    Observer = None
+    FileSystemEventHandler = object
+
+
+class _Handler(FileSystemEventHandler):
+    '''
+    ~文件系统事件（Linux下为inotify）回调，只记录匹配数据源模式的文件
+    '''
+
+    def __init__(self, command: 'Command', source):
+        self.command = command
+        self.source = source
+
+    def on_created(self, event):
+        self.command.touch(self.source, event.src_path)
+
+    def on_modified(self, event):
+        self.command.touch(self.source, event.src_path)
+
+    def on_moved(self, event):
+        self.command.touch(self.source, event.dest_path)
+
+
+class Command(BaseCommand):
+    help = '监视各风场数据根目录，新增或修改的状态文件写完后立即解析并写入缓存'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=5, help='检查间隔秒数')
+        parser.add_argument(
+            '--settle', type=float, default=10, help='文件大小和修改时间保持不变的秒数，之后才解析'
+        )
+        parser.add_argument('--workers', type=int, default=2, help='解析线程数')
+        parser.add_argument(
+            '--queue-size', type=int, default=64, help='待解析队列长度，队列满时暂停发现新文件'
+        )
+        parser.add_argument('--poll', action='store_true', help='强制使用轮询，不使用inotify')
+        parser.add_argument('--once', action='store_true', help='只解析现有未缓存的文件，完成后退出')
+        parser.add_argument(
+            '--no-warmup', action='store_true', help='每批文件解析后不预热统计表缓存'
+        )
+
+    def touch(self, source, path: str | Path):
+        '''
+        ~记录发生变化的文件，等待其写入完成
+
+        Parameters
+        ----------
+        - source: 文件所属数据源
+        - path: 文件路径
+        '''
+        path = Path(path)
+        if not path.match(source.pattern):
+            return
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return
+        with self.lock:
+            self.pending[path] = (source, stat.st_size, stat.st_mtime_ns, time.monotonic())
+
+    def scan(self):
+        '''
+        ~扫描所有数据根目录，记录未缓存的文件
+        '''
+        for source in self.sources:
+            for path in source.files():
+                if path in self.pending or source.store.contains(path):
+                    continue
+                # 未通过校验的文件在变化之前不再重复解析
+                if path in self.rejected:
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    if self.rejected[path] == (stat.st_size, stat.st_mtime_ns):
+                        continue
+                self.touch(source, path)
+
+    def dispatch(self, settle: float):
+        '''
+        ~将写入完成的文件放入解析队列，队列满时阻塞，形成背压
+
+        Parameters
+        ----------
+        - settle: 文件保持不变的秒数
+        '''
+        now = time.monotonic()
+        with self.lock:
+            items = list(self.pending.items())
+        for path, (source, size, mtime, seen) in items:
+            if now - seen < settle:
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                with self.lock:
+                    self.pending.pop(path, None)
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime):
+                # 仍在写入，重新计时
+                self.touch(source, path)
+                continue
+            with self.lock:
+                self.pending.pop(path, None)
+            self.queue.put((source, path))
+
+    def work(self):
+        '''
+        ~解析线程
+        '''
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            source, path = item
+            t0 = time.perf_counter()
+            try:
+                source.ingest(path)
+                with self.lock:
+                    self.ingested += 1
+                self.stdout.write(f'解析: {path}  {time.perf_counter() - t0:.2f}s')
+            except MalformedFileError as exc:
+                with self.lock:
+                    self.failed += 1
+                try:
+                    stat = os.stat(path)
+                    with self.lock:
+                        self.rejected[path] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    # 文件已被移走或删除，下次出现时重新解析
+                    pass
+                self.stderr.write(f'隔离: {path}  {exc.reason} {exc.detail}')
+            except Exception as exc:
+                with self.lock:
+                    self.failed += 1
+                self.stderr.write(f'失败: {path}  {exc!r}')
+            finally:
+                self.queue.task_done()
+
+    def publish(self):
+        '''
+        ~一批文件解析完成后重新发布共享故障明细，各worker进程下次查询时切换到新版本，
+        之后预热页面默认查询范围的统计表
+        '''
+        with self.lock:
+            ingested = self.ingested
+        if ingested == self.published or self.queue.unfinished_tasks > 0:
+            return
+        t0 = time.perf_counter()
+        try:
+            version = self.analysis.publish_faults()
+        except Exception as exc:
+            self.stderr.write(f'发布失败: {exc!r}')
+            return
+        self.published = ingested
+        if version is not None:
+            self.stdout.write(f'发布共享数据集: {version}  {time.perf_counter() - t0:.2f}s')
+        if self.warmup:
+            self.warm()
+
+    def warm(self):
+        '''
+        ~预热统计表，输入文件未变化的表格跳过
+        '''
+        t0 = time.perf_counter()
+        result = self.analysis.warm_cache()
+        if result is None:
+            self.stdout.write('其他进程正在预热，跳过')
+            return
+        for view, params, status, _ in result:
+            if status.startswith('failed'):
+                self.stderr.write(f'预热失败: {view} {params}  {status}')
+        computed = sum(status == 'computed' for _, _, status, _ in result)
+        self.stdout.write(
+            f'预热: 计算{computed}个，共{len(result)}个  {time.perf_counter() - t0:.2f}s'
+        )
+
+    def handle(self, *args, **options):
+        from website.apps.test_app1 import analysis
+
+        self.analysis = analysis
+        self.warmup = not options['no_warmup']
+        self.sources = [s for s in analysis.FAULT_SOURCES if s.store is not None]
+        self.pending: dict[Path, tuple] = {}
+        self.rejected: dict[Path, tuple] = {}
+        self.lock = threading.Lock()
+        self.queue: queue.Queue = queue.Queue(maxsize=options['queue_size'])
+        self.ingested = 0
+        self.failed = 0
+        # 上次发布共享数据集时已解析的文件数，启动后至少发布一次
+        self.published = -1
+        workers = [
+            threading.Thread(target=self.work, daemon=True)
+            for _ in range(options['workers'])
+        ]
+        for worker in workers:
+            worker.start()
+
+        # 启动时先处理已存在但未缓存的文件，无需等待
+        self.scan()
+        if options['once']:
+            self.dispatch(settle=0)
+            for _ in workers:
+                self.queue.put(None)
+            self.queue.join()
+            self.publish()
+            self.stdout.write(f'完成: 解析{self.ingested}个，失败{self.failed}个')
+            return
+
+        observer = None
+        if Observer is not None and not options['poll']:
+            observer = Observer()
+            for source in self.sources:
+                observer.schedule(_Handler(self, source), str(source.src_path), recursive=True)
+            observer.start()
+            self.stdout.write('使用inotify监视')
+        else:
+            self.stdout.write('使用轮询监视')
+        try:
+            while True:
+                time.sleep(options['interval'])
+                if observer is None:
+                    self.scan()
+                self.dispatch(settle=options['settle'])
+                self.publish()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
@@ -0,0 +1,87 @@
+# 并发压测：模拟多个用户同时请求，统计各URL的响应延迟分位数
+# 用法：先以uvicorn website.why_site.asgi:application启动ASGI服务，再执行
+# python manage.py loadtest --cold 'http://127.0.0.1:8000/table/?view=test1&start=...&end=...'
+from __future__ import annotations
+
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand
+
+
+def percentile(values: list[float], q: float) -> float:
+    '''
+    ~计算分位数（最近秩法）
+
+    Parameters
+    ----------
+    - values: 数据
+    - q: 分位，0~100
+    '''
+    values = sorted(values)
+    idx = max(int(round(q / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(idx, len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = '并发请求指定URL，输出各URL的p50/p95/最大延迟'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'urls',
+            nargs='+',
+            help='请求的完整URL，可同时指定重查询和轻量页面以观察相互影响',
+        )
+        parser.add_argument('--users', type=int, default=8, help='并发用户数')
+        parser.add_argument('--requests', type=int, default=5, help='每个用户对每个URL的请求次数')
+        parser.add_argument('--timeout', type=float, default=300, help='单次请求超时秒数')
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='每次请求附加唯一参数，绕过统计表缓存，使每次请求都进入分析线程池计算',
+        )
+
+    def handle(self, *args, **options):
+        urls: list[str] = options['urls']
+        timeout: float = options['timeout']
+        latency: dict[str, list[float]] = {url: [] for url in urls}
+        errors: dict[str, int] = {url: 0 for url in urls}
+        counter = itertools.count()
+
+        def target(url: str) -> str:
+            # 统计表缓存键包含除分页参数外的全部参数，附加唯一参数即可绕过缓存
+            if not options['cold']:
+                return url
+            return f'{url}{"&" if "?" in url else "?"}_loadtest={next(counter)}'
+
+        def user(_):
+            for _ in range(options['requests']):
+                for url in urls:
+                    t0 = time.perf_counter()
+                    try:
+                        with urlopen(target(url), timeout=timeout) as response:
+                            response.read()
+                        latency[url].append(time.perf_counter() - t0)
+                    except Exception:
+                        errors[url] += 1
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['users']) as pool:
+            list(pool.map(user, range(options['users'])))
+        elapsed = time.perf_counter() - t0
+
+        self.stdout.write(f'并发用户: {options["users"]}  总耗时: {elapsed:.2f}s')
+        for url in urls:
+            values = latency[url]
+            if len(values) == 0:
+                self.stdout.write(f'{url}\n    全部失败({errors[url]})')
+                continue
+            self.stdout.write(
+                f'{url}\n'
+                f'    成功: {len(values):<5}失败: {errors[url]:<5}'
+                f'p50: {percentile(values, 50) * 1000:.0f}ms  '
+                f'p95: {percentile(values, 95) * 1000:.0f}ms  '
+                f'max: {max(values) * 1000:.0f}ms'
+            )
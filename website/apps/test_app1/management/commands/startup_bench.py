@@ -0,0 +1,81 @@
+# 启动耗时基准：用python -X importtime测量加载Django和本应用url/view的导入耗时
+from __future__ import annotations
+
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# 在子进程中执行，模拟worker冷启动时加载的模块
+STARTUP_CODE = (
+    'import django; django.setup(); '
+    'import website.why_site.urls; '
+    'import website.apps.test_app1.views'
+)
+# 冷启动时不应被导入的模块，由首次分析请求延迟加载
+LAZY_MODULES = ('pandas', 'numpy', 'pyecharts', 'pkgs.fault', 'pkgs.fault_offshore')
+
+
+def parse_importtime(stderr: str) -> tuple[dict[str, int], set[str]]:
+    '''
+    ~解析-X importtime输出，返回各顶层模块的累计导入耗时（微秒）和所有被导入的模块名
+
+    Parameters
+    ----------
+    - stderr: 子进程标准错误输出
+    '''
+    result = {}
+    names = set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit():
+            # 表头行
+            continue
+        names.add(name.strip())
+        # 模块名前只有一个空格的为顶层导入
+        if name.startswith('  '):
+            continue
+        result[name.strip()] = int(cumulative)
+    return result, names
+
+
+class Command(BaseCommand):
+    help = '测量冷启动导入耗时，超过settings.STARTUP_IMPORT_BUDGET_MS时返回错误'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='重复测量次数，取中位数')
+        parser.add_argument('--top', type=int, default=10, help='输出耗时最多的模块数')
+
+    def handle(self, *args, **options):
+        totals = []
+        modules: dict[str, int] = {}
+        names: set[str] = set()
+        for _ in range(options['repeat']):
+            proc = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+                capture_output=True,
+                text=True,
+                env=os.environ.copy(),
+                cwd=settings.BASE_DIR.parent,
+            )
+            if proc.returncode != 0:
+                raise CommandError(proc.stderr.splitlines()[-1])
+            modules, names = parse_importtime(proc.stderr)
+            totals.append(sum(modules.values()) / 1000)
+
+        total = statistics.median(totals)
+        budget = settings.STARTUP_IMPORT_BUDGET_MS
+        self.stdout.write(f'导入耗时(中位数): {total:.1f}ms  预算: {budget}ms')
+        for name, us in sorted(modules.items(), key=lambda e: -e[1])[: options['top']]:
+            self.stdout.write(f'    {us / 1000:>8.1f}ms  {name}')
+
+        eager = [name for name in LAZY_MODULES if name in names]
+        if eager:
+            raise CommandError(f'以下模块应延迟导入: {", ".join(eager)}')
+        if total > budget:
+            raise CommandError(f'导入耗时{total:.1f}ms超出预算{budget}ms')
@@ -0,0 +1,48 @@
+# 缓存预热：按页面默认查询范围预先计算各统计表，可在每晚数据落盘后由计划任务调用
+from __future__ import annotations
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = '按页面默认查询范围（61天前至昨天）预先计算统计表，输入文件未变化的表格跳过'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--view',
+            action='append',
+            help='表格类型，可重复指定，默认为settings.CACHE_WARMUP_VIEWS',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.CACHE_WARMUP_WORKERS,
+            help='同时计算的表格数',
+        )
+        parser.add_argument('--force', action='store_true', help='忽略已有缓存，全部重新计算')
+
+    def handle(self, *args, **options):
+        from website.apps.test_app1 import analysis
+
+        t0 = time.perf_counter()
+        result = analysis.warm_cache(
+            views=options['view'], workers=options['workers'], force=options['force']
+        )
+        if result is None:
+            self.stderr.write(f'其他进程正在预热: {settings.CACHE_WARMUP_LOCK}')
+            return
+        for view, params, status, seconds in result:
+            line = f'{view:<14}{params.get("id", ""):<6}{status}  {seconds:.2f}s'
+            if status.startswith('failed'):
+                self.stderr.write(line)
+            else:
+                self.stdout.write(line)
+        computed = sum(status == 'computed' for _, _, status, _ in result)
+        fresh = sum(status == 'fresh' for _, _, status, _ in result)
+        self.stdout.write(
+            f'完成: 计算{computed}个，跳过{fresh}个，失败{len(result) - computed - fresh}个  '
+            f'{time.perf_counter() - t0:.2f}s'
+        )
@@ -1,3 +1,1070 @@
-from django.test import TestCase
+import contextlib
+import gzip
+import io
+import json
+import os
+import pickle
+import queue
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.http import HttpResponse, JsonResponse
+from django.middleware.gzip import GZipMiddleware
+from django.middleware.http import ConditionalGetMiddleware
+from django.test import RequestFactory, SimpleTestCase
+
+from pkgs import (
+    anomaly,
+    availability,
+    bucket,
+    charts,
+    condition,
+    power_curve,
+    profiling,
+    sequence,
+    sources,
+    validate,
+)
+from pkgs.coverage import Coverage
+from pkgs.fault import FaultStatistics
+from pkgs.fault_offshore import FaultStatisticsOffshore
+from pkgs.mirror import Mirror
+from pkgs.shared import SharedDataset
+from pkgs.store import ParseStore
+from pkgs.utils.table import MAX_PAGE_SIZE, table_page
+from pkgs.utils.tools import json_dumps
+from website.why_site.middleware import BrotliMiddleware, brotli
+
+from . import analysis, executor
+from .management.commands import fault_report, ingest_watch
+
+# 项目根目录，测试使用其中的故障代码映射表
+ROOT = Path(__file__).resolve().parents[3]
+
+T = pd.Timestamp
+HOUR = 3600 * 10**9
+
+
+def _status_rows(rows: list[tuple[str, str]]) -> str:
+    '''
+    ~生成陆上BufferStatuscodes文件内容，rows为(时刻, TrigKey)
+    '''
+    lines = [f'preamble {i}' for i in range(11)]
+    lines.append('TimeStampUTC\tTrigKey\tOther')
+    for time, key in rows:
+        lines.append(f'{T(time).strftime("%d.%m.%Y %H:%M:%S")},000\t{key}\tx\t')
+    return '\n'.join(lines) + '\n'
+
+
+def _error_rows(rows: list[tuple[int, str, str, str]]) -> str:
+    '''
+    ~生成海上ErrorList文件内容，rows为(序号, 触发时刻, 描述, 持续时间)
+    '''
+    lines = [f'h{i}' for i in range(8)]
+    for seq, time, desc, duration in rows:
+        values = '1,10.0,12.0,1100.0,4000.0,30.0,1200.0'
+        lines.append(f'{seq}, {time}, {desc}, {values}, {time}, -{duration}')
+    lines.append('footer')
+    return '\n'.join(lines) + '\n'
+
+
+class AnomalyTests(SimpleTestCase):
+    def _fault_df(self) -> pd.DataFrame:
+        '''
+        ~风机1代码X前14天每天1次，第15天10次
+        '''
+        days = pd.date_range('2024-06-01', periods=15)
+        stop_time = [day + pd.Timedelta(hours=1) for day in days[:-1]]
+        stop_time += [days[-1] + pd.Timedelta(minutes=m) for m in range(10)]
+        return pd.DataFrame(
+            {
+                'wt_id': '1',
+                'code': 'X',
+                'fault_en': 'SC_X',
+                'fault_cn': '测试',
+                'stop_time': stop_time,
+                'timedelta': pd.Timedelta(minutes=30),
+            }
+        )
+
+    def test_daily_rollup(self):
+        wide = anomaly.daily_rollup(self._fault_df(), value='count')
+        self.assertEqual(wide.shape, (15, 1))
+        self.assertEqual(wide.iloc[:, 0].tolist(), [1.0] * 14 + [10.0])
+        wide = anomaly.daily_rollup(self._fault_df(), value='hours')
+        self.assertEqual(wide.iloc[:, 0].tolist(), [0.5] * 14 + [5.0])
+
+    def test_score(self):
+        wide = anomaly.daily_rollup(self._fault_df())
+        for method in ('robust', 'ewma'):
+            z, baseline = anomaly.score(wide, method=method, window=14)
+            # 前window天没有基线，第15天基线为1，离散度取下限1
+            self.assertTrue(np.isnan(z.iloc[:14, 0]).all())
+            self.assertAlmostEqual(baseline.iloc[14, 0], 1.0)
+            self.assertAlmostEqual(z.iloc[14, 0], 9.0)
+
+    def test_detect(self):
+        df = anomaly.detect(self._fault_df(), window=14, threshold=3.0)
+        self.assertEqual(list(df.columns), anomaly.anomaly_info)
+        self.assertEqual(len(df), 1)
+        self.assertEqual(df.loc[0, 'day'], T('2024-06-15'))
+        self.assertEqual(df.loc[0, 'value'], 10.0)
+        self.assertEqual(df.loc[0, 'fault_cn'], '测试')
+        self.assertEqual(len(anomaly.detect(self._fault_df(), threshold=10.0)), 0)
+        # 无故障时返回的空表day列仍为时间类型
+        df = anomaly.detect(self._fault_df().iloc[:0])
+        self.assertEqual(len(df), 0)
+        self.assertEqual(df['day'].dtype.kind, 'M')
+
+
+class AvailabilityTests(SimpleTestCase):
+    @staticmethod
+    def _intervals(rows: list[tuple[str, int, int]]) -> pd.DataFrame:
+        '''
+        ~由(风机, 开始小时, 结束小时)生成区间表，小时从2024-06-01起算
+        '''
+        base = T('2024-06-01')
+        return pd.DataFrame(
+            {
+                'wt_id': [wt for wt, _, _ in rows],
+                'start': [base + pd.Timedelta(hours=s) for _, s, _ in rows],
+                'end': [base + pd.Timedelta(hours=e) for _, _, e in rows],
+            }
+        )
+
+    def test_merge(self):
+        df = availability.merge_intervals(
+            self._intervals([('1', 1, 3), ('1', 0, 2), ('1', 3, 4), ('2', 5, 6)])
+        )
+        # 重叠和首尾相接的区间均被合并
+        self.assertEqual(df['wt_id'].tolist(), ['1', '2'])
+        self.assertEqual(
+            df['start'].tolist(), [T('2024-06-01 00:00'), T('2024-06-01 05:00')]
+        )
+        self.assertEqual(
+            df['end'].tolist(), [T('2024-06-01 04:00'), T('2024-06-01 06:00')]
+        )
+
+    def test_intersect(self):
+        df = availability.intersect_intervals(
+            self._intervals([('1', 0, 4), ('1', 1, 2), ('2', 0, 1)]),
+            self._intervals([('1', 2, 6), ('2', 1, 2)]),
+        )
+        # 风机2的两段首尾相接，没有公共时段
+        self.assertEqual(df['wt_id'].tolist(), ['1'])
+        self.assertEqual(df['start'].tolist(), [T('2024-06-01 02:00')])
+        self.assertEqual(df['end'].tolist(), [T('2024-06-01 04:00')])
+
+    def test_downtime(self):
+        # 跨越零点的停机按各天时长分摊，wt_list中没有停机的风机为0
+        matrix, period_hours = availability.downtime(
+            self._intervals([('1', 22, 26), ('1', 23, 24)]),
+            '2024-06-01',
+            '2024-06-03',
+            freq='D',
+            wt_list=['1', '2'],
+        )
+        self.assertEqual(matrix.to_numpy().tolist(), [[2.0, 0.0], [2.0, 0.0]])
+        self.assertEqual(period_hours.tolist(), [24.0, 24.0])
+
+
+class SequenceTests(SimpleTestCase):
+    stop = FaultStatistics.turbine_stop
+    start = FaultStatistics.turbine_start
+
+    def _rows(self, day: str) -> list[tuple[str, str]]:
+        '''
+        ~一天的状态代码：A、B、B后停机，启机后C、D后再次停机
+        '''
+        return [
+            (f'{day} 00:00', '01_01_001 SC_A'),
+            (f'{day} 00:05', '01_01_002 SC_B'),
+            (f'{day} 00:06', '01_01_002 SC_B'),
+            (f'{day} 00:08', f'0 {self.stop}'),
+            (f'{day} 00:09', f'0 {self.stop}'),
+            (f'{day} 00:20', f'0 {self.start}'),
+            (f'{day} 00:25', '01_01_003 SC_C'),
+            (f'{day} 00:28', '01_01_004 SC_D'),
+            (f'{day} 00:30', f'0 {self.stop}'),
+        ]
+
+    def _frame(self) -> pd.DataFrame:
+        rows = self._rows('2024-06-01')
+        return pd.DataFrame(
+            {
+                'time': [T(time) for time, _ in rows],
+                'code': [key.split()[0] for _, key in rows],
+                'fault_en': [key.split()[1] for _, key in rows],
+            }
+        )
+
+    def test_window_codes(self):
+        stop_id, codes, n_stops = sequence.window_codes(self._frame(), window='10min')
+        # 连续的停机代码只算一次停机，启机代码不计入窗口
+        self.assertEqual(n_stops, 2)
+        self.assertEqual(stop_id.tolist(), [0, 0, 1, 1])
+        self.assertEqual(
+            codes.tolist(), ['01_01_001', '01_01_002', '01_01_003', '01_01_004']
+        )
+        stop_id, codes, _ = sequence.window_codes(self._frame(), dedup=False)
+        self.assertEqual(stop_id.tolist(), [0, 0, 0, 1, 1])
+        self.assertEqual(codes.tolist()[:3], ['01_01_001', '01_01_002', '01_01_002'])
+
+    def test_hash_ngrams(self):
+        ids = np.array([0, 1, 2, 0, 1, 1, 0])
+        stop_id = np.array([0, 0, 0, 1, 1, 1, 2])
+        key, start = sequence._hash_ngrams(ids, stop_id, 2, 3)
+        # 不跨越停机的二元组起点，键为按代码种类数进位的精确编码
+        self.assertEqual(start.tolist(), [0, 1, 3, 4])
+        self.assertEqual(key.tolist(), [1, 5, 1, 4])
+        # 代码种类数的n次方超出int64时退回哈希，分组结果应与精确编码一致
+        hashed, _ = sequence._hash_ngrams(ids, stop_id, 2, 2**40)
+        self.assertEqual(
+            pd.factorize(hashed)[0].tolist(), pd.factorize(key)[0].tolist()
+        )
+
+    def test_mine(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for wt in ('1', '2'):
+                folder = Path(tmp) / wt
+                folder.mkdir()
+                (folder / 'BufferStatuscodes20240601.txt').write_text(
+                    _status_rows(self._rows('2024-06-01')), encoding='utf-8'
+                )
+            fs = FaultStatistics(
+                src_path=tmp,
+                fault_map_path=ROOT / 'config' / 'fault_map.csv',
+                wt_list=['1', '2'],
+                start='2024-06-01',
+                end='2024-06-01',
+            )
+            with contextlib.redirect_stdout(io.StringIO()):
+                df = sequence.mine(fs, window='10min', max_length=2, min_support=2)
+        self.assertEqual(list(df.columns), sequence.cascade_info)
+        cascade = df[df['kind'] == 'cascade'].set_index('codes')
+        # 每台风机A→B、C→D各一次，B→C跨越两次停机不计
+        self.assertEqual(
+            sorted(cascade.index), ['01_01_001 → 01_01_002', '01_01_003 → 01_01_004']
+        )
+        self.assertEqual(cascade['support'].tolist(), [2, 2])
+        self.assertEqual(cascade['turbines'].tolist(), [2, 2])
+        self.assertEqual(cascade['support_pct'].tolist(), [50.0, 50.0])
+        self.assertEqual(df['support'].min(), 2)
+
+
+class BucketTests(SimpleTestCase):
+    def test_floor(self):
+        t = ['2024-06-05 13:27:00', None]
+        self.assertEqual(bucket.floor(t, '10min')[0], np.datetime64('2024-06-05T13:20'))
+        self.assertTrue(np.isnat(bucket.floor(t, '10min')[1]))
+        # 2024-06-05为星期三
+        self.assertEqual(bucket.floor(t, 'W')[0], np.datetime64('2024-06-03'))
+        self.assertEqual(
+            bucket.floor(t, 'W', week_start=6)[0], np.datetime64('2024-06-02')
+        )
+        self.assertEqual(bucket.floor(t, 'M')[0], np.datetime64('2024-06-01'))
+
+    def test_edges(self):
+        edges = bucket.edges('2024-06-01 12:00', '2024-06-03', '1D')
+        self.assertEqual(
+            list(edges), [T('2024-06-01 12:00'), T('2024-06-02'), T('2024-06-03')]
+        )
+        edges = bucket.edges('2024-05-20', '2024-07-10', 'M')
+        self.assertEqual(
+            list(edges),
+            [T('2024-05-20'), T('2024-06-01'), T('2024-07-01'), T('2024-07-10')],
+        )
+
+    def test_split(self):
+        edges = bucket.edges('2024-06-01', '2024-06-03', '1D')
+        rep, period, duration = bucket.split(
+            ['2024-06-01 18:00', '2024-06-05 00:00', '2024-05-31 23:00'],
+            ['2024-06-02 06:00', '2024-06-06 00:00', '2024-06-01 01:00'],
+            edges,
+        )
+        # 第二个区间在范围外，第三个区间截去范围前的部分
+        self.assertEqual(rep.tolist(), [0, 0, 2])
+        self.assertEqual(period.tolist(), [0, 1, 0])
+        self.assertEqual((duration / HOUR).tolist(), [6.0, 6.0, 1.0])
+
+
+class OffshoreTests(SimpleTestCase):
+    def test_dedup(self):
+        desc = '01002_SC_SafetyEmergencyStopNacelle'
+        with tempfile.TemporaryDirectory() as tmp:
+            folder = Path(tmp) / 'Statuscode' / '001#'
+            folder.mkdir(parents=True)
+            # 两个导出文件的时间窗口重叠，序号2的记录出现两次
+            (folder / 'ErrorList20240601.csv').write_text(
+                _error_rows(
+                    [
+                        (1, '2024-06-01 00:45:00', desc, '00:18:00'),
+                        (2, '2024-06-01 01:08:00', desc, '00:09:00'),
+                    ]
+                ),
+                encoding='utf-8',
+            )
+            (folder / 'ErrorList20240602.csv').write_text(
+                _error_rows(
+                    [
+                        (2, '2024-06-01 01:08:00', desc, '00:09:00'),
+                        (3, '2024-06-02 01:35:00', desc, '00:27:00'),
+                    ]
+                ),
+                encoding='utf-8',
+            )
+            fs = FaultStatisticsOffshore(ROOT / 'config' / '风机故障代码表.csv')
+            with contextlib.redirect_stdout(io.StringIO()):
+                df = fs.get_detail('001#', tmp, '2024-06-01', '2024-06-02')
+                single = fs.get_single('001#', tmp, '2024-06-01', '2024-06-02')
+        self.assertEqual(df.attrs['duplicates'], 1)
+        self.assertEqual(df['序号'].astype(int).tolist(), [1, 2, 3])
+        self.assertEqual(single.attrs['duplicates'], 1)
+        self.assertEqual(single.loc['01002', '故障次数'], 3)
+        self.assertAlmostEqual(single.loc['01002', '持续时间'], 0.9)
+        self.assertEqual(fs.quarantine, [])
+
+
+class SharedDatasetTests(SimpleTestCase):
+    def test_publish_load(self):
+        df = pd.DataFrame(
+            {
+                'farm': ['陆上', '陆上', '海上'],
+                'wt_id': ['1', '2', '001#'],
+                'start_time': pd.to_datetime(['2024-06-01', '2024-06-02', None]),
+                'duration': [0.5, 1.25, 2.0],
+                'count': np.array([1, 2, 3], dtype=np.int64),
+            }
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            shared = SharedDataset(tmp, 'faults', keep=1)
+            self.assertIsNone(shared.version())
+            self.assertIsNone(shared.load())
+            version = shared.publish(df, meta={'start': '2024-06-01'})
+            self.assertEqual(shared.version(), version)
+            # 其他进程通过新实例加载
+            loaded, meta = SharedDataset(tmp, 'faults').load()
+            self.assertEqual(meta, {'start': '2024-06-01'})
+            self.assertEqual(list(loaded.columns), list(df.columns))
+            # 字符串列按类别保存，其余列类型不变
+            self.assertIsInstance(loaded['farm'].dtype, pd.CategoricalDtype)
+            pd.testing.assert_frame_equal(
+                loaded.astype({'farm': object, 'wt_id': object}), df
+            )
+            # 新版本发布后旧版本按keep清理
+            for _ in range(3):
+                version = shared.publish(df.head(1))
+            loaded, _ = shared.load()
+            self.assertEqual(len(loaded), 1)
+            folders = [p for p in (Path(tmp) / 'faults').iterdir() if p.is_dir()]
+            self.assertEqual(len(folders), 2)
+
+
+class TableTests(SimpleTestCase):
+    def _frame(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                '风机编号': [str(i) for i in range(1, 8)],
+                '故障次数': [5, 3, 7, 1, 6, 2, 4],
+            }
+        )
+
+    def test_page(self):
+        table = table_page(self._frame(), page=2, size=3)
+        self.assertEqual(table['columns'], ['风机编号', '故障次数'])
+        self.assertEqual((table['total'], table['page'], table['size']), (7, 2, 3))
+        self.assertEqual(list(table['values'][0]), ['4', '5', '6'])
+        # 页码超出范围时取最后一页，size不超过MAX_PAGE_SIZE
+        table = table_page(self._frame(), page=9, size=3)
+        self.assertEqual((table['page'], list(table['values'][0])), (3, ['7']))
+        table = table_page(self._frame(), size=10**6)
+        self.assertEqual(table['size'], MAX_PAGE_SIZE)
+
+    def test_sort_search(self):
+        table = table_page(self._frame(), sort=1, ascending=False, size=3)
+        self.assertEqual(list(table['values'][1]), [7, 6, 5])
+        # 任意一列包含筛选文本即保留
+        table = table_page(self._frame(), search='6')
+        self.assertEqual(table['total'], 2)
+        self.assertEqual(list(table['values'][0]), ['5', '6'])
+
+    def test_response_params(self):
+        factory = RequestFactory()
+        for params in ({'view': 'test1', 'page': 'x'}, {'view': 'test1', 'sort': '.5'}):
+            response = analysis.table_response(factory.get('/table/', params))
+            self.assertEqual(response.status_code, 400)
+        response = analysis.table_response(factory.get('/table/', {'page': '1'}))
+        self.assertEqual(response.status_code, 400)
+
+    def test_missing_values(self):
+        df = pd.DataFrame(
+            {
+                'value': [1.5, np.nan],
+                'time': [T('2024-06-01 01:02:03'), pd.NaT],
+                'name': ['A', None],
+            }
+        )
+        table = json.loads(json_dumps(table_page(df)))
+        # 缺失值统一为null，时间为iso格式
+        self.assertEqual(
+            table['values'],
+            [[1.5, None], ['2024-06-01T01:02:03.000', None], ['A', None]],
+        )
+
+
+class CompressionTests(SimpleTestCase):
+    def _handler(self):
+        content = json_dumps({'values': list(range(500))})
+
+        def view(request):
+            return HttpResponse(content, content_type='application/json')
+
+        # 与settings.MIDDLEWARE中的顺序一致
+        return GZipMiddleware(BrotliMiddleware(ConditionalGetMiddleware(view))), content
+
+    def test_gzip_etag(self):
+        handler, content = self._handler()
+        factory = RequestFactory()
+        response = handler(factory.get('/', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), content)
+        # 压缩后ETag为弱校验，客户端带回后结果未变化时返回304
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        response = handler(
+            factory.get('/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    @unittest.skipIf(brotli is None, 'brotli未安装')
+    def test_brotli(self):
+        handler, content = self._handler()
+        response = handler(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, br'))
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), content)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+
+class SourceTests(SimpleTestCase):
+    desc = '01002_SC_SafetyEmergencyStopNacelle'
+
+    def _sources(self, tmp: str) -> list[sources.FaultSource]:
+        '''
+        ~陆上风机1在6月1日停机一次，海上风机001#在6月1日故障一次
+        '''
+        stop, start = FaultStatistics.turbine_stop, FaultStatistics.turbine_start
+        fault = '01_01_001 SC_SafetyChainEmergencySTOP_Hub'
+        folder = Path(tmp) / 'on' / '1'
+        folder.mkdir(parents=True)
+        (folder / 'BufferStatuscodes20240601.txt').write_text(
+            _status_rows(
+                [
+                    ('2024-06-01 00:07:30', fault),
+                    ('2024-06-01 00:08', f'0 {stop}'),
+                    ('2024-06-01 00:20', f'0 {start}'),
+                ]
+            ),
+            encoding='utf-8',
+        )
+        folder = Path(tmp) / 'off' / 'Statuscode' / '001#'
+        folder.mkdir(parents=True)
+        (folder / 'ErrorList20240601.csv').write_text(
+            _error_rows([(1, '2024-06-01 00:45:00', self.desc, '00:18:00')]),
+            encoding='utf-8',
+        )
+        return [
+            sources.from_config(
+                {
+                    'farm': '陆上',
+                    'kind': 'onshore',
+                    'path': Path(tmp) / 'on',
+                    'fault_map': ROOT / 'config' / 'fault_map.csv',
+                }
+            ),
+            sources.from_config(
+                {
+                    'farm': '海上',
+                    'kind': 'offshore',
+                    'path': Path(tmp) / 'off',
+                    'fault_map': ROOT / 'config' / '风机故障代码表.csv',
+                }
+            ),
+        ]
+
+    def test_load_sources(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            onshore, offshore = self._sources(tmp)
+            self.assertEqual(
+                onshore.day_files('1', '2024-06-01', '2024-06-02')['20240602'], None
+            )
+            self.assertEqual(offshore.turbines(), ['001#'])
+            with contextlib.redirect_stdout(io.StringIO()):
+                df = sources.load_sources(
+                    [onshore, offshore], '2024-06-01', '2024-06-01'
+                )
+        # 两种格式统一为同一列式结构，持续时间为小时
+        self.assertEqual(list(df.columns), sources.fault_schema)
+        self.assertEqual(df['farm'].tolist(), ['陆上', '海上'])
+        self.assertEqual(df['wt_id'].tolist(), ['1', '001#'])
+        self.assertEqual(df['code'].tolist(), ['01_01_001', '01002'])
+        self.assertEqual(df['fault_cn'].iloc[0], '变桨急停引起机组安全链断开')
+        self.assertEqual(
+            df['start_time'].tolist(), [T('2024-06-01 00:08'), T('2024-06-01 00:45')]
+        )
+        self.assertEqual(
+            df['end_time'].tolist(), [T('2024-06-01 00:20'), T('2024-06-01 01:03')]
+        )
+        self.assertEqual(df['duration'].round(2).tolist(), [0.2, 0.3])
+        summary = sources.summarize(df)
+        self.assertEqual(summary['count'].tolist(), [1, 1])
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            sources.from_config(
+                {'farm': '陆上', 'kind': 'csv', 'path': '.', 'fault_map': ''}
+            )
+
+
+class ParseStoreTests(SimpleTestCase):
+    def test_get(self):
+        calls = []
+
+        def parser(path: Path) -> pd.DataFrame:
+            calls.append(path)
+            return pd.DataFrame({'text': [path.read_text()]})
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'BufferStatuscodes20240601.txt'
+            path.write_text('a')
+            store = ParseStore(Path(tmp) / 'store')
+            self.assertFalse(store.contains(path))
+            self.assertEqual(store.get(path, parser)['text'].tolist(), ['a'])
+            # 同一版本只解析一次
+            self.assertTrue(store.contains(path))
+            self.assertEqual(store.get(path, parser)['text'].tolist(), ['a'])
+            self.assertEqual(len(calls), 1)
+            # 源文件变化后重新解析，旧版本被删除
+            path.write_text('bb')
+            self.assertFalse(store.contains(path))
+            self.assertEqual(store.get(path, parser)['text'].tolist(), ['bb'])
+            self.assertEqual(len(calls), 2)
+            self.assertEqual(len(list(store._folder(path).glob('*.pkl'))), 1)
+            self.assertFalse(store.contains(Path(tmp) / 'missing.txt'))
+
+
+class IngestWatchTests(SimpleTestCase):
+    def _command(self) -> ingest_watch.Command:
+        command = ingest_watch.Command()
+        command.pending = {}
+        command.lock = threading.Lock()
+        command.queue = queue.Queue()
+        return command
+
+    def test_dispatch(self):
+        source = sources.OnshoreSource('陆上', '.', '')
+        with tempfile.TemporaryDirectory() as tmp:
+            folder = Path(tmp) / '1'
+            folder.mkdir()
+            path = folder / 'BufferStatuscodes20240601.txt'
+            path.write_text('a')
+            command = self._command()
+            # 不匹配数据源模式的文件不记录
+            command.touch(source, folder / 'other.txt')
+            command.touch(source, path)
+            self.assertEqual(list(command.pending), [path])
+            # 未保持不变足够长时间的文件继续等待
+            command.dispatch(settle=60)
+            self.assertTrue(command.queue.empty())
+            # 记录后文件又有变化，重新计时
+            path.write_text('abc')
+            command.dispatch(settle=0)
+            self.assertTrue(command.queue.empty())
+            self.assertIn(path, command.pending)
+            command.dispatch(settle=0)
+            self.assertEqual(command.queue.get_nowait(), (source, path))
+            self.assertEqual(command.pending, {})
+
+
+class FaultReportTests(SimpleTestCase):
+    desc = '01002_SC_SafetyEmergencyStopNacelle'
+
+    def _run(self, source: sources.FaultSource, output: Path, **options) -> str:
+        stdout = io.StringIO()
+        with mock.patch.object(fault_report.Command, '_sources', return_value=[source]):
+            call_command(
+                'fault_report',
+                start='2024-06-01',
+                end='2024-06-02',
+                output=str(output),
+                format='pickle',
+                processes=1,
+                stdout=stdout,
+                **options,
+            )
+        return stdout.getvalue()
+
+    def test_resume(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            folder = Path(tmp) / 'off' / 'Statuscode' / '001#'
+            folder.mkdir(parents=True)
+            (folder / 'ErrorList20240601.csv').write_text(
+                _error_rows([(1, '2024-06-01 00:45:00', self.desc, '00:18:00')]),
+                encoding='utf-8',
+            )
+            source = sources.OffshoreSource(
+                '海上',
+                Path(tmp) / 'off',
+                ROOT / 'config' / '风机故障代码表.csv',
+                store=ParseStore(Path(tmp) / 'store'),
+            )
+            output = Path(tmp) / 'report'
+            self.assertIn('待解析文件: 1，已完成: 0', self._run(source, output))
+            checkpoint = output / fault_report.CHECKPOINT
+            lines = checkpoint.read_text(encoding='utf-8').splitlines()
+            status = [json.loads(line)['status'] for line in lines]
+            # 缺少文件的日期、解析的文件、汇总的风机各一条
+            self.assertEqual(sorted(status), ['missing', 'ok', 'ok'])
+            # 中断时写了一半的记录被忽略，已完成的单元不再处理
+            with checkpoint.open('a', encoding='utf-8') as f:
+                f.write('{"unit": ["day", "海上"')
+            self.assertIn('待解析文件: 0，已完成: 3', self._run(source, output))
+            df = pd.read_pickle(output / 'fault_2024-06-01_2024-06-02.pickle')
+            self.assertEqual(df['code'].tolist(), ['01002'])
+            # 参数不同的任务不能继续
+            with self.assertRaises(CommandError):
+                self._run(source, output, wt=['海上=002#'])
+            self.assertIn('已完成: 0', self._run(source, output, restart=True))
+
+
+class MirrorTests(SimpleTestCase):
+    def test_lru(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            remote = {}
+            for name in 'abc':
+                remote[name] = Path(tmp) / f'{name}.txt'
+                remote[name].write_text(name * 100)
+            mirror = Mirror(Path(tmp) / 'mirror', capacity=250)
+            a = mirror.local(remote['a'])
+            b = mirror.local(remote['b'])
+            self.assertEqual(a.read_text(), 'a' * 100)
+            # 修改时间即最近访问时间，b最久未访问
+            os.utime(b, ns=(10**9, 10**9))
+            self.assertEqual(mirror.local(remote['a']), a)
+            c = mirror.local(remote['c'])
+            self.assertEqual(sorted(mirror._entries()), sorted([a, c]))
+            # 远程文件变化后重新复制，旧版本被删除
+            remote['a'].write_text('A' * 50)
+            new = mirror.local(remote['a'])
+            self.assertNotEqual(new, a)
+            self.assertEqual(new.read_text(), 'A' * 50)
+            self.assertFalse(a.exists())
+            self.assertLessEqual(sum(p.stat().st_size for p in mirror._entries()), 250)
+            with self.assertRaises(FileNotFoundError):
+                mirror.local(Path(tmp) / 'missing.txt')
+
+
+class ValidateTests(SimpleTestCase):
+    def test_check(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'BufferStatuscodes20240601.txt'
+            good = _status_rows([('2024-06-01 00:08', '0 SC_A')])
+            cases = [
+                (b'', 'empty'),
+                ('说明'.encode('gbk') * 10, 'encoding'),
+                ('\n'.join(good.splitlines()[:5]).encode('utf-8'), 'truncated'),
+                (good.replace('TrigKey', 'Key').encode('utf-8'), 'header'),
+            ]
+            for content, reason in cases:
+                path.write_bytes(content)
+                problem = validate.check(path, **validate.onshore_signature)
+                self.assertEqual(problem[0], reason)
+            path.write_text(good, encoding='utf-8')
+            self.assertIsNone(validate.check(path, **validate.onshore_signature))
+            # 海上文件按列数校验，只有说明行时视为空文件
+            path.write_text(_error_rows([]), encoding='utf-8')
+            problem = validate.check(path, **validate.offshore_signature)
+            self.assertEqual(problem[0], 'empty')
+            path.write_text(_error_rows([]).replace('footer', 'a,b,c\nfooter'))
+            problem = validate.check(path, **validate.offshore_signature)
+            self.assertEqual(problem[0], 'header')
+
+    def test_quarantine(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            folder = Path(tmp) / 'on' / '1'
+            folder.mkdir(parents=True)
+            (folder / 'BufferStatuscodes20240601.txt').write_text('x\n' * 3)
+            (folder / 'BufferStatuscodes20240602.txt').write_text('')
+            source = sources.OnshoreSource(
+                '陆上',
+                Path(tmp) / 'on',
+                ROOT / 'config' / 'fault_map.csv',
+                store=ParseStore(Path(tmp) / 'store'),
+            )
+            # 陆上空文件表示当天没有记录，不隔离
+            df = source.quarantine('2024-06-01', '2024-06-02')
+            self.assertEqual(list(df.columns), ['farm', *validate.quarantine_info])
+            self.assertEqual(df['wt_id'].tolist(), ['1'])
+            self.assertEqual(df['reason'].tolist(), ['truncated'])
+            with self.assertRaises(validate.MalformedFileError) as ctx:
+                source.ingest(folder / 'BufferStatuscodes20240601.txt')
+            # 多进程之间传递后原因不变
+            error = pickle.loads(pickle.dumps(ctx.exception))
+            self.assertEqual(error.reason, 'truncated')
+            self.assertEqual(error.path.name, 'BufferStatuscodes20240601.txt')
+
+
+class CoverageTests(SimpleTestCase):
+    def test_bitmap(self):
+        # 10天跨越两个字节
+        dt_list = pd.date_range('2024-06-01', periods=10)
+        coverage = Coverage([1, 2], dt_list)
+        self.assertEqual(coverage.bits.shape, (2, 2))
+        present = np.ones(10, dtype=bool)
+        present[[2, 9]] = False
+        coverage.set(1, present)
+        self.assertEqual(coverage.missing('1'), ['20240603', '20240610'])
+        # 未设置的风机全部缺失，不在wt_list中的风机追加在最后
+        self.assertEqual(len(coverage.missing(2)), 10)
+        coverage.set('3', np.ones(10, dtype=bool))
+        self.assertEqual(coverage.wt_list, ['1', '2', '3'])
+        self.assertEqual(coverage.ratio().tolist(), [80.0, 0.0, 100.0])
+        df = coverage.to_frame()
+        self.assertEqual(df.shape, (3, 10))
+        self.assertEqual(df.loc['1'].tolist(), present.tolist())
+        self.assertEqual(Coverage(['1'], dt_list[:0]).ratio().tolist(), [100.0])
+
+
+class ChartTests(SimpleTestCase):
+    def test_bounds(self):
+        # 上下限对齐到跨度数量级的1/10，上下限相同时仍留出一格
+        self.assertEqual(charts._bounds(np.array([3.2, 97.5])), (3.0, 98.0))
+        self.assertEqual(charts._bounds(np.array([5.0])), (5.0, 5.1))
+        self.assertEqual(charts._bounds(np.array([])), (0.0, 1.0))
+
+    def test_heatmap(self):
+        data = pd.DataFrame(
+            [[0, 1.5], [np.nan, 3]], index=['1', '2'], columns=['a', 'b']
+        )
+        options = json.loads(charts.heatmap_json(data))
+        # 数据为[x序号, y序号, 数值]，nan不绘制
+        self.assertEqual(
+            options['series'][0]['data'], [[0, 0, 0.0], [1, 0, 1.5], [1, 1, 3.0]]
+        )
+        visual_map = options['visualMap']
+        self.assertEqual((visual_map['min'], visual_map['max']), (0.0, 3.0))
+        options = json.loads(charts.heatmap_json(data, skip_zero=True))
+        self.assertEqual(len(options['series'][0]['data']), 2)
+        visual_map = json.loads(charts.heatmap_json(data.iloc[:0]))['visualMap']
+        self.assertEqual((visual_map['min'], visual_map['max']), (0, 1))
+
+    def test_scatter(self):
+        rng = np.random.default_rng(1)
+        data = pd.DataFrame(
+            {'x': rng.normal(10, 2, 20000), 'y': rng.normal(1000, 300, 20000)}
+        )
+        data.iloc[0] = np.nan
+        options = json.loads(charts.scatter_json(data.head(1000)))
+        # 点数不超过max_points时逐点绘制，含nan的行忽略
+        self.assertEqual(len(options['series']), 1)
+        self.assertEqual(len(options['series'][0]['data']), 999)
+        options = json.loads(
+            charts.scatter_json(data, bins=50, min_count=3, outliers=100)
+        )
+        cells, points = options['series'][0]['data'], options['series'][1]['data']
+        # 超过max_points时为密度格子加抽样离群点，数量与原始点数无关
+        self.assertLessEqual(len(cells), 50 * 50)
+        self.assertEqual(len(points), 100)
+        self.assertTrue(all(count >= 3 for _, _, count in cells))
+        self.assertLessEqual(sum(count for _, _, count in cells), 19999)
+        x_axis, y_axis = options['xAxis'][0], options['yAxis'][0]
+        for x, y, *_ in cells + points:
+            self.assertTrue(x_axis['min'] <= x <= x_axis['max'])
+            self.assertTrue(y_axis['min'] <= y <= y_axis['max'])
+
+
+class ConditionTests(SimpleTestCase):
+    def _bins(self) -> pd.DataFrame:
+        df = pd.DataFrame(
+            {
+                'code': ['A', 'A', 'B', 'A', None],
+                '风速': [3.2, 3.9, 7.5, 7.1, 5.0],
+                '发电机功率': [100.0, 400.0, 1600.0, 1200.0, 10.0],
+                'duration': [0.5, 1.0, 2.0, 0.25, 9.0],
+            }
+        )
+        return condition.bins(df, wind_step=1.0, power_step=500.0)
+
+    def test_bins(self):
+        df = self._bins()
+        # 没有代码的记录忽略，只输出非空分箱，分箱值为箱下限
+        self.assertEqual(list(df.columns), condition.bin_info)
+        self.assertEqual(df['code'].tolist(), ['A', 'A', 'B'])
+        self.assertEqual(df['wind'].tolist(), [3.0, 7.0, 7.0])
+        self.assertEqual(df['power'].tolist(), [0.0, 1000.0, 1500.0])
+        self.assertEqual(df['count'].tolist(), [2, 1, 1])
+        self.assertEqual(df['hours'].tolist(), [1.5, 0.25, 2.0])
+
+    def test_grid(self):
+        df = condition.grid(self._bins())
+        # 中间缺少的箱补0
+        self.assertEqual(df.index.tolist(), [0.0, 500.0, 1000.0, 1500.0])
+        self.assertEqual(df.columns.tolist(), [3.0, 4.0, 5.0, 6.0, 7.0])
+        self.assertEqual(df.to_numpy().sum(), 4)
+        self.assertEqual(df.loc[1500.0, 7.0], 1)
+        df = condition.grid(self._bins(), value='hours', codes=['A'])
+        self.assertEqual(df.index.tolist(), [0.0, 500.0, 1000.0])
+        self.assertEqual(df.loc[0.0, 3.0], 1.5)
+        self.assertEqual(condition.grid(self._bins(), codes=['C']).shape[0], 0)
+
+
+class PowerCurveTests(SimpleTestCase):
+    @staticmethod
+    def _stats(rows: list[tuple]) -> pd.DataFrame:
+        '''
+        ~由(风机, 风速箱, 样本数, 平均功率, 功率标准差, 停机样本数)生成2024年6月的分箱统计量
+        '''
+        df = pd.DataFrame(
+            rows, columns=['wt_id', 'bin', 'count', 'mean', 'std', 'down_count']
+        )
+        df['month'] = T('2024-06-01')
+        df['wind_sum'] = df['bin'] * df['count']
+        df['power_sum'] = df['mean'] * df['count']
+        df['power_sq_sum'] = (df['std'] ** 2 + df['mean'] ** 2) * df['count']
+        return df[power_curve.stats_info]
+
+    def test_curve(self):
+        stats = self._stats(
+            [('1', 5.0, 4, 100.0, 10.0, 0), ('1', 6.0, 2, 200.0, 0.0, 0)]
+        )
+        df = power_curve.curve(stats)
+        # 样本数不足MIN_BIN_COUNT的箱不输出，标准差为样本标准差
+        self.assertEqual(list(df.columns), power_curve.curve_info)
+        self.assertEqual(df['bin'].tolist(), [5.0])
+        self.assertAlmostEqual(df.loc[0, 'power_mean'], 100.0)
+        self.assertAlmostEqual(df.loc[0, 'power_std'], 10.0 * (4 / 3) ** 0.5)
+        fleet = power_curve.curve(stats, by=[])
+        self.assertEqual(fleet['wt_id'].tolist(), ['全场'])
+
+    def test_lost_energy(self):
+        stats = self._stats(
+            [
+                ('1', 5.0, 3, 100.0, 0.0, 6),
+                ('1', 6.0, 0, 0.0, 0.0, 3),
+                ('2', 6.0, 3, 300.0, 0.0, 0),
+            ]
+        )
+        df = power_curve.lost_energy(stats).set_index('wt_id')
+        # 风机1的6m/s箱没有自身曲线，使用全场曲线；风机2没有停机补0
+        self.assertAlmostEqual(df.loc['1', 'down_hours'], 9 / 6)
+        self.assertAlmostEqual(df.loc['1', 'lost_kwh'], (6 * 100 + 3 * 300) / 6)
+        self.assertEqual(df.loc['2', 'lost_kwh'], 0.0)
+
+    def test_cached_stats(self):
+        month = T('2024-06-01')
+        calls = []
+
+        def intervals(wt: str) -> pd.DataFrame:
+            calls.append(wt)
+            return pd.DataFrame(
+                {'start': [T('2024-06-01 01:00')], 'end': [T('2024-06-01 02:00')]}
+            )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            time = pd.date_range('2024-06-01', periods=24, freq='10min')
+            for wt in ('1', '2'):
+                folder = Path(tmp) / 'scada' / wt
+                folder.mkdir(parents=True)
+                pd.DataFrame({'时间': time, '风速': 5.1, '功率': 100.0}).to_csv(
+                    folder / f'{wt}_20240601.csv', index=False
+                )
+            status = Path(tmp) / 'status.txt'
+            status.write_text('a')
+            source = power_curve.ScadaSource(
+                Path(tmp) / 'scada',
+                Path(tmp) / 'store',
+                {'time': '时间', 'wind': '风速', 'power': '功率'},
+            )
+            depends = {'1': [status]}
+            df = source.cached_stats(['1', '2'], month, depends, intervals)
+            self.assertEqual(calls, ['1', '2'])
+            one = df[(df['wt_id'] == '1') & (df['bin'] == 5.0)].iloc[0]
+            # 1:00~2:00的停机区间内的样本只计入down_count
+            self.assertEqual((one['count'], one['down_count']), (18, 6))
+            # 输入未变化时直接使用缓存，依赖文件变化的风机重新计算
+            source.cached_stats(['1', '2'], month, depends, intervals)
+            self.assertEqual(calls, ['1', '2'])
+            status.write_text('ab')
+            cached = source.cached_stats(['1', '2'], month, depends, intervals)
+            self.assertEqual(calls, ['1', '2', '1'])
+            pd.testing.assert_frame_equal(
+                cached.sort_values(['wt_id', 'bin'], ignore_index=True),
+                df.sort_values(['wt_id', 'bin'], ignore_index=True),
+            )
+
+
+class SchedulerTests(SimpleTestCase):
+    def _blocked(
+        self, scheduler: executor.Scheduler, cost: float, gate: threading.Event
+    ) -> tuple[Future, threading.Event]:
+        '''
+        ~提交一个等待gate的任务，返回其Future和开始运行的事件
+        '''
+        started = threading.Event()
+
+        def func():
+            started.set()
+            gate.wait(5)
+            return cost
+
+        return scheduler.submit(func, cost=cost), started
+
+    def test_heavy_cap(self):
+        scheduler = executor.Scheduler(max_workers=3, max_heavy=1, heavy_cost=10)
+        gate = threading.Event()
+        first, first_started = self._blocked(scheduler, 100, gate)
+        self.assertTrue(first_started.wait(5))
+        second, second_started = self._blocked(scheduler, 50, gate)
+        # 重任务达到上限时排队，轻任务仍可执行
+        light = scheduler.submit(lambda: 'light', cost=1)
+        self.assertEqual(light.result(5), 'light')
+        self.assertFalse(second_started.is_set())
+        metrics = scheduler.metrics()
+        self.assertEqual((metrics['running_heavy'], metrics['queued_heavy']), (1, 1))
+        gate.set()
+        self.assertEqual((first.result(5), second.result(5)), (100, 50))
+
+    def test_merge(self):
+        scheduler = executor.Scheduler(max_workers=1, max_heavy=1, heavy_cost=10)
+        gate = threading.Event()
+        blocker, _ = self._blocked(scheduler, 1, gate)
+        # 相同key共用同一个任务，结果取走后重新计算
+        future = scheduler.submit(lambda: 1, key='/table/?view=test1')
+        self.assertIs(scheduler.submit(lambda: 2, key='/table/?view=test1'), future)
+        self.assertEqual(scheduler.position('/table/?view=test1'), 1)
+        gate.set()
+        self.assertEqual(future.result(5), 1)
+        scheduler.release('/table/?view=test1')
+        future = scheduler.submit(lambda: 3, key='/table/?view=test1')
+        self.assertEqual(future.result(5), 3)
+        blocker.result(5)
+
+    async def test_queued_response(self):
+        scheduler = executor.Scheduler(max_workers=2, max_heavy=1, heavy_cost=10)
+        gate = threading.Event()
+        self._blocked(scheduler, 100, gate)
+        request = RequestFactory().get('/table/', {'view': 'test1'})
+
+        def view(request):
+            return JsonResponse({'view': request.GET['view']})
+
+        with mock.patch.object(executor, 'get_scheduler', return_value=scheduler):
+            with self.settings(ANALYSIS_QUEUE_WAIT=0.05):
+                # 重任务排队超时时返回202和排队位置，任务继续在后台进行
+                response = await executor.run_request(view, request, cost=100)
+                self.assertEqual(response.status_code, 202)
+                self.assertEqual(json.loads(response.content)['position'], 1)
+                self.assertEqual(response['Retry-After'], '1')
+                gate.set()
+                response = await executor.run_request(view, request, cost=100)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {'view': 'test1'})
+
+
+class WarmCacheTests(SimpleTestCase):
+    def test_skip_fresh(self):
+        params = {'start': '2024-06-01', 'end': '2024-06-20'}
+        calls = []
+
+        def get_table(view, params, refresh=False, timeout=None):
+            calls.append(refresh)
+            cache.set(analysis._table_key(view, params), pd.DataFrame(), timeout)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            status = Path(tmp) / 'BufferStatuscodes20240601.txt'
+            status.write_text('a')
+            lock = Path(tmp) / 'warmup.lock'
+            locmem = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+            with contextlib.ExitStack() as stack:
+                stack.enter_context(
+                    self.settings(CACHES={'default': locmem}, CACHE_WARMUP_LOCK=lock)
+                )
+                stack.enter_context(
+                    mock.patch.object(
+                        analysis, 'warmup_jobs', return_value=[('heatmap', params)]
+                    )
+                )
+                stack.enter_context(
+                    mock.patch.object(analysis, '_view_files', return_value=[status])
+                )
+                stack.enter_context(
+                    mock.patch.object(analysis, '_get_table', side_effect=get_table)
+                )
+                result = analysis.warm_cache(workers=1)
+                self.assertEqual([item[2] for item in result], ['computed'])
+                # 输入文件未变化且缓存仍在时跳过
+                result = analysis.warm_cache(workers=1)
+                self.assertEqual([item[2] for item in result], ['fresh'])
+                self.assertEqual(calls, [True])
+                status.write_text('ab')
+                result = analysis.warm_cache(workers=1)
+                self.assertEqual([item[2] for item in result], ['computed'])
+                result = analysis.warm_cache(workers=1, force=True)
+                self.assertEqual([item[2] for item in result], ['computed'])
+                # 缓存被清除后重新计算
+                cache.clear()
+                result = analysis.warm_cache(workers=1)
+                self.assertEqual([item[2] for item in result], ['computed'])
+                self.assertEqual(len(calls), 4)
+                # 其他进程正在预热时跳过
+                lock.touch()
+                self.assertIsNone(analysis.warm_cache(workers=1))
+
+
+class ProfilerTests(SimpleTestCase):
+    def setUp(self):
+        # 用可修改的数值代替进程常驻内存
+        self.memory = [1000]
+        patcher = mock.patch.object(profiling, 'rss', lambda: self.memory[0])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_budget(self):
+        with profiling.Profiler('rss', budget=100) as profiler:
+            with profiling.stage('read_file'):
+                self.memory[0] = 1050
+            # 线程池中的函数经bind包装后记入同一记录器
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                pool.submit(profiling.bind(profiling.check), 'concat').result()
+            self.memory[0] = 1200
+            with self.assertRaises(profiling.MemoryBudgetExceeded) as ctx:
+                profiling.check('concat')
+        self.assertEqual((ctx.exception.stage, ctx.exception.used), ('concat', 200))
+        self.assertEqual(profiler.stages['read_file']['rss'], 50)
+        self.assertIn('read_file;dur=', profiler.server_timing())
+        self.assertIsNone(profiling.current())
+        # 未激活记录器时不检查
+        profiling.check('concat')
+
+    def test_guarded_response(self):
+        def view(request):
+            self.memory[0] = 2 * profiling.MB
+            profiling.check('table')
+            return JsonResponse({})
+
+        request = RequestFactory().get('/data/', {'view': 'test8'})
+        with self.settings(ANALYSIS_MEMORY_BUDGET=profiling.MB):
+            response = analysis.guarded_response(view, request)
+        # 执行中超出预算时中止并返回413
+        self.assertEqual(response.status_code, 413)
+        content = json.loads(response.content)
+        self.assertEqual((content['stage'], content['used_mb']), ('table', 2.0))
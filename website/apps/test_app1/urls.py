@@ -7,6 +7,16 @@ urlpatterns = [
     path('', views.root, name='root'),
     path('index/', views.index, name='首页'),
     path('data/', views.get_data, name='获取数据'),
+    path('table/', views.get_table, name='获取表格'),
+    path('anomaly/', views.get_anomaly, name='故障异常'),
+    path('availability/', views.get_availability, name='可利用率'),
+    path('cascade/', views.get_cascade, name='连锁故障'),
+    path('condition/', views.get_condition, name='故障工况'),
+    path('power/', views.get_power, name='功率曲线'),
+    path('export/', views.get_export, name='导出明细'),
+    path('coverage/', views.get_coverage, name='数据完整性'),
+    path('metrics/', views.get_metrics, name='调度状态'),
+    path('heatmap/', views.get_heatmap, name='故障热力图'),
     path('fault_statistics/', views.fault_statistics, name='故障统计'),
     path('vibration_analysis/', views.vibration_analysis, name='振动分析'),
 ]
@@ -1,16 +1,39 @@
 # Create your views here.
-import json
+from __future__ import annotations
 
-import numpy as np
-import pandas as pd
-from django.http import HttpRequest, HttpResponse
+from datetime import date, timedelta
+from functools import partial
+
+from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse
 
-from pkgs.charts import bar_json, line_json
-from pkgs.fault import FaultStatistics
-from pkgs.fault_offshore import FaultStatisticsOffshore
-from pkgs.utils.tools import HiddenPrints
+from .executor import get_scheduler, run_analysis, run_request
+
+
+def default_range() -> dict[str, str]:
+    '''
+    ~页面默认查询范围：61天前至昨天
+    '''
+    today = date.today()
+    return {
+        'start': (today - timedelta(days=61)).strftime('%Y-%m-%d'),
+        'end': (today - timedelta(days=1)).strftime('%Y-%m-%d'),
+    }
+
+
+async def _schedule(func, request: HttpRequest, merge: bool = True) -> HttpResponse:
+    '''
+    ~估算请求代价后交给调度器，已缓存的查询优先，重任务排队过久时返回202排队状态，
+    执行时检查内存预算，merge为False时不与相同URL的请求共用结果
+    '''
+    from . import analysis
+
+    # 估算需要列目录、检查缓存文件，同样不在事件循环中进行
+    cost = await run_analysis(analysis.estimate_cost, request)
+    return await run_request(
+        partial(analysis.guarded_response, func), request, cost, merge=merge
+    )
 
 
 def root(request: HttpRequest) -> HttpResponse:
@@ -24,120 +47,107 @@ def index(request: HttpRequest) -> HttpResponse:
 
 
 def fault_statistics(request: HttpRequest) -> HttpResponse:
-    context = {
-        'start': (pd.to_datetime('now') - pd.to_timedelta('61d')).strftime('%Y-%m-%d'),
-        'end': (pd.to_datetime('now') - pd.to_timedelta('1d')).strftime('%Y-%m-%d'),
-    }
+    context = default_range()
     return render(request, 'test_app1/fault_statistics.html', context=context)
 
 
 def vibration_analysis(request: HttpRequest) -> HttpResponse:
-    context = {
-        'start': (pd.to_datetime('now') - pd.to_timedelta('61d')).strftime('%Y-%m-%d'),
-        'end': (pd.to_datetime('now') - pd.to_timedelta('1d')).strftime('%Y-%m-%d'),
-    }
+    context = default_range()
 
     return render(request, 'test_app1/vibration_analysis.html', context=context)
 
 
-def get_data(request: HttpRequest) -> HttpResponse:
-    if request.GET['view'] == 'test1':
-        context = {}
-        start = str(request.GET['start'])
-        end = str(request.GET['end'])
-        with HiddenPrints():
-            fs = FaultStatistics(
-                src_path=r'D:\风机数据\PLCdata\Statuscode',
-                start=start,
-                end=end,
-                # start='20240401',
-                # end='20240601',
-                fault_map_path='config/fault_map.csv',
-                wt_list=[20],
-            )
-            fs.get_fault()
-            df = fs.get_fault_simple()
-
-        # lose_file = df['lose_file'].iloc[-1]
-        df = df.drop(df.index[-1], axis=0).drop('lose_file', axis=1)
-        df['timedelta'] = (
-            pd.to_timedelta(df['timedelta']).dt.total_seconds() / 3600
-        ).round(2)
-        df = df.rename(
-            columns={
-                'wt_id': '风机编号',
-                'code': '故障代码',
-                'fault_en': '故障名称_英文',
-                'fault_cn': '故障名称_中文',
-                'count': '故障次数',
-                'timedelta': '故障时间(小时)',
-            },
-            inplace=False,
-        )[['风机编号', '故障代码', '故障名称_中文', '故障名称_英文', '故障次数', '故障时间(小时)']]
-
-        context['table'] = df.to_html(
-            classes='table table-bordered table-hover', index=False
-        )
-        y_label_0 = '故障时间(小时)'
-        y_label_1 = '故障次数'
-        context['chart'] = []
-        df = df.sort_values(by=y_label_0, ascending=False)
-        context['chart'].append(bar_json(df[['故障名称_中文', y_label_0]], y_label_0))
-        df = df.sort_values(by=y_label_1, ascending=False)
-        context['chart'].append(bar_json(df[['故障名称_中文', y_label_1]], y_label_1))
-        context['id'] = 1
-        # 打包为json，回传
-        context = json.dumps(context)
-        return HttpResponse(context)
-
-    if request.GET['view'] == 'test7':
-        context = {}
-        start = str(request.GET['start'])
-        end = str(request.GET['end'])
-        with HiddenPrints():
-            fs = FaultStatisticsOffshore(fault_map_path='config/风机故障代码表.csv')
-            df = fs.get_single(
-                wt=f'00{request.GET["id"]}#',
-                src_path=r'D:\风机数据\_公司网盘数据\粤电沙扒statuslog_',
-                start=start,
-                end=end,
-            )
-        df['持续时间'] = df['持续时间'].astype(float).round(2)
-        df = df[df['持续时间'] > 0.1]
-        context['table'] = df.to_html(
-            classes='table table-bordered table-hover', index=False
-        )
-
-        context['chart'] = []
-        df = df.sort_values(by='持续时间', ascending=False)
-        context['chart'].append(
-            bar_json(df[['故障描述_中文', '持续时间']].head(10), '故障时间(小时)')
-        )
-
-        df = df.sort_values(by='故障次数', ascending=False)
-        context['chart'].append(
-            bar_json(df[['故障描述_中文', '故障次数']].head(10), '故障次数')
-        )
-        context['id'] = 1
-        # 打包为json，回传
-        context = json.dumps(context)
-        return HttpResponse(context)
-
-    if request.GET['view'] == 'test8':
-        context = {}
-        start = str(request.GET['start'])
-        end = str(request.GET['end'])
-        context['chart'] = []
-        df = pd.DataFrame()
-        df['时间'] = pd.date_range(start=start, end=end, freq='1d').strftime('%Y-%m-%d')
-        df['1p频率'] = np.random.randint(0, 100, len(df))
-        df['3p频率'] = np.random.randint(0, 100, len(df))
-        context['chart'].append(
-            line_json(
-                df.drop(columns=['时间']),
-                df['时间'].to_list(),
-                title='振动频率',
-            )
-        )
-        context = json.dumps(context)
-        return HttpResponse(context)
+async def get_table(request: HttpRequest) -> HttpResponse:
+    '''
+    ~分页获取统计表，支持page、size、sort（列序号）、order（asc/desc）、search参数
+    '''
+    # 分析模块较重，首次请求时才导入
+    from . import analysis
+
+    return await _schedule(analysis.table_response, request)
+
+
+async def get_data(request: HttpRequest) -> HttpResponse:
+    # 计算在线程池中进行，不阻塞其他页面和静态文件请求
+    from . import analysis
+
+    return await _schedule(analysis.data_response, request)
+
+
+async def get_anomaly(request: HttpRequest) -> HttpResponse:
+    '''
+    ~全场风机故障频次异常
+    '''
+    from . import analysis
+
+    return await _schedule(analysis.anomaly_response, request)
+
+
+async def get_availability(request: HttpRequest) -> HttpResponse:
+    '''
+    ~全场风机时间可利用率
+    '''
+    from . import analysis
+
+    return await _schedule(analysis.availability_response, request)
+
+
+async def get_heatmap(request: HttpRequest) -> HttpResponse:
+    '''
+    ~全部风场风机×周期故障热力图
+    '''
+    from . import analysis
+
+    return await _schedule(analysis.heatmap_response, request)
+
+
+async def get_condition(request: HttpRequest) -> HttpResponse:
+    '''
+    ~海上风场故障触发工况
+    '''
+    from . import analysis
+
+    return await _schedule(analysis.condition_response, request)
+
+
+async def get_power(request: HttpRequest) -> HttpResponse:
+    '''
+    ~功率曲线与停机损失电量
+    '''
+    from . import analysis
+
+    return await _schedule(analysis.power_response, request)
+
+
+async def get_export(request: HttpRequest) -> HttpResponse:
+    '''
+    ~流式导出故障明细，按风机×天数调度，逐块生成时才读取数据，流式响应不与其他请求共用
+    '''
+    from . import analysis
+
+    return await _schedule(analysis.export_response, request, merge=False)
+
+
+async def get_coverage(request: HttpRequest) -> HttpResponse:
+    '''
+    ~全部风场状态文件完整性
+    '''
+    from . import analysis
+
+    return await _schedule(analysis.coverage_response, request)
+
+
+async def get_cascade(request: HttpRequest) -> HttpResponse:
+    '''
+    ~全场停机前频繁故障代码组合
+    '''
+    from . import analysis
+
+    return await _schedule(analysis.cascade_response, request)
+
+
+def get_metrics(request: HttpRequest) -> HttpResponse:
+    '''
+    ~分析任务调度的队列深度、运行数和等待时间
+    '''
+    return JsonResponse(get_scheduler().metrics())
@@ -7,4 +7,72 @@ String.prototype.format = function () {
         s = s.replace(new RegExp("\\{" + i + "\\}", "g"), arguments[i]);
     }
     return s;
-};
\ No newline at end of file
+};
+// HTML转义，防止表格内容被解析为标签
+function escapeHtml(value) {
+    if (value === null || value === undefined) {
+        return "";
+    }
+    return String(value)
+        .replace(/&/g, "&amp;")
+        .replace(/</g, "&lt;")
+        .replace(/>/g, "&gt;")
+        .replace(/"/g, "&quot;");
+}
+
+// 渲染分页表格
+// data: 后端table_page返回的{columns, values, total, page, size}，values按列存储
+// state: 当前的{sort, order, search}，点击表头、翻页、筛选时修改后调用onChange(page, state)
+function renderTable(container, data, state, onChange) {
+    var pages = Math.max(Math.ceil(data.total / data.size), 1);
+    var html = [];
+    html.push('<div style="margin-bottom: 5px">');
+    html.push('<input class="table-search" type="text" placeholder="筛选" value="{0}" />'.format(escapeHtml(state.search || "")));
+    html.push('<span style="margin-left: 20px">共{0}行</span>'.format(data.total));
+    html.push('<button class="table-prev btn btn-sm btn-outline-primary" style="margin-left: 20px">上一页</button>');
+    html.push('<span style="margin: 0 10px">{0} / {1}</span>'.format(data.page, pages));
+    html.push('<button class="table-next btn btn-sm btn-outline-primary">下一页</button>');
+    html.push("</div>");
+    html.push('<div style="height: 90%; overflow: auto"><table class="table table-bordered table-hover"><thead><tr>');
+    data.columns.forEach(function (col, index) {
+        var mark = "";
+        if (state.sort === index) {
+            mark = state.order === "desc" ? " ▼" : " ▲";
+        }
+        html.push('<th class="table-sort" data-index="{0}" style="cursor: pointer">{1}{2}</th>'.format(index, escapeHtml(col), mark));
+    });
+    html.push("</tr></thead><tbody>");
+    var rows = data.values.length > 0 ? data.values[0].length : 0;
+    for (var r = 0; r < rows; r++) {
+        html.push("<tr>");
+        data.values.forEach(function (col) {
+            html.push("<td>{0}</td>".format(escapeHtml(col[r])));
+        });
+        html.push("</tr>");
+    }
+    html.push("</tbody></table></div>");
+    container.innerHTML = html.join("");
+
+    container.querySelector(".table-prev").addEventListener("click", function () {
+        if (data.page > 1) {
+            onChange(data.page - 1, state);
+        }
+    });
+    container.querySelector(".table-next").addEventListener("click", function () {
+        if (data.page < pages) {
+            onChange(data.page + 1, state);
+        }
+    });
+    container.querySelector(".table-search").addEventListener("change", function (event) {
+        state.search = event.target.value;
+        onChange(1, state);
+    });
+    container.querySelectorAll(".table-sort").forEach(function (th) {
+        th.addEventListener("click", function () {
+            var index = parseInt(th.getAttribute("data-index"));
+            state.order = state.sort === index && state.order === "asc" ? "desc" : "asc";
+            state.sort = index;
+            onChange(1, state);
+        });
+    });
+}
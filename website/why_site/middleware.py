@@ -0,0 +1,50 @@
+# 自定义中间件：客户端支持且安装brotli时用brotli压缩响应，未处理的响应交给GZipMiddleware
+import re
+
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖，未安装时由GZipMiddleware压缩
+    brotli = None
+
+re_accepts_brotli = re.compile(r'\bbr\b')
+
+
+class BrotliMiddleware(MiddlewareMixin):
+    '''
+    ~brotli响应压缩，与GZipMiddleware一样基于MiddlewareMixin，同时支持同步和异步调用，
+    ASGI下异步视图不会被包装为同步执行
+    '''
+
+    # 小于该字节数的响应不压缩
+    min_length = 200
+
+    def process_response(self, request, response):
+        if brotli is None:
+            return response
+        if response.streaming or len(response.content) < self.min_length:
+            return response
+        # 已压缩的响应不再处理
+        if response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        ae = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if not re_accepts_brotli.search(ae):
+            return response
+
+        compressed_content = brotli.compress(response.content, quality=5)
+        if len(compressed_content) >= len(response.content):
+            return response
+        response.content = compressed_content
+        response.headers['Content-Length'] = str(len(response.content))
+
+        # 与GZipMiddleware一致，压缩后ETag改为弱校验
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # 响应压缩，优先brotli，其次gzip
+    'django.middleware.gzip.GZipMiddleware',
+    'website.why_site.middleware.BrotliMiddleware',
+    # 根据响应内容生成ETag，结果未变化时返回304
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -79,6 +85,111 @@ WSGI_APPLICATION = 'website.why_site.wsgi.application'
 #     }
 # }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# 分析结果缓存，文件缓存可在多个worker进程之间共享
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR.parent / 'temp' / 'cache',
+        'TIMEOUT': 60 * 60,
+    }
+}
+
+# 状态文件解析结果缓存文件夹
+FAULT_STORE_DIR = BASE_DIR.parent / 'temp' / 'store'
+
+# 网络共享数据的本地镜像文件夹及容量上限(字节)，超出时删除最久未访问的文件
+FAULT_MIRROR_DIR = BASE_DIR.parent / 'temp' / 'mirror'
+FAULT_MIRROR_CAPACITY = 20 * 1024**3
+
+# 各风场数据根目录，路径可用环境变量覆盖，部署时无需修改代码
+# - kind: 数据源类型，见pkgs.sources.source_types
+# - pattern: 可选，状态文件glob模式，默认使用该类型的模式
+# - io: 可选，I/O参数，见pkgs.sources.io_defaults；本地磁盘使用内存映射，网络共享并发预读并镜像到本地
+FAULT_DATA_ROOTS = [
+    {
+        'farm': '陆上',
+        'kind': 'onshore',
+        'path': os.environ.get('WHY_ONSHORE_ROOT', r'D:\风机数据\PLCdata\Statuscode'),
+        'fault_map': 'config/fault_map.csv',
+        'io': {'concurrency': 1, 'read_ahead': 0, 'mmap': True, 'mirror': False},
+    },
+    {
+        'farm': '粤电沙扒',
+        'kind': 'offshore',
+        'path': os.environ.get(
+            'WHY_OFFSHORE_ROOT', r'D:\风机数据\_公司网盘数据\粤电沙扒statuslog_'
+        ),
+        'fault_map': 'config/风机故障代码表.csv',
+        'io': {'concurrency': 8, 'read_ahead': 16, 'mmap': False, 'mirror': True},
+    },
+]
+
+# 10分钟SCADA数据，每台风机一个文件夹（名称与陆上风机编号一致），文件名包含日期(%Y%m%d)或月份(%Y%m)
+# - pattern: 单台风机单月文件的glob模式，{wt}为风机编号，{month}为%Y%m
+# - columns: 文件中时间、风速(m/s)、有功功率(kW)的列名
+SCADA_DATA_ROOT = {
+    'path': os.environ.get('WHY_SCADA_ROOT', r'D:\风机数据\SCADA'),
+    'pattern': '{wt}/*{month}*.csv',
+    'columns': {'time': '时间', 'wind': '风速', 'power': '有功功率'},
+    'encoding': 'utf-8',
+}
+
+# 功率曲线按风机-月份的分箱统计量缓存文件夹
+POWER_CURVE_DIR = BASE_DIR.parent / 'temp' / 'power_curve'
+
+# 多进程共享的故障明细数据集，由ingest_watch在每批文件解析后发布，各worker按内存映射只读加载
+# - SHARED_DATASET_DAYS: 发布最近多少天的明细，覆盖页面默认查询范围，为0时不发布
+SHARED_DATASET_DIR = BASE_DIR.parent / 'temp' / 'shared'
+SHARED_DATASET_DAYS = 92
+
+# 同时进行的分析任务数上限，超出的请求排队等待，代价小的请求优先
+ANALYSIS_MAX_WORKERS = 4
+# 重任务的估算代价下限(未缓存的风机×天)及同时运行的重任务数上限，其余工作线程留给轻任务
+ANALYSIS_HEAVY_COST = 500
+ANALYSIS_MAX_HEAVY = 2
+# 重任务等待超过该秒数时返回202排队状态，任务继续在后台进行，前端按Retry-After重新请求
+ANALYSIS_QUEUE_WAIT = 10
+
+# 分析请求内存
+# - ANALYSIS_MEMORY_PROFILE: 为rss时记录各阶段(read_file、concat、get_df_fault、table、table_page、
+#   chart、dump)的耗时和常驻内存变化，为tracemalloc时另外记录Python分配峰值(开销较大)，
+#   结果写入响应头Server-Timing和日志，为空时不记录
+# - ANALYSIS_MEMORY_BUDGET: 单次查询内存预算(字节)，查询前按输入文件大小估算，执行中按常驻内存增长检查，
+#   超出时可分块计算的表格改为逐台风机计算，其他查询返回413，为0时不检查。
+#   常驻内存为进程级，同时进行的查询会互相计入，默认关闭，开启时宜配合较小的ANALYSIS_MAX_WORKERS
+# - ANALYSIS_MEMORY_FACTOR: 解析后DataFrame占用内存与状态文件大小之比，用于查询前估算
+ANALYSIS_MEMORY_PROFILE = os.environ.get('WHY_MEMORY_PROFILE', '')
+ANALYSIS_MEMORY_BUDGET = 0
+ANALYSIS_MEMORY_FACTOR = 4
+
+# 缓存预热：服务启动时和ingest_watch每批文件解析后，按页面默认查询范围预先计算统计表
+# - CACHE_WARMUP_ON_START: 服务启动时在后台线程预热，默认开启，多个worker进程通过锁文件只预热一次，
+#   同时计算的表格数受CACHE_WARMUP_WORKERS限制；设置环境变量WHY_CACHE_WARMUP=0可关闭
+# - CACHE_WARMUP_VIEWS: 预热的表格类型，test7按全部海上风机逐台预热
+# - CACHE_WARMUP_WORKERS: 同时计算的表格数
+# - CACHE_WARMUP_TIMEOUT: 预热结果的缓存秒数，输入文件变化后由下一次预热重新计算
+CACHE_WARMUP_ON_START = os.environ.get('WHY_CACHE_WARMUP', '1') == '1'
+CACHE_WARMUP_VIEWS = [
+    'test1',
+    'test7',
+    'fleet',
+    'heatmap',
+    'anomaly',
+    'availability',
+    'cascade',
+    'condition',
+    'power',
+]
+CACHE_WARMUP_WORKERS = 2
+CACHE_WARMUP_TIMEOUT = 60 * 60 * 24
+CACHE_WARMUP_LOCK = BASE_DIR.parent / 'temp' / 'warmup.lock'
+
+# 冷启动导入耗时预算(毫秒)，由manage.py startup_bench检查
+STARTUP_IMPORT_BUDGET_MS = 400
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 